@@ -16,12 +16,16 @@
 from neutron.common import rpc as n_rpc
 import oslo_messaging
 
+from neutron_lbaas.common import payload_codec
+
 
 class LbaasAgentApi(object):
     """Agent side of the Agent to Plugin RPC API."""
 
     # history
     #   1.0 Initial version
+    #   1.1 Add update_loadbalancer_stats_bulk
+    #   1.2 Add formats to get_loadbalancer
 
     def __init__(self, topic, context, host):
         self.context = context
@@ -34,9 +38,11 @@ class LbaasAgentApi(object):
         return cctxt.call(self.context, 'get_ready_devices', host=self.host)
 
     def get_loadbalancer(self, loadbalancer_id):
-        cctxt = self.client.prepare()
-        return cctxt.call(self.context, 'get_loadbalancer',
-                          loadbalancer_id=loadbalancer_id)
+        cctxt = self.client.prepare(version='1.2')
+        return payload_codec.decode(cctxt.call(
+            self.context, 'get_loadbalancer',
+            loadbalancer_id=loadbalancer_id,
+            formats=payload_codec.get_formats()))
 
     def loadbalancer_deployed(self, loadbalancer_id):
         cctxt = self.client.prepare()
@@ -70,3 +76,8 @@ class LbaasAgentApi(object):
         cctxt = self.client.prepare()
         return cctxt.call(self.context, 'update_loadbalancer_stats',
                           loadbalancer_id=loadbalancer_id, stats=stats)
+
+    def update_loadbalancer_stats_bulk(self, stats):
+        cctxt = self.client.prepare(version='1.1')
+        return cctxt.cast(self.context, 'update_loadbalancer_stats_bulk',
+                          stats=stats)
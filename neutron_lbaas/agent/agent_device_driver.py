@@ -46,6 +46,16 @@ class AgentDeviceDriver(object):
     def healthmonitor(self):
         pass
 
+    @property
+    def l7policy(self):
+        # Not all drivers will support this
+        raise NotImplementedError()
+
+    @property
+    def l7rule(self):
+        # Not all drivers will support this
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_name(self):
         """Returns unique name across all LBaaS device drivers."""
@@ -61,10 +71,28 @@ class AgentDeviceDriver(object):
         """Fully undeploys the loadbalancer instance."""
         pass
 
+    def adopt_instances(self):
+        """Takes over the instances deployed before the agent started.
+
+        :returns: ids of the loadbalancers the driver serves
+        """
+        # Not all drivers will support this
+        raise NotImplementedError()
+
     def remove_orphans(self, known_loadbalancer_ids):
         # Not all drivers will support this
         raise NotImplementedError()
 
+    def get_worker_counts(self):
+        """Returns the number of worker processes of each loadbalancer."""
+        # Not all drivers will support this
+        raise NotImplementedError()
+
+    def get_capacity(self):
+        """Returns capacity figures to report with the agent state."""
+        # Not all drivers will support this
+        raise NotImplementedError()
+
 
 @six.add_metaclass(abc.ABCMeta)
 class BaseManager(object):
@@ -106,3 +134,11 @@ class BaseMemberManager(BaseManager):
 
 class BaseHealthMonitorManager(BaseManager):
     pass
+
+
+class BaseL7PolicyManager(BaseManager):
+    pass
+
+
+class BaseL7RuleManager(BaseManager):
+    pass
@@ -13,7 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import os
+
+import eventlet
 from neutron.agent import rpc as agent_rpc
+from neutron.common import utils as n_utils
 from neutron import context as ncontext
 from neutron.plugins.common import constants
 from neutron.services import provider_configuration as provconfig
@@ -21,12 +26,15 @@ from neutron_lib import exceptions as n_exc
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging
+from oslo_serialization import jsonutils
 from oslo_service import loopingcall
 from oslo_service import periodic_task
 from oslo_utils import importutils
+from oslo_utils import timeutils
 
-from neutron_lbaas._i18n import _, _LE, _LI
+from neutron_lbaas._i18n import _, _LE, _LI, _LW
 from neutron_lbaas.agent import agent_api
+from neutron_lbaas.agent import dispatcher
 from neutron_lbaas.drivers.common import agent_driver_base
 from neutron_lbaas.services.loadbalancer import constants as lb_const
 from neutron_lbaas.services.loadbalancer import data_models
@@ -42,6 +50,40 @@ OPTS = [
                  'namespace_driver.HaproxyNSDriver'],
         help=_('Drivers used to manage loadbalancing devices'),
     ),
+    cfg.IntOpt(
+        'stats_collection_workers',
+        default=16,
+        min=1,
+        help=_('Maximum number of loadbalancers whose statistics are '
+               'collected concurrently'),
+    ),
+    cfg.IntOpt(
+        'stats_full_report_interval',
+        default=300,
+        min=0,
+        help=_('Seconds between two reports of the statistics of all '
+               'loadbalancers. In between, only the statistics which '
+               'changed since the last report are sent to the server. '
+               '0 sends all statistics every time.'),
+    ),
+    cfg.IntOpt(
+        'dispatch_workers',
+        default=16,
+        min=0,
+        help=_('Maximum number of loadbalancers whose RPC operations are '
+               'handled concurrently. The operations on a loadbalancer are '
+               'always handled one after the other, in the order they '
+               'arrived. 0 handles each operation in the RPC thread '
+               'receiving it.'),
+    ),
+    cfg.StrOpt(
+        'instance_snapshot_path',
+        default='$state_path/lbaas/instances.json',
+        help=_('File the agent saves the device driver of each of its '
+               'loadbalancers to, so that it serves them right after a '
+               'restart while it synchronizes with the server in the '
+               'background. An empty value disables the snapshot.'),
+    ),
 ]
 
 
@@ -49,11 +91,141 @@ class DeviceNotFoundOnAgent(n_exc.NotFound):
     message = _('Unknown device with loadbalancer_id %(loadbalancer_id)s')
 
 
+# Keys leading from a serialized object to the id of its loadbalancer
+_LOADBALANCER_ID_PATHS = {
+    'loadbalancer': ('id',),
+    'listener': ('loadbalancer_id',),
+    'pool': ('loadbalancer_id',),
+    'member': ('pool', 'loadbalancer_id'),
+    'healthmonitor': ('pool', 'loadbalancer_id'),
+    'l7policy': ('listener', 'loadbalancer_id'),
+    'l7rule': ('policy', 'listener', 'loadbalancer_id'),
+    'delta': ('loadbalancer_id',),
+}
+
+
+def _dispatched(obj_name):
+    """Queues an RPC handler behind the operations on its loadbalancer.
+
+    :param obj_name: argument of the handler holding the serialized object
+                     the operation is on
+    """
+    def decorator(handler):
+        index = handler.__code__.co_varnames.index(obj_name)
+
+        @functools.wraps(handler)
+        def wrapper(self, *args, **kwargs):
+            if not self.dispatcher:
+                return handler(self, *args, **kwargs)
+            obj = kwargs.get(obj_name)
+            if obj is None:
+                obj = args[index - 1]
+            loadbalancer_id = obj
+            try:
+                for key in _LOADBALANCER_ID_PATHS[obj_name]:
+                    loadbalancer_id = loadbalancer_id[key]
+            except (KeyError, TypeError):
+                # operations on unknown loadbalancers only wait for each
+                # other
+                loadbalancer_id = None
+            self.dispatcher.dispatch(loadbalancer_id, handler, self, *args,
+                                     **kwargs)
+        return wrapper
+    return decorator
+
+
+def _get_stats_delta(old_stats, stats):
+    """Returns the statistics which changed since old_stats was reported.
+
+    Members are compared one by one and only the changed ones are kept.
+    """
+    delta = dict((key, value) for key, value in stats.items()
+                 if key != 'members' and old_stats.get(key) != value)
+    old_members = old_stats.get('members', {})
+    members = dict((member_id, member_stats) for member_id, member_stats
+                   in stats.get('members', {}).items()
+                   if old_members.get(member_id) != member_stats)
+    if members:
+        delta['members'] = members
+    return delta
+
+
+def _iter_pool_dicts(node, pool_id):
+    """Yields every copy of a pool found in a graph of nested dicts."""
+    if isinstance(node, dict):
+        if node.get('id') == pool_id and 'members' in node:
+            yield node
+        values = node.values()
+    elif isinstance(node, list):
+        values = node
+    else:
+        return
+    for value in values:
+        for pool in _iter_pool_dicts(value, pool_id):
+            yield pool
+
+
+def _apply_member_delta(loadbalancer_dict, delta):
+    """Applies a member delta to every copy of its pool in a graph.
+
+    :returns: the member dict as it was before the change, an empty dict
+              for a new member, or None if the graph does not match the
+              state the delta was computed from
+    """
+    pools = list(_iter_pool_dicts(loadbalancer_dict, delta['pool_id']))
+    if not pools:
+        return None
+    old_member = None
+    for pool in pools:
+        for member in pool['members']:
+            if member.get('id') == delta['member_id']:
+                old_member = dict(member)
+    operation = delta['operation']
+    if operation == lb_const.MEMBER_DELTA_CREATE:
+        if old_member is not None:
+            return None
+        old_member = {}
+    elif old_member is None:
+        return None
+    else:
+        # The agent updates the provisioning status itself, the copy in
+        # the graph is not expected to be current.
+        for field, value in delta.get('old_member', {}).items():
+            if field != 'provisioning_status' and \
+                    old_member.get(field) != value:
+                return None
+
+    for pool in pools:
+        members = [member for member in pool['members']
+                   if member.get('id') != delta['member_id']]
+        if operation == lb_const.MEMBER_DELTA_CREATE:
+            members.append(dict(delta['member']))
+        elif operation == lb_const.MEMBER_DELTA_UPDATE:
+            members = pool['members']
+            for member in members:
+                if member.get('id') == delta['member_id']:
+                    member.update(delta['member'])
+        pool['members'] = members
+    return old_member
+
+
+def _find_pool(loadbalancer, pool_id):
+    pools = list(loadbalancer.pools)
+    for listener in loadbalancer.listeners:
+        pools.append(listener.default_pool)
+        pools.extend(policy.redirect_pool for policy in listener.l7_policies)
+    for pool in pools:
+        if pool and pool.id == pool_id:
+            return pool
+
+
 class LbaasAgentManager(periodic_task.PeriodicTasks):
 
     # history
     #   1.0 Initial version
-    target = oslo_messaging.Target(version='1.0')
+    #   1.1 Add L7 policy and rule methods
+    #   1.2 Add member_delta
+    target = oslo_messaging.Target(version='1.2')
 
     def __init__(self, conf):
         super(LbaasAgentManager, self).__init__(conf)
@@ -71,7 +243,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
             'binary': 'neutron-lbaasv2-agent',
             'host': conf.host,
             'topic': lb_const.LOADBALANCER_AGENTV2,
-            'configurations': {'device_drivers': self.device_drivers.keys()},
+            'configurations': {'device_drivers': self.device_drivers.keys(),
+                               lb_const.AGENT_MEMBER_DELTAS: True},
             'agent_type': lb_const.AGENT_TYPE_LOADBALANCERV2,
             'start_flag': True}
         self.admin_state_up = True
@@ -80,6 +253,24 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         self.needs_resync = False
         # pool_id->device_driver_name mapping used to store known instances
         self.instance_mapping = {}
+        # instance_mapping as it was last saved to the snapshot
+        self.saved_instance_mapping = {}
+        # loadbalancer_id->{'revision', 'graph'} mapping of the serialized
+        # loadbalancer graphs member deltas are applied to, an empty dict
+        # marks a graph which may have changed since it was cached
+        self.graph_cache = {}
+        # loadbalancer_id->stats mapping of the last reported statistics
+        self.reported_stats = {}
+        self.full_stats_watch = timeutils.StopWatch(
+            duration=self.conf.stats_full_report_interval)
+        self.full_stats_watch.start()
+        # loadbalancer_id->number of haproxy workers, including old workers
+        # still draining connections after a reload
+        self.worker_counts = {}
+        self.dispatcher = None
+        if self.conf.dispatch_workers:
+            self.dispatcher = dispatcher.LoadBalancerDispatcher(
+                self.conf.dispatch_workers)
 
     def _load_drivers(self):
         self.device_drivers = {}
@@ -116,13 +307,101 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         try:
             instance_count = len(self.instance_mapping)
             self.agent_state['configurations']['instances'] = instance_count
+            self._update_worker_counts()
+            # Only totals are reported, the configurations of an agent are
+            # too small to hold a count per loadbalancer.
+            workers = sum(self.worker_counts.values())
+            old_workers = sum(max(count - 1, 0)
+                              for count in self.worker_counts.values())
+            self.agent_state['configurations']['workers'] = workers
+            self.agent_state['configurations']['old_workers'] = old_workers
+            self.agent_state['configurations'].update(self._get_capacity())
+            if self.dispatcher:
+                self.agent_state['configurations'].update(
+                    self.dispatcher.get_stats())
             self.state_rpc.report_state(self.context, self.agent_state)
             self.agent_state.pop('start_flag', None)
         except Exception:
             LOG.exception(_LE("Failed reporting state!"))
 
+    def _update_worker_counts(self):
+        worker_counts = {}
+        for driver in self.device_drivers.values():
+            try:
+                worker_counts.update(driver.get_worker_counts())
+            except NotImplementedError:
+                pass  # Not all drivers will support this
+        self.worker_counts = worker_counts
+
+    def _get_capacity(self):
+        capacity = {}
+        for driver in self.device_drivers.values():
+            try:
+                for key, value in driver.get_capacity().items():
+                    capacity[key] = capacity.get(key, 0) + value
+            except NotImplementedError:
+                pass  # Not all drivers will support this
+        return capacity
+
     def initialize_service_hook(self, started_by):
-        self.sync_state()
+        self._load_instance_snapshot()
+        self._adopt_instances()
+        self._save_instance_snapshot()
+        # Statistics and RPC calls are served for the known loadbalancers
+        # while the first synchronization runs.
+        eventlet.spawn_n(self.sync_state)
+
+    def _load_instance_snapshot(self):
+        """Maps the loadbalancers the agent served before a restart."""
+        snapshot_path = self.conf.instance_snapshot_path
+        if not snapshot_path or not os.path.exists(snapshot_path):
+            return
+        try:
+            with open(snapshot_path, 'r') as snapshot_file:
+                instance_mapping = jsonutils.loads(snapshot_file.read())
+        except (IOError, ValueError) as e:
+            LOG.warning(_LW('Unable to read the instance snapshot '
+                            '%(path)s: %(error)s'),
+                        {'path': snapshot_path, 'error': e})
+            return
+        for loadbalancer_id, driver_name in instance_mapping.items():
+            if driver_name in self.device_drivers:
+                self.instance_mapping[loadbalancer_id] = driver_name
+        self.saved_instance_mapping = dict(self.instance_mapping)
+
+    def _save_instance_snapshot(self):
+        snapshot_path = self.conf.instance_snapshot_path
+        if (not snapshot_path or
+                self.instance_mapping == self.saved_instance_mapping):
+            return
+        instance_mapping = dict(self.instance_mapping)
+        try:
+            n_utils.ensure_dir(os.path.dirname(snapshot_path))
+            n_utils.replace_file(snapshot_path,
+                                 jsonutils.dumps(instance_mapping))
+        except (IOError, OSError):
+            LOG.exception(_LE('Unable to save the instance snapshot %s'),
+                          snapshot_path)
+            return
+        self.saved_instance_mapping = instance_mapping
+
+    def _adopt_instances(self):
+        """Maps the loadbalancers the drivers still serve after a restart.
+
+        sync_state then only redeploys those whose configuration changed on
+        the server, and destroys those the server no longer knows.
+        """
+        for driver_name, driver in self.device_drivers.items():
+            try:
+                loadbalancer_ids = driver.adopt_instances()
+            except NotImplementedError:
+                continue  # Not all drivers will support this
+            except Exception:
+                LOG.exception(_LE('Unable to adopt the loadbalancers of '
+                                  'device driver %s'), driver_name)
+                continue
+            for loadbalancer_id in loadbalancer_ids:
+                self.instance_mapping[loadbalancer_id] = driver_name
 
     @periodic_task.periodic_task
     def periodic_resync(self, context):
@@ -132,18 +411,44 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
 
     @periodic_task.periodic_task(spacing=6)
     def collect_stats(self, context):
-        for loadbalancer_id, driver_name in self.instance_mapping.items():
-            driver = self.device_drivers[driver_name]
+        full_report = self.full_stats_watch.expired()
+        pool = eventlet.GreenPool(self.conf.stats_collection_workers)
+        all_stats = {}
+        updates = {}
+        for loadbalancer_id, stats in pool.starmap(
+                self._get_loadbalancer_stats,
+                list(self.instance_mapping.items())):
+            if not stats:
+                continue
+            all_stats[loadbalancer_id] = stats
+            if not full_report:
+                stats = _get_stats_delta(
+                    self.reported_stats.get(loadbalancer_id, {}), stats)
+            if stats:
+                updates[loadbalancer_id] = stats
+        if updates:
             try:
-                stats = driver.loadbalancer.get_stats(loadbalancer_id)
-                if stats:
-                    self.plugin_rpc.update_loadbalancer_stats(
-                        loadbalancer_id, stats)
+                self.plugin_rpc.update_loadbalancer_stats_bulk(updates)
             except Exception:
-                LOG.exception(_LE('Error updating statistics on loadbalancer'
-                                  ' %s'),
-                              loadbalancer_id)
+                LOG.exception(_LE('Error updating statistics of %d '
+                                  'loadbalancers'), len(updates))
                 self.needs_resync = True
+                return
+        self.reported_stats = all_stats
+        if full_report:
+            self.full_stats_watch.restart()
+
+    def _get_loadbalancer_stats(self, loadbalancer_id, driver_name):
+        driver = self.device_drivers[driver_name]
+        try:
+            return loadbalancer_id, driver.loadbalancer.get_stats(
+                loadbalancer_id)
+        except Exception:
+            LOG.exception(_LE('Error updating statistics on loadbalancer'
+                              ' %s'),
+                          loadbalancer_id)
+            self.needs_resync = True
+            return loadbalancer_id, None
 
     def sync_state(self):
         known_instances = set(self.instance_mapping.keys())
@@ -161,20 +466,34 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
             self.needs_resync = True
 
         self.remove_orphans()
+        self._save_instance_snapshot()
 
     def _get_driver(self, loadbalancer_id):
         if loadbalancer_id not in self.instance_mapping:
             raise DeviceNotFoundOnAgent(loadbalancer_id=loadbalancer_id)
 
+        # Every handler of a full payload looks its driver up here, the
+        # payload changes the graph behind the back of the graph cache.
+        self.graph_cache[loadbalancer_id] = {}
         driver_name = self.instance_mapping[loadbalancer_id]
         return self.device_drivers[driver_name]
 
+    def _get_graph(self, loadbalancer_id):
+        """Fetches the graph of a loadbalancer from the server.
+
+        :returns: the loadbalancer and its cache entry
+        """
+        loadbalancer_dict = self.plugin_rpc.get_loadbalancer(loadbalancer_id)
+        revision = loadbalancer_dict.pop('revision', None)
+        entry = {}
+        if revision is not None:
+            entry = {'revision': revision,
+                     'graph': jsonutils.dumps(loadbalancer_dict)}
+        return data_models.LoadBalancer.from_dict(loadbalancer_dict), entry
+
     def _reload_loadbalancer(self, loadbalancer_id):
         try:
-            loadbalancer_dict = self.plugin_rpc.get_loadbalancer(
-                loadbalancer_id)
-            loadbalancer = data_models.LoadBalancer.from_dict(
-                loadbalancer_dict)
+            loadbalancer, graph = self._get_graph(loadbalancer_id)
             driver_name = loadbalancer.provider.device_driver
             if driver_name not in self.device_drivers:
                 LOG.error(_LE('No device driver on agent: %s.'), driver_name)
@@ -184,6 +503,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
 
             self.device_drivers[driver_name].deploy_instance(loadbalancer)
             self.instance_mapping[loadbalancer_id] = driver_name
+            self.graph_cache[loadbalancer_id] = graph
             self.plugin_rpc.loadbalancer_deployed(loadbalancer_id)
         except Exception:
             LOG.exception(_LE('Unable to deploy instance for '
@@ -196,6 +516,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         try:
             driver.undeploy_instance(lb_id, delete_namespace=True)
             del self.instance_mapping[lb_id]
+            self.graph_cache.pop(lb_id, None)
             self.plugin_rpc.loadbalancer_destroyed(lb_id)
         except Exception:
             LOG.exception(_LE('Unable to destroy device for loadbalancer: %s'),
@@ -203,11 +524,13 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
             self.needs_resync = True
 
     def remove_orphans(self):
-        for driver_name in self.device_drivers:
-            lb_ids = [lb_id for lb_id in self.instance_mapping
-                      if self.instance_mapping[lb_id] == driver_name]
+        lb_ids = dict((driver_name, set())
+                      for driver_name in self.device_drivers)
+        for lb_id, driver_name in self.instance_mapping.items():
+            lb_ids.setdefault(driver_name, set()).add(lb_id)
+        for driver_name, driver in self.device_drivers.items():
             try:
-                self.device_drivers[driver_name].remove_orphans(lb_ids)
+                driver.remove_orphans(lb_ids[driver_name])
             except NotImplementedError:
                 pass  # Not all drivers will support this
 
@@ -231,6 +554,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
                     LOG.info(_LI("Destroying loadbalancer %s due to agent "
                                  "disabling"), loadbalancer_id)
                     self._destroy_loadbalancer(loadbalancer_id)
+                self._save_instance_snapshot()
             LOG.info(_LI("Agent_updated by server side %s!"), payload)
 
     def _update_statuses(self, obj, error=False):
@@ -259,6 +583,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
                                       provisioning_status=lb_p_status,
                                       operating_status=lb_o_status)
 
+    @_dispatched('loadbalancer')
     def create_loadbalancer(self, context, loadbalancer, driver_name):
         loadbalancer = data_models.LoadBalancer.from_dict(loadbalancer)
         if driver_name not in self.device_drivers:
@@ -274,8 +599,10 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
                                             driver.get_name())
         else:
             self.instance_mapping[loadbalancer.id] = driver_name
+            self._save_instance_snapshot()
             self._update_statuses(loadbalancer)
 
+    @_dispatched('loadbalancer')
     def update_loadbalancer(self, context, old_loadbalancer, loadbalancer):
         loadbalancer = data_models.LoadBalancer.from_dict(loadbalancer)
         old_loadbalancer = data_models.LoadBalancer.from_dict(old_loadbalancer)
@@ -288,12 +615,16 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(loadbalancer)
 
+    @_dispatched('loadbalancer')
     def delete_loadbalancer(self, context, loadbalancer):
         loadbalancer = data_models.LoadBalancer.from_dict(loadbalancer)
         driver = self._get_driver(loadbalancer.id)
         driver.loadbalancer.delete(loadbalancer)
         del self.instance_mapping[loadbalancer.id]
+        self.graph_cache.pop(loadbalancer.id, None)
+        self._save_instance_snapshot()
 
+    @_dispatched('listener')
     def create_listener(self, context, listener):
         listener = data_models.Listener.from_dict(listener)
         driver = self._get_driver(listener.loadbalancer.id)
@@ -305,6 +636,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(listener)
 
+    @_dispatched('listener')
     def update_listener(self, context, old_listener, listener):
         listener = data_models.Listener.from_dict(listener)
         old_listener = data_models.Listener.from_dict(old_listener)
@@ -317,11 +649,13 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(listener)
 
+    @_dispatched('listener')
     def delete_listener(self, context, listener):
         listener = data_models.Listener.from_dict(listener)
         driver = self._get_driver(listener.loadbalancer.id)
         driver.listener.delete(listener)
 
+    @_dispatched('pool')
     def create_pool(self, context, pool):
         pool = data_models.Pool.from_dict(pool)
         driver = self._get_driver(pool.loadbalancer.id)
@@ -332,6 +666,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(pool)
 
+    @_dispatched('pool')
     def update_pool(self, context, old_pool, pool):
         pool = data_models.Pool.from_dict(pool)
         old_pool = data_models.Pool.from_dict(old_pool)
@@ -343,11 +678,13 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(pool)
 
+    @_dispatched('pool')
     def delete_pool(self, context, pool):
         pool = data_models.Pool.from_dict(pool)
         driver = self._get_driver(pool.loadbalancer.id)
         driver.pool.delete(pool)
 
+    @_dispatched('member')
     def create_member(self, context, member):
         member = data_models.Member.from_dict(member)
         driver = self._get_driver(member.pool.loadbalancer.id)
@@ -359,6 +696,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(member)
 
+    @_dispatched('member')
     def update_member(self, context, old_member, member):
         member = data_models.Member.from_dict(member)
         old_member = data_models.Member.from_dict(old_member)
@@ -371,11 +709,104 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(member)
 
+    @_dispatched('member')
     def delete_member(self, context, member):
         member = data_models.Member.from_dict(member)
         driver = self._get_driver(member.pool.loadbalancer.id)
         driver.member.delete(member)
 
+    @_dispatched('delta')
+    def member_delta(self, context, delta):
+        """Handles the change of a single member.
+
+        The delta is applied to the cached graph of its loadbalancer if it
+        directly follows the cached revision and the member in the graph
+        matches the old values of the delta. Otherwise the graph is fetched
+        from the server, where the change is already in place, and
+        deployed as a whole.
+        """
+        lb_id = delta['loadbalancer_id']
+        if lb_id not in self.instance_mapping:
+            raise DeviceNotFoundOnAgent(loadbalancer_id=lb_id)
+        driver = self.device_drivers[self.instance_mapping[lb_id]]
+        operation = delta['operation']
+        # stands in for the member when only its status is reported
+        status_member = data_models.Member(
+            id=delta['member_id'],
+            pool=data_models.Pool(
+                id=delta['pool_id'],
+                loadbalancer=data_models.LoadBalancer(id=lb_id)))
+
+        cached = self.graph_cache.get(lb_id)
+        if cached and delta['revision'] <= cached['revision']:
+            # the graph fetched for a later delta contains this change
+            if operation != lb_const.MEMBER_DELTA_DELETE:
+                self._update_statuses(status_member)
+            return
+
+        pool = None
+        if cached and delta['revision'] == cached['revision'] + 1:
+            loadbalancer_dict = jsonutils.loads(cached['graph'])
+            old_member_dict = _apply_member_delta(loadbalancer_dict, delta)
+            if old_member_dict is not None:
+                graph = {'revision': delta['revision'],
+                         'graph': jsonutils.dumps(loadbalancer_dict)}
+                loadbalancer = data_models.LoadBalancer.from_dict(
+                    loadbalancer_dict)
+                pool = _find_pool(loadbalancer, delta['pool_id'])
+        if not pool:
+            LOG.debug('Member delta %(revision)s does not apply to the '
+                      'cached graph of loadbalancer %(lb)s, fetching it',
+                      {'revision': delta['revision'], 'lb': lb_id})
+            self._deploy_member_delta(driver, delta, cached, status_member)
+            return
+
+        old_member_dict.pop('pool', None)
+        old_member = data_models.Member.from_dict(old_member_dict)
+        old_member.pool = pool
+        member = old_member
+        for candidate in pool.members:
+            if candidate.id == delta['member_id']:
+                member = candidate
+        try:
+            if operation == lb_const.MEMBER_DELTA_CREATE:
+                driver.member.create(member)
+            elif operation == lb_const.MEMBER_DELTA_UPDATE:
+                driver.member.update(old_member, member)
+            else:
+                # the driver removes the member from its pool
+                pool.members.append(old_member)
+                driver.member.delete(old_member)
+        except Exception:
+            if self.graph_cache.get(lb_id) is cached:
+                self.graph_cache[lb_id] = {}
+            if operation == lb_const.MEMBER_DELTA_DELETE:
+                raise
+            self._handle_failed_driver_call(operation, member,
+                                            driver.get_name())
+            return
+        # Full payloads handled in the meantime invalidate the entry.
+        if self.graph_cache.get(lb_id) is cached:
+            self.graph_cache[lb_id] = graph
+        if operation != lb_const.MEMBER_DELTA_DELETE:
+            self._update_statuses(member)
+
+    def _deploy_member_delta(self, driver, delta, cached, status_member):
+        lb_id = delta['loadbalancer_id']
+        try:
+            loadbalancer, graph = self._get_graph(lb_id)
+            driver.deploy_instance(loadbalancer)
+        except Exception:
+            LOG.exception(_LE('Unable to deploy instance for '
+                              'loadbalancer: %s'), lb_id)
+            self.needs_resync = True
+            return
+        if self.graph_cache.get(lb_id) is cached:
+            self.graph_cache[lb_id] = graph
+        if delta['operation'] != lb_const.MEMBER_DELTA_DELETE:
+            self._update_statuses(status_member)
+
+    @_dispatched('healthmonitor')
     def create_healthmonitor(self, context, healthmonitor):
         healthmonitor = data_models.HealthMonitor.from_dict(healthmonitor)
         driver = self._get_driver(healthmonitor.pool.loadbalancer.id)
@@ -387,6 +818,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(healthmonitor)
 
+    @_dispatched('healthmonitor')
     def update_healthmonitor(self, context, old_healthmonitor,
                              healthmonitor):
         healthmonitor = data_models.HealthMonitor.from_dict(healthmonitor)
@@ -401,7 +833,70 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):
         else:
             self._update_statuses(healthmonitor)
 
+    @_dispatched('healthmonitor')
     def delete_healthmonitor(self, context, healthmonitor):
         healthmonitor = data_models.HealthMonitor.from_dict(healthmonitor)
         driver = self._get_driver(healthmonitor.pool.loadbalancer.id)
         driver.healthmonitor.delete(healthmonitor)
+
+    @_dispatched('l7policy')
+    def create_l7policy(self, context, l7policy):
+        l7policy = data_models.L7Policy.from_dict(l7policy)
+        driver = self._get_driver(l7policy.listener.loadbalancer.id)
+        try:
+            driver.l7policy.create(l7policy)
+        except Exception:
+            self._handle_failed_driver_call('create', l7policy,
+                                            driver.get_name())
+        else:
+            self._update_statuses(l7policy)
+
+    @_dispatched('l7policy')
+    def update_l7policy(self, context, old_l7policy, l7policy):
+        l7policy = data_models.L7Policy.from_dict(l7policy)
+        old_l7policy = data_models.L7Policy.from_dict(old_l7policy)
+        driver = self._get_driver(l7policy.listener.loadbalancer.id)
+        try:
+            driver.l7policy.update(old_l7policy, l7policy)
+        except Exception:
+            self._handle_failed_driver_call('update', l7policy,
+                                            driver.get_name())
+        else:
+            self._update_statuses(l7policy)
+
+    @_dispatched('l7policy')
+    def delete_l7policy(self, context, l7policy):
+        l7policy = data_models.L7Policy.from_dict(l7policy)
+        driver = self._get_driver(l7policy.listener.loadbalancer.id)
+        driver.l7policy.delete(l7policy)
+
+    @_dispatched('l7rule')
+    def create_l7rule(self, context, l7rule):
+        l7rule = data_models.L7Rule.from_dict(l7rule)
+        driver = self._get_driver(l7rule.policy.listener.loadbalancer.id)
+        try:
+            driver.l7rule.create(l7rule)
+        except Exception:
+            self._handle_failed_driver_call('create', l7rule,
+                                            driver.get_name())
+        else:
+            self._update_statuses(l7rule)
+
+    @_dispatched('l7rule')
+    def update_l7rule(self, context, old_l7rule, l7rule):
+        l7rule = data_models.L7Rule.from_dict(l7rule)
+        old_l7rule = data_models.L7Rule.from_dict(old_l7rule)
+        driver = self._get_driver(l7rule.policy.listener.loadbalancer.id)
+        try:
+            driver.l7rule.update(old_l7rule, l7rule)
+        except Exception:
+            self._handle_failed_driver_call('update', l7rule,
+                                            driver.get_name())
+        else:
+            self._update_statuses(l7rule)
+
+    @_dispatched('l7rule')
+    def delete_l7rule(self, context, l7rule):
+        l7rule = data_models.L7Rule.from_dict(l7rule)
+        driver = self._get_driver(l7rule.policy.listener.loadbalancer.id)
+        driver.l7rule.delete(l7rule)
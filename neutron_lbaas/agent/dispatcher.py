@@ -0,0 +1,108 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+
+import eventlet
+from eventlet import corolocal
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+from neutron_lbaas._i18n import _LE
+
+LOG = logging.getLogger(__name__)
+
+# the operation each worker runs
+_current = corolocal.local()
+
+
+def queued_at():
+    """Returns when the operation being run was queued.
+
+    A change made on the server before its operation was queued is in
+    place for everything fetched from the server from then on.
+
+    :returns: the time from oslo_utils.timeutils.now(), None outside of an
+              operation run by a dispatcher
+    """
+    return getattr(_current, 'queued', None)
+
+
+class LoadBalancerDispatcher(object):
+    """Runs operations in order per loadbalancer, in parallel across them.
+
+    Each loadbalancer has a queue of operations. A fixed number of workers
+    take turns among the loadbalancers with queued operations, each running
+    one operation of a loadbalancer no other worker holds.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        # loadbalancer_id->deque of (time queued, function, args, kwargs)
+        self._queues = {}
+        # loadbalancer ids with queued operations and no worker
+        self._ready = eventlet.queue.LightQueue()
+        self._started = False
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def dispatch(self, loadbalancer_id, func, *args, **kwargs):
+        queue = self._queues.get(loadbalancer_id)
+        if queue is None:
+            queue = self._queues[loadbalancer_id] = collections.deque()
+            self._ready.put(loadbalancer_id)
+        queue.append((timeutils.now(), func, args, kwargs))
+        if not self._started:
+            self._started = True
+            for _ in range(self.workers):
+                eventlet.spawn_n(self._work)
+
+    def get_stats(self):
+        """Returns the queue depth and the waits since the previous call."""
+        stats = {
+            'queued_operations': sum(len(queue)
+                                     for queue in self._queues.values()),
+            'queue_wait_avg': round(self._wait_total / max(self._waits, 1),
+                                    3),
+            'queue_wait_max': round(self._wait_max, 3)}
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        return stats
+
+    def _work(self):
+        while True:
+            loadbalancer_id = self._ready.get()
+            queue = self._queues[loadbalancer_id]
+            queued, func, args, kwargs = queue.popleft()
+            wait = timeutils.now() - queued
+            self._waits += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            _current.queued = queued
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                LOG.exception(_LE('%(operation)s failed on loadbalancer '
+                                  '%(lb)s'),
+                              {'operation': func.__name__,
+                               'lb': loadbalancer_id})
+            finally:
+                _current.queued = None
+            # Operations queued in the meantime were appended to queue.
+            if queue:
+                self._ready.put(loadbalancer_id)
+            else:
+                del self._queues[loadbalancer_id]
@@ -0,0 +1,89 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compact encoding of large RPC payloads.
+
+Loadbalancer graphs travel as nested dicts which oslo.messaging encodes as
+JSON, with every field name repeated for every member. Payloads above
+COMPRESS_MIN_SIZE are packed with msgpack, through oslo.serialization,
+or JSON, and compressed with zlib, which also folds the repeated field
+names. The result is base64 encoded, since the message itself is still
+JSON.
+"""
+
+import base64
+import zlib
+
+from oslo_serialization import jsonutils
+
+from neutron_lbaas._i18n import _
+
+try:
+    # msgpackutils passes the arguments the installed msgpack expects
+    from oslo_serialization import msgpackutils
+except ImportError:
+    msgpackutils = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+# Key marking an encoded payload
+ENCODED = 'lbaas_encoded_payload'
+# Smaller payloads gain little from compression, while base64 adds a third
+COMPRESS_MIN_SIZE = 8192
+
+
+def get_formats():
+    """Returns the formats this process can decode, preferred first."""
+    if msgpackutils:
+        return [MSGPACK, JSON]
+    return [JSON]
+
+
+def _pack(payload, payload_format):
+    if payload_format == MSGPACK:
+        return msgpackutils.dumps(payload)
+    return jsonutils.dump_as_bytes(payload)
+
+
+def encode(payload, formats):
+    """Encodes a payload in the first of formats also known here.
+
+    :param formats: formats the receiver decodes, preferred first
+    :returns: the encoded payload, or payload itself if it is too small or
+              there is no common format
+    """
+    known_formats = get_formats()
+    payload_format = next((payload_format for payload_format in formats
+                           if payload_format in known_formats), None)
+    if not payload_format:
+        return payload
+    data = _pack(payload, payload_format)
+    if len(data) < COMPRESS_MIN_SIZE:
+        return payload
+    data = base64.b64encode(zlib.compress(data))
+    return {ENCODED: {'format': payload_format,
+                      'data': data.decode('ascii')}}
+
+
+def decode(payload):
+    """Returns the original of a payload made by encode."""
+    if not isinstance(payload, dict) or ENCODED not in payload:
+        return payload
+    payload_format = payload[ENCODED]['format']
+    if payload_format not in get_formats():
+        raise ValueError(_('Unknown payload format %s') % payload_format)
+    data = zlib.decompress(base64.b64decode(payload[ENCODED]['data']))
+    if payload_format == MSGPACK:
+        return msgpackutils.loads(data)
+    return jsonutils.loads(data)
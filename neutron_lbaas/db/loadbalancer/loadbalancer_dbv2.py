@@ -341,6 +341,27 @@ class LoadBalancerPluginDbv2(base_db.CommonDbMixin,
         lb_db = self._get_resource(context, models.LoadBalancer, id)
         return data_models.LoadBalancer.from_sqlalchemy_model(lb_db)
 
+    def get_loadbalancer_revision(self, context, id):
+        revision = (context.session.query(models.LoadBalancer.revision).
+                    filter(models.LoadBalancer.id == id).scalar())
+        if revision is None:
+            raise loadbalancerv2.EntityNotFound(
+                name=models.LoadBalancer.NAME, id=id)
+        return revision
+
+    def bump_loadbalancer_revision(self, context, id):
+        """Increments and returns the revision of a load balancer graph.
+
+        The increment is a single UPDATE so that concurrent API workers
+        never hand out the same revision twice.
+        """
+        with context.session.begin(subtransactions=True):
+            (context.session.query(models.LoadBalancer).
+             filter(models.LoadBalancer.id == id).
+             update({'revision': models.LoadBalancer.revision + 1},
+                    synchronize_session=False))
+            return self.get_loadbalancer_revision(context, id)
+
     def _validate_listener_data(self, context, listener):
         pool_id = listener.get('default_pool_id')
         lb_id = listener.get('loadbalancer_id')
@@ -735,6 +756,111 @@ class LoadBalancerPluginDbv2(base_db.CommonDbMixin,
             lb_db.stats = self._create_loadbalancer_stats(context,
                                                           loadbalancer_id,
                                                           data=stats_data)
+            self.update_members_operating_status(
+                context, stats_data.get('members'))
+
+    def update_loadbalancer_stats_bulk(self, context, stats):
+        """Updates the statistics of many load balancers at once.
+
+        :param stats: dictionary of load balancer id to statistics
+        Only the statistics present in the update are changed. Load
+        balancers which were deleted in the meantime are skipped.
+        """
+        if not stats:
+            return
+        model = models.LoadBalancerStatistics
+        members_stats = {}
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(model)
+            query = query.filter(model.loadbalancer_id.in_(list(stats)))
+            for stats_db in query:
+                data = stats[stats_db.loadbalancer_id] or {}
+                for key in (lb_const.STATS_IN_BYTES,
+                            lb_const.STATS_OUT_BYTES,
+                            lb_const.STATS_ACTIVE_CONNECTIONS,
+                            lb_const.STATS_TOTAL_CONNECTIONS):
+                    if key in data:
+                        setattr(stats_db, key, data[key])
+                members_stats.update(data.get('members') or {})
+            self.update_members_operating_status(context, members_stats)
+
+    def update_members_operating_status(self, context, members_stats):
+        """Sets the operating status of members from their statistics.
+
+        :param members_stats: dictionary of member id to member statistics
+        The pools, listeners and load balancers of the members are then
+        set DEGRADED if one of their enabled members is OFFLINE and back
+        to ONLINE otherwise. Only the rows whose status changes are
+        written.
+        """
+        member_ids_by_status = {}
+        for member_id, member_stats in (members_stats or {}).items():
+            status = _get_member_operating_status(member_stats)
+            if status:
+                member_ids_by_status.setdefault(status, []).append(member_id)
+        if not member_ids_by_status:
+            return
+        member_ids = [member_id for ids in member_ids_by_status.values()
+                      for member_id in ids]
+        with context.session.begin(subtransactions=True):
+            for status, ids in member_ids_by_status.items():
+                query = context.session.query(models.MemberV2)
+                query = query.filter(
+                    models.MemberV2.id.in_(ids),
+                    models.MemberV2.operating_status != status)
+                query.update({'operating_status': status},
+                             synchronize_session=False)
+
+            query = context.session.query(models.PoolV2.id,
+                                          models.PoolV2.loadbalancer_id)
+            query = query.join(models.MemberV2,
+                               models.MemberV2.pool_id == models.PoolV2.id)
+            query = query.filter(models.MemberV2.id.in_(member_ids))
+            pools = dict(query.distinct())
+            if not pools:
+                return
+            up = True  # makes pep8 and sqlalchemy happy
+            query = context.session.query(models.MemberV2.pool_id)
+            query = query.filter(
+                models.MemberV2.pool_id.in_(list(pools)),
+                models.MemberV2.admin_state_up == up,
+                models.MemberV2.operating_status == lb_const.OFFLINE)
+            degraded = set(pool_id for pool_id, in query.distinct())
+            self._roll_up_operating_status(context, models.PoolV2,
+                                           set(pools), degraded)
+
+            query = context.session.query(models.Listener.id,
+                                          models.Listener.default_pool_id)
+            query = query.filter(
+                models.Listener.default_pool_id.in_(list(pools)))
+            listeners = dict(query)
+            self._roll_up_operating_status(
+                context, models.Listener, set(listeners),
+                set(listener_id for listener_id, pool_id in listeners.items()
+                    if pool_id in degraded))
+
+            lb_ids = set(pools.values())
+            query = context.session.query(models.PoolV2.loadbalancer_id)
+            query = query.filter(
+                models.PoolV2.loadbalancer_id.in_(list(lb_ids)),
+                models.PoolV2.operating_status == lb_const.DEGRADED)
+            degraded = set(lb_id for lb_id, in query.distinct())
+            self._roll_up_operating_status(context, models.LoadBalancer,
+                                           lb_ids, degraded)
+
+    def _roll_up_operating_status(self, context, model, ids, degraded_ids):
+        # Only ONLINE and DEGRADED are switched, any other operating status
+        # was set by the driver on purpose and is left alone.
+        for status, old_status, status_ids in (
+                (lb_const.DEGRADED, lb_const.ONLINE, degraded_ids),
+                (lb_const.ONLINE, lb_const.DEGRADED, ids - degraded_ids)):
+            if not status_ids:
+                continue
+            query = context.session.query(model)
+            query = query.filter(model.id.in_(list(status_ids)),
+                                 model.operating_status == old_status)
+            query.update({'operating_status': status},
+                         synchronize_session=False)
 
     def stats(self, context, loadbalancer_id):
         loadbalancer = self._get_resource(context, models.LoadBalancer,
@@ -883,6 +1009,17 @@ class LoadBalancerPluginDbv2(base_db.CommonDbMixin,
                 for rule_db in rule_dbs]
 
 
+def _get_member_operating_status(member_stats):
+    status = member_stats.get(lb_const.STATS_STATUS)
+    if status == constants.INACTIVE:
+        return lb_const.OFFLINE
+    if status == constants.ACTIVE:
+        # haproxy reports no check status for members it does not monitor
+        if member_stats.get(lb_const.STATS_HEALTH):
+            return lb_const.ONLINE
+        return lb_const.NO_MONITOR
+
+
 def _prevent_lbaasv2_port_delete_callback(resource, event, trigger, **kwargs):
     context = kwargs['context']
     port_id = kwargs['port_id']
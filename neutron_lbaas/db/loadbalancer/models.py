@@ -156,6 +156,7 @@ class LoadBalancer(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     )
     flavor_id = sa.Column(sa.String(36), sa.ForeignKey(
         'flavors.id', name='fk_lbaas_loadbalancers_flavors_id'))
+    revision = sa.Column(sa.Integer(), nullable=False, server_default='0')
 
     @property
     def root_loadbalancer(self):
@@ -0,0 +1,34 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add loadbalancer revision
+
+Revision ID: 63ed1fcd1bdc
+Revises: 844352f9fe6f
+Create Date: 2016-08-02 10:14:27.318245
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '63ed1fcd1bdc'
+down_revision = '844352f9fe6f'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('lbaas_loadbalancers', sa.Column(
+        u'revision', sa.Integer(), nullable=False, server_default='0'))
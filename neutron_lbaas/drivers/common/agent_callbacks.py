@@ -13,12 +13,15 @@
 #    under the License.
 
 from neutron.extensions import portbindings
+from neutron import manager
 from neutron.plugins.common import constants
 from neutron_lib import exceptions as n_exc
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 
 from neutron_lbaas._i18n import _, _LW
+from neutron_lbaas.common import payload_codec
 from neutron_lbaas.db.loadbalancer import loadbalancer_dbv2
 from neutron_lbaas.db.loadbalancer import models as db_models
 from neutron_lbaas.services.loadbalancer import data_models
@@ -30,7 +33,9 @@ class LoadBalancerCallbacks(object):
 
     # history
     #   1.0 Initial version
-    target = messaging.Target(version='1.0')
+    #   1.1 Add update_loadbalancer_stats_bulk
+    #   1.2 Add formats to get_loadbalancer
+    target = messaging.Target(version='1.2')
 
     def __init__(self, plugin):
         super(LoadBalancerCallbacks, self).__init__()
@@ -63,7 +68,11 @@ class LoadBalancerCallbacks(object):
                 loadbalancer_dbv2.models.LoadBalancer.admin_state_up == up)
             return [id for id, in qry]
 
-    def get_loadbalancer(self, context, loadbalancer_id=None):
+    def get_loadbalancer(self, context, loadbalancer_id=None, formats=None):
+        # The revision is read first, the graph read afterwards contains
+        # at least every change up to it.
+        revision = self.plugin.db.get_loadbalancer_revision(context,
+                                                            loadbalancer_id)
         lb_model = self.plugin.db.get_loadbalancer(context, loadbalancer_id)
         if lb_model.vip_port and lb_model.vip_port.fixed_ips:
             for fixed_ip in lb_model.vip_port.fixed_ips:
@@ -76,10 +85,43 @@ class LoadBalancerCallbacks(object):
             device_driver = self.plugin.drivers[
                 lb_model.provider.provider_name].device_driver
             setattr(lb_model.provider, 'device_driver', device_driver)
+        if lb_model.flavor_id:
+            setattr(lb_model, 'flavor_metadata', self._get_flavor_metadata(
+                context, lb_model.flavor_id))
         lb_dict = lb_model.to_dict(stats=False)
+        lb_dict['revision'] = revision
 
+        if formats:
+            return payload_codec.encode(lb_dict, formats)
         return lb_dict
 
+    def _get_flavor_metadata(self, context, flavor_id):
+        """Returns the metainfo of the service profile of a flavor.
+
+        The loadbalancer provider is selected from the first service profile
+        of the flavor, so its metainfo applies to the loadbalancer.
+        """
+        flavors_plugin = manager.NeutronManager.get_service_plugins().get(
+            constants.FLAVORS)
+        if not flavors_plugin:
+            return {}
+        flavor = flavors_plugin.get_flavor(context, flavor_id)
+        if not flavor['service_profiles']:
+            return {}
+        profile = flavors_plugin.get_service_profile(
+            context, flavor['service_profiles'][0])
+        if not profile.get('metainfo'):
+            return {}
+        try:
+            metadata = jsonutils.loads(profile['metainfo'])
+        except ValueError:
+            metadata = None
+        if not isinstance(metadata, dict):
+            LOG.warning(_LW('Ignoring metainfo of service profile %s, it is '
+                            'not a JSON object'), profile['id'])
+            return {}
+        return metadata
+
     def loadbalancer_deployed(self, context, loadbalancer_id):
         with context.session.begin(subtransactions=True):
             qry = context.session.query(db_models.LoadBalancer)
@@ -125,7 +167,9 @@ class LoadBalancerCallbacks(object):
             'pool': db_models.PoolV2,
             'listener': db_models.Listener,
             'member': db_models.MemberV2,
-            'healthmonitor': db_models.HealthMonitorV2
+            'healthmonitor': db_models.HealthMonitorV2,
+            'l7policy': db_models.L7Policy,
+            'l7rule': db_models.L7Rule
         }
         if obj_type not in model_mapping:
             raise n_exc.Invalid(_('Unknown object type: %s') % obj_type)
@@ -207,3 +251,10 @@ class LoadBalancerCallbacks(object):
                                   stats=None):
         self.plugin.db.update_loadbalancer_stats(context, loadbalancer_id,
                                                  stats)
+
+    def update_loadbalancer_stats_bulk(self, context, stats=None):
+        """Stores the statistics an agent collected in one cycle.
+
+        :param stats: dictionary of load balancer id to statistics
+        """
+        self.plugin.db.update_loadbalancer_stats_bulk(context, stats)
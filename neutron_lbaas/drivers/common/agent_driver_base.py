@@ -39,6 +39,10 @@ AGENT_SCHEDULER_OPTS = [
 
 cfg.CONF.register_opts(AGENT_SCHEDULER_OPTS)
 
+# Member attributes which are not part of member deltas, the operating
+# status is reported by the agent itself.
+MEMBER_DELTA_SKIPPED_FIELDS = ('pool', 'operating_status')
+
 
 class DriverNotSpecified(n_exc.NeutronException):
     message = _("Device driver for agent should be specified "
@@ -54,15 +58,49 @@ class DataModelSerializer(object):
             return entity
 
 
+def get_member_delta(operation, member, revision, old_member=None):
+    """Builds the message describing the change of a single member.
+
+    Next to the ids of the member and its parents and the revision of the
+    load balancer graph the change results in, only the fields of the
+    member which differ from old_member are sent, along with their old
+    values so that the agent can tell whether its copy is current.
+    """
+    delta = {'operation': operation,
+             'loadbalancer_id': member.pool.loadbalancer.id,
+             'pool_id': member.pool.id,
+             'member_id': member.id,
+             'revision': revision}
+    if operation == lb_const.MEMBER_DELTA_DELETE:
+        return delta
+    fields = {}
+    old_fields = {}
+    for field in data_models.Member.fields:
+        if field in MEMBER_DELTA_SKIPPED_FIELDS:
+            continue
+        value = getattr(member, field)
+        if old_member is None:
+            fields[field] = value
+        elif getattr(old_member, field) != value:
+            fields[field] = value
+            old_fields[field] = getattr(old_member, field)
+    delta['member'] = fields
+    if old_member is not None:
+        delta['old_member'] = old_fields
+    return delta
+
+
 class LoadBalancerAgentApi(object):
     """Plugin side of plugin to agent RPC API."""
 
     # history
     #   1.0 Initial version
+    #   1.1 Add L7 policy and rule methods
+    #   1.2 Add member_delta
     #
 
     def __init__(self, topic):
-        target = messaging.Target(topic=topic, version='1.0')
+        target = messaging.Target(topic=topic, version='1.1')
         self.client = n_rpc.get_client(target,
                                        serializer=DataModelSerializer())
 
@@ -126,6 +164,10 @@ class LoadBalancerAgentApi(object):
         cctxt = self.client.prepare(server=host)
         cctxt.cast(context, 'delete_member', member=member)
 
+    def member_delta(self, context, delta, host):
+        cctxt = self.client.prepare(server=host, version='1.2')
+        cctxt.cast(context, 'member_delta', delta=delta)
+
     def create_healthmonitor(self, context, healthmonitor, host):
         cctxt = self.client.prepare(server=host)
         cctxt.cast(context, 'create_healthmonitor',
@@ -143,6 +185,32 @@ class LoadBalancerAgentApi(object):
         cctxt.cast(context, 'delete_healthmonitor',
                    healthmonitor=healthmonitor)
 
+    def create_l7policy(self, context, l7policy, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'create_l7policy', l7policy=l7policy)
+
+    def update_l7policy(self, context, old_l7policy, l7policy, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'update_l7policy', old_l7policy=old_l7policy,
+                   l7policy=l7policy)
+
+    def delete_l7policy(self, context, l7policy, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'delete_l7policy', l7policy=l7policy)
+
+    def create_l7rule(self, context, l7rule, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'create_l7rule', l7rule=l7rule)
+
+    def update_l7rule(self, context, old_l7rule, l7rule, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'update_l7rule', old_l7rule=old_l7rule,
+                   l7rule=l7rule)
+
+    def delete_l7rule(self, context, l7rule, host):
+        cctxt = self.client.prepare(server=host)
+        cctxt.cast(context, 'delete_l7rule', l7rule=l7rule)
+
 
 class LoadBalancerManager(driver_base.BaseLoadBalancerManager):
 
@@ -241,18 +309,39 @@ class PoolManager(driver_base.BasePoolManager):
 
 class MemberManager(driver_base.BaseMemberManager):
 
+    def _send_delta(self, context, agent, operation, member,
+                    old_member=None):
+        """Sends the change as a member delta if the agent accepts them.
+
+        :returns: True if the delta was sent, False if the agent needs the
+                  full member graph
+        """
+        if not agent.get('configurations', {}).get(
+                lb_const.AGENT_MEMBER_DELTAS):
+            return False
+        revision = self.driver.plugin.db.bump_loadbalancer_revision(
+            context, member.pool.loadbalancer.id)
+        delta = get_member_delta(operation, member, revision, old_member)
+        self.driver.agent_rpc.member_delta(context, delta, agent['host'])
+        return True
+
     def update(self, context, old_member, member):
         super(MemberManager, self).update(context, old_member, member)
         agent = self.driver.get_loadbalancer_agent(
             context, member.pool.loadbalancer.id)
-        self.driver.agent_rpc.update_member(context, old_member, member,
-                                            agent['host'])
+        if not self._send_delta(context, agent, lb_const.MEMBER_DELTA_UPDATE,
+                                member, old_member):
+            self.driver.agent_rpc.update_member(context, old_member, member,
+                                                agent['host'])
 
     def create(self, context, member):
         super(MemberManager, self).create(context, member)
         agent = self.driver.get_loadbalancer_agent(
             context, member.pool.loadbalancer.id)
-        self.driver.agent_rpc.create_member(context, member, agent['host'])
+        if not self._send_delta(context, agent, lb_const.MEMBER_DELTA_CREATE,
+                                member):
+            self.driver.agent_rpc.create_member(context, member,
+                                                agent['host'])
 
     def delete(self, context, member):
         super(MemberManager, self).delete(context, member)
@@ -264,7 +353,10 @@ class MemberManager(driver_base.BaseMemberManager):
         self.driver.plugin.db.delete_pool_member(context, member.id)
         self.driver.plugin.db.update_loadbalancer_provisioning_status(
             context, member.pool.loadbalancer.id)
-        self.driver.agent_rpc.delete_member(context, member, agent['host'])
+        if not self._send_delta(context, agent, lb_const.MEMBER_DELTA_DELETE,
+                                member):
+            self.driver.agent_rpc.delete_member(context, member,
+                                                agent['host'])
 
 
 class HealthMonitorManager(driver_base.BaseHealthMonitorManager):
@@ -298,6 +390,64 @@ class HealthMonitorManager(driver_base.BaseHealthMonitorManager):
             context, healthmonitor, agent['host'])
 
 
+class L7PolicyManager(driver_base.BaseL7PolicyManager):
+
+    def update(self, context, old_l7policy, l7policy):
+        super(L7PolicyManager, self).update(context, old_l7policy, l7policy)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.update_l7policy(context, old_l7policy, l7policy,
+                                              agent['host'])
+
+    def create(self, context, l7policy):
+        super(L7PolicyManager, self).create(context, l7policy)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.create_l7policy(context, l7policy,
+                                              agent['host'])
+
+    def delete(self, context, l7policy):
+        super(L7PolicyManager, self).delete(context, l7policy)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7policy.listener.loadbalancer.id)
+        # TODO(blogan): Rethink deleting from the database and updating the lb
+        # status here. May want to wait until the agent actually deletes it.
+        # Doing this now to keep what v1 had.
+        self.driver.plugin.db.delete_l7policy(context, l7policy.id)
+        self.driver.plugin.db.update_loadbalancer_provisioning_status(
+            context, l7policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.delete_l7policy(context, l7policy,
+                                              agent['host'])
+
+
+class L7RuleManager(driver_base.BaseL7RuleManager):
+
+    def update(self, context, old_l7rule, l7rule):
+        super(L7RuleManager, self).update(context, old_l7rule, l7rule)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7rule.policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.update_l7rule(context, old_l7rule, l7rule,
+                                            agent['host'])
+
+    def create(self, context, l7rule):
+        super(L7RuleManager, self).create(context, l7rule)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7rule.policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.create_l7rule(context, l7rule, agent['host'])
+
+    def delete(self, context, l7rule):
+        super(L7RuleManager, self).delete(context, l7rule)
+        agent = self.driver.get_loadbalancer_agent(
+            context, l7rule.policy.listener.loadbalancer.id)
+        # TODO(blogan): Rethink deleting from the database and updating the lb
+        # status here. May want to wait until the agent actually deletes it.
+        # Doing this now to keep what v1 had.
+        self.driver.plugin.db.delete_l7policy_rule(context, l7rule.id)
+        self.driver.plugin.db.update_loadbalancer_provisioning_status(
+            context, l7rule.policy.listener.loadbalancer.id)
+        self.driver.agent_rpc.delete_l7rule(context, l7rule, agent['host'])
+
+
 class AgentDriverBase(driver_base.LoadBalancerBaseDriver):
 
     # name of device driver that should be used by the agent;
@@ -314,6 +464,8 @@ class AgentDriverBase(driver_base.LoadBalancerBaseDriver):
         self.pool = PoolManager(self)
         self.member = MemberManager(self)
         self.health_monitor = HealthMonitorManager(self)
+        self.l7policy = L7PolicyManager(self)
+        self.l7rule = L7RuleManager(self)
 
         self.agent_rpc = LoadBalancerAgentApi(lb_const.LOADBALANCER_AGENTV2)
 
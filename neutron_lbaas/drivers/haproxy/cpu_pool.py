@@ -0,0 +1,102 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron_lib import exceptions as n_exc
+
+from neutron_lbaas._i18n import _
+
+
+class InvalidCpuList(n_exc.InvalidInput):
+    message = _('Invalid CPU list "%(cpu_list)s", expected CPU numbers and '
+                'ranges separated by commas, e.g. "2-7,10"')
+
+
+def parse_cpu_list(cpu_list):
+    """Parses a CPU list like "2-7,10" into a sorted list of CPU numbers."""
+    cpus = set()
+    try:
+        for item in cpu_list.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            first, _sep, last = item.partition('-')
+            first = int(first)
+            last = int(last) if last else first
+            if first < 0 or last < first:
+                raise ValueError(item)
+            cpus.update(range(first, last + 1))
+    except ValueError:
+        raise InvalidCpuList(cpu_list=cpu_list)
+    return sorted(cpus)
+
+
+class CpuPool(object):
+    """Hands out disjoint sets of host CPUs to loadbalancers.
+
+    Assignments only live in memory, they are rebuilt as the agent deploys
+    its loadbalancers again after a restart.
+    """
+
+    def __init__(self, cpus):
+        self.cpus = sorted(set(cpus))
+        self.assignments = {}
+
+    def free_cpus(self):
+        assigned = set()
+        for cpus in self.assignments.values():
+            assigned.update(cpus)
+        return [cpu for cpu in self.cpus if cpu not in assigned]
+
+    def allocate(self, owner, count):
+        """Returns count CPUs dedicated to owner.
+
+        A previous assignment of the same size is kept, so that reloads do
+        not move haproxy threads around.
+
+        :returns: list of CPU numbers, or None if the pool has not enough
+                  free CPUs left
+        """
+        assigned = self.assignments.get(owner)
+        if assigned is not None and len(assigned) == count:
+            return assigned
+        self.release(owner)
+        free = self.free_cpus()
+        if len(free) < count:
+            return None
+        self.assignments[owner] = free[:count]
+        return self.assignments[owner]
+
+    def adopt(self, owner, cpus):
+        """Records CPUs an owner was given before the agent restarted.
+
+        :returns: True, or False if some of the CPUs are not in the pool or
+                  assigned to another owner
+        """
+        self.release(owner)
+        cpus = sorted(set(cpus))
+        free = self.free_cpus()
+        if not all(cpu in free for cpu in cpus):
+            return False
+        self.assignments[owner] = cpus
+        return True
+
+    def release(self, owner):
+        self.assignments.pop(owner, None)
+
+    def report(self):
+        """Returns the capacity of the pool and the current assignments."""
+        return {'cpus_total': len(self.cpus),
+                'cpus_free': len(self.free_cpus()),
+                'assignments': dict((owner, list(cpus)) for owner, cpus
+                                    in self.assignments.items())}
@@ -0,0 +1,134 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import csv
+import socket
+
+from neutron_lib import exceptions as n_exc
+from oslo_utils import encodeutils
+
+from neutron_lbaas._i18n import _
+
+RECV_SIZE = 8192
+SOCKET_TIMEOUT = 5
+
+
+class HaproxyRuntimeError(n_exc.NeutronException):
+    message = _('haproxy rejected runtime command "%(command)s": %(error)s')
+
+
+class HaproxySocket(object):
+    """Client for the stats socket of a single haproxy instance.
+
+    haproxy answers every command on the stats socket and then closes the
+    connection, so each call opens a new connection and reads until EOF.
+    """
+
+    def __init__(self, socket_path, timeout=SOCKET_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        try:
+            s.connect(self.socket_path)
+        except socket.error:
+            s.close()
+            raise
+        return s
+
+    def ping(self):
+        """Returns True if haproxy accepts connections on the socket."""
+        try:
+            self._connect().close()
+        except socket.error:
+            return False
+        return True
+
+    def execute(self, command):
+        """Sends a command and returns the complete response."""
+        s = self._connect()
+        try:
+            s.sendall(encodeutils.safe_encode(command + '\n'))
+            chunks = []
+            while True:
+                chunk = s.recv(RECV_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            s.close()
+        return encodeutils.safe_decode(b''.join(chunks))
+
+    def _iter_lines(self, command):
+        """Sends a command and yields the response line by line.
+
+        Only one partially received line is buffered at a time, so the
+        response can be much bigger than what is kept in memory.
+        """
+        s = self._connect()
+        try:
+            s.sendall(encodeutils.safe_encode(command + '\n'))
+            pending = b''
+            while True:
+                chunk = s.recv(RECV_SIZE)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    yield encodeutils.safe_decode(line)
+            if pending:
+                yield encodeutils.safe_decode(pending)
+        finally:
+            s.close()
+
+    def show_stat(self, entity_type=-1, columns=None):
+        """Yields the rows of "show stat" as dictionaries.
+
+        :param entity_type: bitmask of proxy types haproxy should report
+        :param columns: names of the columns to keep, all if not given
+        """
+        lines = self._iter_lines('show stat -1 %s -1' % entity_type)
+        try:
+            header = next(lines, '')
+            if not header.startswith('#'):
+                return
+            names = [name.strip()
+                     for name in header.lstrip('# ').split(',')]
+            wanted = [(index, name) for index, name in enumerate(names)
+                      if name and (columns is None or name in columns)]
+            for row in csv.reader(line for line in lines if line.strip()):
+                yield dict((name, row[index].strip())
+                           for index, name in wanted if index < len(row))
+        finally:
+            lines.close()
+
+    def run_commands(self, commands):
+        """Runs state changing commands in a single round-trip.
+
+        Successful commands print nothing, so any output is an error.
+
+        :raises HaproxyRuntimeError: if haproxy rejected any of the commands
+        """
+        if not commands:
+            return
+        command = ';'.join(commands)
+        errors = [line.strip()
+                  for line in self.execute(command).splitlines()
+                  if line.strip()]
+        if errors:
+            raise HaproxyRuntimeError(command=command,
+                                      error='; '.join(errors))
@@ -0,0 +1,70 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.agent.linux import utils as linux_utils
+from neutron_lib import exceptions as n_exc
+
+from neutron_lbaas._i18n import _
+
+# The root helper filters only see "ip netns exec <ns> ip -batch -", not
+# the commands read from stdin, so a batch is only as safe as the agent
+# building it. These checks catch mistakes of the agent, they are no
+# security boundary.
+BATCH_OBJECTS = ('addr', 'route')
+FORBIDDEN_ARGUMENTS = ('netns', 'exec')
+
+
+class InvalidIpArgument(n_exc.InvalidInput):
+    message = _('Invalid ip command argument "%(argument)s", arguments must '
+                'not be empty or contain whitespace')
+
+
+class InvalidIpCommand(n_exc.InvalidInput):
+    message = _('Invalid ip command "%(command)s", only addr and route '
+                'commands can be batched')
+
+
+class IpBatch(object):
+    """Runs ip commands inside a namespace with a single root helper call.
+
+    Each call through the root helper costs tens of milliseconds, so
+    commands are collected and handed to "ip -batch" at once. ip stops at
+    the first failing command, commands should be idempotent, e.g.
+    "route replace" rather than "route add". Only addr and route commands
+    are accepted.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.commands = []
+
+    def add(self, *args):
+        """Adds an ip command, given without the leading "ip"."""
+        if (not args or args[0] not in BATCH_OBJECTS or
+                set(args) & set(FORBIDDEN_ARGUMENTS)):
+            raise InvalidIpCommand(command=' '.join(args))
+        for arg in args:
+            if not arg or len(arg.split()) != 1:
+                raise InvalidIpArgument(argument=arg)
+        self.commands.append(' '.join(args))
+
+    def execute(self):
+        """Runs and forgets the collected commands."""
+        if not self.commands:
+            return
+        script = '\n'.join(self.commands) + '\n'
+        self.commands = []
+        linux_utils.execute(['ip', 'netns', 'exec', self.namespace,
+                             'ip', '-batch', '-'],
+                            process_input=script, run_as_root=True)
@@ -14,9 +14,11 @@
 #    under the License.
 
 import os
+import re
 import shutil
 import socket
 
+import eventlet
 import netaddr
 from neutron.agent.linux import ip_lib
 from neutron.agent.linux import utils as linux_utils
@@ -25,10 +27,16 @@ from neutron.plugins.common import constants
 from neutron_lib import exceptions
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
+from oslo_utils import timeutils
 
 from neutron_lbaas._i18n import _, _LI, _LE, _LW
 from neutron_lbaas.agent import agent_device_driver
+from neutron_lbaas.agent import dispatcher
+from neutron_lbaas.drivers.haproxy import cpu_pool
+from neutron_lbaas.drivers.haproxy import haproxy_socket
+from neutron_lbaas.drivers.haproxy import ip_batch
 from neutron_lbaas.services.loadbalancer import constants as lb_const
 from neutron_lbaas.services.loadbalancer import data_models
 from neutron_lbaas.services.loadbalancer.drivers.haproxy import jinja_cfg
@@ -41,11 +49,124 @@ STATS_TYPE_BACKEND_REQUEST = 2
 STATS_TYPE_BACKEND_RESPONSE = '1'
 STATS_TYPE_SERVER_REQUEST = 4
 STATS_TYPE_SERVER_RESPONSE = '2'
+STATS_MEMBER_COLUMNS = ('type', 'svname', 'status', 'check_status',
+                        'chkfail')
+# haproxy statuses of servers which do not receive traffic, transitional
+# states like "DOWN 1/2" are reported with the number of checks appended
+MEMBER_DOWN_STATUSES = ('DOWN', 'MAINT')
 DRIVER_NAME = 'haproxy_ns'
 
 STATE_PATH_V2_APPEND = 'v2'
+# compiled Jinja templates are kept next to the loadbalancer configurations
+TEMPLATE_CACHE_DIR = 'templates'
+# what is needed to serve a loadbalancer again after a restart of the agent
+SNAPSHOT_FILE = 'snapshot.json'
+
+HAPROXY_VERSION_RE = re.compile(r'HA-?Proxy version (\d+)\.(\d+)')
+# haproxy can take the listening sockets over from the old process on
+# reload (-x and "expose-fd listeners") since 1.8
+SEAMLESS_RELOAD_VERSION = (1, 8)
+MASTER_WORKER_VERSION = (1, 8)
+MASTER_WORKER_ARG = '-W'
+# haproxy runs several threads per process (nbthread) since 1.8
+THREADS_VERSION = (1, 8)
+# Names of tune.* settings and their values end up in the haproxy
+# configuration as they are
+TUNE_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9.-]*$')
+TUNE_VALUE_RE = re.compile(r'^\S+$')
+# CPUs a configuration pins haproxy to, see _get_global_opts
+CPU_MAP_RE = re.compile(r'^\s*cpu-map (?:auto:1/1-\d+|1) (?P<cpus>[\d ]+)$',
+                        re.MULTILINE)
+
+# Member attributes haproxy can change without a reload
+RUNTIME_MEMBER_ATTRS = ('weight', 'admin_state_up')
+# Member attributes that do not end up in the haproxy configuration
+MEMBER_IGNORED_ATTRS = ('name', 'tenant_id', 'pool', 'operating_status',
+                        'provisioning_status')
+# Map commands sent to haproxy per request, to stay within its line buffer
+MAP_COMMANDS_PER_REQUEST = 50
+# Keys the stats socket would split into several arguments or commands
+MAP_RUNTIME_KEY_RE = re.compile(r'^[^\s;\\]+$')
+# orphaned loadbalancers checked and undeployed concurrently
+ORPHAN_WORKERS = 8
+
+OPTS = [
+    cfg.BoolOpt(
+        'enable_runtime_api',
+        default=True,
+        help=_('Apply member weight and admin state changes, and changes '
+               'to L7 rules looked up in map files, through the haproxy '
+               'stats socket instead of reloading haproxy. Requires the '
+               'stats socket to be opened at admin level, which restricts '
+               'it to root.'),
+    ),
+    cfg.FloatOpt(
+        'refresh_coalesce_window',
+        default=0.5,
+        min=0,
+        help=_('Seconds to wait before refreshing a loadbalancer, so that '
+               'all changes made to it in the meantime are applied with a '
+               'single reload of haproxy. Their statuses are reported once '
+               'that reload is done. 0 refreshes immediately.'),
+    ),
+    cfg.BoolOpt(
+        'seamless_reload',
+        default=True,
+        help=_('Hand the listening sockets of the running haproxy over to '
+               'the new process on reload, so that no connection is '
+               'refused in between. Only used with haproxy 1.8 or newer. '
+               'Restricts the stats socket to root.'),
+    ),
+    cfg.BoolOpt(
+        'master_worker',
+        default=False,
+        help=_('Run haproxy in master-worker mode and reload it by '
+               'signaling its master process instead of starting a new '
+               'haproxy. Requires haproxy 1.8 or newer.'),
+    ),
+    cfg.IntOpt(
+        'hard_stop_after',
+        default=0,
+        min=0,
+        help=_('Seconds an old haproxy process may keep serving its '
+               'established connections after a reload before it is '
+               'stopped. 0 waits until all connections are closed.'),
+    ),
+    cfg.IntOpt(
+        'nbthread',
+        default=1,
+        min=1,
+        help=_('Number of threads of each haproxy process. Requires '
+               'haproxy 1.8 or newer. The "nbthread" key of the flavor '
+               'metadata of a loadbalancer overrides it.'),
+    ),
+    cfg.StrOpt(
+        'cpu_pool',
+        default='',
+        help=_('Host CPUs haproxy may be pinned to, e.g. "2-15,18". Each '
+               'loadbalancer gets as many CPUs of its own as it has '
+               'threads. Loadbalancers are not pinned when the pool is '
+               'exhausted or empty.'),
+    ),
+    cfg.IntOpt(
+        'maxconn',
+        default=0,
+        min=0,
+        help=_('Maximum number of concurrent connections of each haproxy '
+               'process. 0 keeps the haproxy default. The "maxconn" key '
+               'of the flavor metadata overrides it.'),
+    ),
+    cfg.DictOpt(
+        'tune_options',
+        default={},
+        help=_('haproxy tune.* settings of each haproxy process, without '
+               'the "tune." prefix, e.g. "bufsize:32768". The "tune" key '
+               'of the flavor metadata adds to them.'),
+    ),
+]
 
 cfg.CONF.register_opts(namespace_driver.OPTS, 'haproxy')
+cfg.CONF.register_opts(OPTS, 'haproxy')
 
 
 def get_ns_name(namespace_id):
@@ -70,12 +191,57 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
                 LOG.error(msg)
 
         self.vif_driver = vif_driver_class(conf)
+        self._prepare_templates()
+        self.haproxy_version = get_haproxy_version()
+        self.seamless_reload = bool(
+            conf.haproxy.seamless_reload and self.haproxy_version and
+            self.haproxy_version >= SEAMLESS_RELOAD_VERSION)
+        self.master_worker = bool(
+            conf.haproxy.master_worker and self.haproxy_version and
+            self.haproxy_version >= MASTER_WORKER_VERSION)
+        if conf.haproxy.master_worker and not self.master_worker:
+            LOG.warning(_LW('haproxy master-worker mode requires haproxy '
+                            '1.8 or newer, starting haproxy daemons '
+                            'instead'))
+        self.threads_supported = bool(
+            self.haproxy_version and
+            self.haproxy_version >= THREADS_VERSION)
+        if conf.haproxy.nbthread > 1 and not self.threads_supported:
+            LOG.warning(_LW('haproxy threads require haproxy 1.8 or newer, '
+                            'running single-threaded haproxy processes'))
+        self.cpu_pool = None
+        if conf.haproxy.cpu_pool:
+            self.cpu_pool = cpu_pool.CpuPool(
+                cpu_pool.parse_cpu_list(conf.haproxy.cpu_pool))
         self.deployed_loadbalancers = {}
+        # loadbalancer_id->digest of the configuration haproxy runs with
+        self.config_digests = {}
+        # loadbalancer_id->map files haproxy runs with, see
+        # jinja_cfg.get_l7_maps
+        self.l7_maps = {}
+        # loadbalancer_id->fingerprints of the certificates haproxy runs
+        # with, see jinja_cfg.get_cert_fingerprints
+        self.cert_fingerprints = {}
+        # loadbalancer_id->time the last successful refresh started to fetch
+        # the loadbalancer from the server
+        self.refresh_times = {}
+        # loadbalancer_id->VIP port of an adopted loadbalancer, until it is
+        # deployed again
+        self.adopted_vip_ports = {}
+        # loadbalancer_id->pid of the haproxy found running by exists
+        self.live_pids = {}
+        # loadbalancer_id->client of the stats socket
+        self.stats_sockets = {}
+        # state directories of unknown loadbalancers found without a running
+        # haproxy, they are not checked again by remove_orphans
+        self.stopped_orphans = set()
         self._loadbalancer = LoadBalancerManager(self)
         self._listener = ListenerManager(self)
         self._pool = PoolManager(self)
         self._member = MemberManager(self)
         self._healthmonitor = HealthMonitorManager(self)
+        self._l7policy = L7PolicyManager(self)
+        self._l7rule = L7RuleManager(self)
 
     @property
     def loadbalancer(self):
@@ -97,6 +263,14 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
     def healthmonitor(self):
         return self._healthmonitor
 
+    @property
+    def l7policy(self):
+        return self._l7policy
+
+    @property
+    def l7rule(self):
+        return self._l7rule
+
     def get_name(self):
         return DRIVER_NAME
 
@@ -107,13 +281,30 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
         namespace = get_ns_name(loadbalancer_id)
         pid_path = self._get_state_file_path(loadbalancer_id, 'haproxy.pid')
 
+        if loadbalancer_id in self.deployed_loadbalancers:
+            vip_port = self.deployed_loadbalancers[loadbalancer_id].vip_port
+        else:
+            vip_port = self.adopted_vip_ports.get(loadbalancer_id)
+        # without a snapshot, the port of a loadbalancer adopted after a
+        # restart is only known once it was deployed again
+        if delete_namespace and not vip_port:
+            cleanup_namespace = True
+
         # kill the process
         kill_pids_in_file(pid_path)
+        self.config_digests.pop(loadbalancer_id, None)
+        self.l7_maps.pop(loadbalancer_id, None)
+        self.cert_fingerprints.pop(loadbalancer_id, None)
+        self.refresh_times.pop(loadbalancer_id, None)
+        self.adopted_vip_ports.pop(loadbalancer_id, None)
+        self.live_pids.pop(loadbalancer_id, None)
+        self.stats_sockets.pop(loadbalancer_id, None)
+        if self.cpu_pool:
+            self.cpu_pool.release(loadbalancer_id)
 
         # unplug the ports
-        if loadbalancer_id in self.deployed_loadbalancers:
-            self._unplug(namespace,
-                         self.deployed_loadbalancers[loadbalancer_id].vip_port)
+        if vip_port:
+            self._unplug(namespace, vip_port)
 
         # delete all devices from namespace
         # used when deleting orphans and port is not known for a loadbalancer
@@ -132,22 +323,137 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
             ns = ip_lib.IPWrapper(namespace=namespace)
             ns.garbage_collect_namespace()
 
+    @n_utils.synchronized('haproxy-driver')
+    def adopt_instances(self):
+        """Takes over the haproxy instances that survived a restart.
+
+        A loadbalancer is adopted if its haproxy is running, see exists. If
+        the snapshot saved when haproxy was last started names the same
+        digest, the digest and the map files of that configuration are
+        recorded, so that the first update only reloads haproxy if the
+        configuration rendered from the server differs. The VIP port of the
+        snapshot lets the loadbalancer be undeployed before it is deployed
+        again.
+
+        :returns: ids of the adopted loadbalancers
+        """
+        if not os.path.isdir(self.state_path):
+            return []
+        adopted = []
+        for loadbalancer_id in os.listdir(self.state_path):
+            if not self.exists(loadbalancer_id):
+                continue
+            conf_path = self._get_state_file_path(loadbalancer_id,
+                                                  'haproxy.conf', False)
+            try:
+                digest, config, l7_maps = jinja_cfg.load_config(conf_path)
+            except (IOError, OSError) as e:
+                LOG.warning(_LW('Unable to adopt loadbalancer %(lb)s: '
+                                '%(error)s'),
+                            {'lb': loadbalancer_id, 'error': e})
+                continue
+            if self.cpu_pool:
+                match = CPU_MAP_RE.search(config)
+                if match:
+                    self.cpu_pool.adopt(loadbalancer_id, [
+                        int(cpu) for cpu in match.group('cpus').split()])
+            snapshot = self._load_snapshot(loadbalancer_id)
+            # The agent may have stopped after saving a configuration, but
+            # before haproxy was reloaded with it.
+            if snapshot.get('digest') == digest:
+                self.config_digests[loadbalancer_id] = digest
+                self.l7_maps[loadbalancer_id] = l7_maps
+            if snapshot.get('vip_port'):
+                self.adopted_vip_ports[loadbalancer_id] = (
+                    data_models.Port.from_dict(snapshot['vip_port']))
+            adopted.append(loadbalancer_id)
+        LOG.info(_LI('Adopted %d running haproxy instances'), len(adopted))
+        return adopted
+
+    def _save_snapshot(self, loadbalancer, digest):
+        """Records the configuration haproxy was started with."""
+        vip_port = loadbalancer.vip_port
+        snapshot = {
+            'digest': digest,
+            'vip_port': {'id': vip_port.id,
+                         'network_id': vip_port.network_id,
+                         'mac_address': vip_port.mac_address}
+        }
+        n_utils.replace_file(
+            self._get_state_file_path(loadbalancer.id, SNAPSHOT_FILE),
+            jsonutils.dumps(snapshot))
+
+    def _load_snapshot(self, loadbalancer_id):
+        """Returns the snapshot of a loadbalancer, empty if unreadable."""
+        snapshot_path = self._get_state_file_path(loadbalancer_id,
+                                                  SNAPSHOT_FILE, False)
+        try:
+            with open(snapshot_path, 'r') as snapshot_file:
+                snapshot = jsonutils.loads(snapshot_file.read())
+        except (IOError, ValueError):
+            return {}
+        return snapshot if isinstance(snapshot, dict) else {}
+
+    def _get_haproxy_pid(self, loadbalancer_id):
+        """Returns the pid of the haproxy of a loadbalancer, if it runs.
+
+        The process must be an haproxy started with the configuration of
+        the loadbalancer, the pid may have been reused since it was written.
+        """
+        pid_path = self._get_state_file_path(loadbalancer_id, 'haproxy.pid',
+                                             False)
+        conf_path = self._get_state_file_path(loadbalancer_id,
+                                              'haproxy.conf', False)
+        try:
+            with open(pid_path, 'r') as pid_file:
+                pid = pid_file.readline().strip()
+            if not pid.isdigit():
+                return None
+            with open('/proc/%s/cmdline' % pid, 'r') as cmdline_file:
+                args = cmdline_file.read().split('\0')
+        except IOError:
+            return None
+        if 'haproxy' in os.path.basename(args[0]) and conf_path in args:
+            return pid
+        return None
+
+    def _get_stats_socket(self, loadbalancer_id):
+        if loadbalancer_id not in self.stats_sockets:
+            socket_path = self._get_state_file_path(
+                loadbalancer_id, 'haproxy_stats.sock', False)
+            self.stats_sockets[loadbalancer_id] = (
+                haproxy_socket.HaproxySocket(socket_path))
+        return self.stats_sockets[loadbalancer_id]
+
     def remove_orphans(self, known_loadbalancer_ids):
         if not os.path.exists(self.state_path):
             return
 
-        orphans = (lb_id for lb_id in os.listdir(self.state_path)
-                   if lb_id not in known_loadbalancer_ids)
-        for lb_id in orphans:
-            if self.exists(lb_id):
-                self.undeploy_instance(lb_id, cleanup_namespace=True)
+        unknown = (set(os.listdir(self.state_path)) -
+                   set(known_loadbalancer_ids))
+        # Only directories created since the last pass, and those of
+        # loadbalancers the agent forgot since then, need to be checked.
+        orphans = list(unknown - self.stopped_orphans)
+        pool = eventlet.GreenPool(ORPHAN_WORKERS)
+        stopped = set(lb_id for lb_id, undeployed
+                      in zip(orphans, pool.imap(self._undeploy_orphan,
+                                                orphans))
+                      if not undeployed)
+        self.stopped_orphans = (self.stopped_orphans & unknown) | stopped
+
+    def _undeploy_orphan(self, loadbalancer_id):
+        """Returns True if the orphan was running and is undeployed now."""
+        if not self.exists(loadbalancer_id):
+            return False
+        self.undeploy_instance(loadbalancer_id, cleanup_namespace=True)
+        return True
 
     def get_stats(self, loadbalancer_id):
         socket_path = self._get_state_file_path(loadbalancer_id,
                                                 'haproxy_stats.sock', False)
         if os.path.exists(socket_path):
             parsed_stats = self._get_stats_from_socket(
-                socket_path,
+                loadbalancer_id,
                 entity_type=(STATS_TYPE_BACKEND_REQUEST |
                              STATS_TYPE_SERVER_REQUEST))
             lb_stats = self._get_backend_stats(parsed_stats)
@@ -176,31 +482,106 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
         return True
 
     def update(self, loadbalancer):
+        config = self._save_config(loadbalancer)
+        # Certificates are stored next to the configuration, haproxy only
+        # reads them again when it is reloaded.
+        fingerprints = jinja_cfg.get_cert_fingerprints(loadbalancer)
+        if (config[1] == self.config_digests.get(loadbalancer.id) and
+                fingerprints is not None and
+                fingerprints == self.cert_fingerprints.get(loadbalancer.id,
+                                                           []) and
+                self._update_l7_maps_runtime(loadbalancer, config[2])):
+            LOG.debug('Configuration of loadbalancer %s did not change, '
+                      'not reloading haproxy', loadbalancer.id)
+            self.deployed_loadbalancers[loadbalancer.id] = loadbalancer
+            return
+        if self.master_worker:
+            master_pid = self._get_master_pid(loadbalancer.id)
+            if master_pid:
+                # The master re-executes itself with the new configuration
+                # and tells its old workers to finish. If the configuration
+                # is invalid, the master keeps running the old one without
+                # telling us, so it is checked first; a failed check raises.
+                ns = ip_lib.IPWrapper(namespace=get_ns_name(loadbalancer.id))
+                ns.netns.execute(['haproxy', '-c', '-f', config[0]])
+                linux_utils.execute(['kill', '-USR2', master_pid],
+                                    run_as_root=True)
+                self.deployed_loadbalancers[loadbalancer.id] = loadbalancer
+                self.config_digests[loadbalancer.id] = config[1]
+                self.l7_maps[loadbalancer.id] = config[2]
+                self.cert_fingerprints[loadbalancer.id] = fingerprints
+                self._save_snapshot(loadbalancer, config[1])
+                return
         pid_path = self._get_state_file_path(loadbalancer.id, 'haproxy.pid')
         extra_args = ['-sf']
         extra_args.extend(p.strip() for p in open(pid_path, 'r'))
-        self._spawn(loadbalancer, extra_args)
+        if self.seamless_reload:
+            socket_path = self._get_state_file_path(loadbalancer.id,
+                                                    'haproxy_stats.sock')
+            try:
+                self._spawn(loadbalancer, ['-x', socket_path] + extra_args,
+                            config)
+                return
+            except RuntimeError:
+                # The running process may have been started without
+                # expose-fd, e.g. before an upgrade of the agent.
+                LOG.warning(_LW('Unable to hand the listening sockets of '
+                                'loadbalancer %s over to the new haproxy '
+                                'process, reloading it without them'),
+                            loadbalancer.id)
+        self._spawn(loadbalancer, extra_args, config)
 
     def exists(self, loadbalancer_id):
-        namespace = get_ns_name(loadbalancer_id)
-        root_ns = ip_lib.IPWrapper()
+        """Returns True if the haproxy of a loadbalancer is running.
 
-        socket_path = self._get_state_file_path(
-            loadbalancer_id, 'haproxy_stats.sock', False)
-        if root_ns.netns.exists(namespace) and os.path.exists(socket_path):
-            try:
-                s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                s.connect(socket_path)
-                return True
-            except socket.error:
-                pass
-        return False
+        Its namespace exists as long as haproxy runs in it, so the
+        namespaces are not listed through the root helper. The pid of a
+        running haproxy is cached, checking it again only looks at /proc.
+        haproxy must also accept connections on its stats socket.
+        """
+        pid = self.live_pids.get(loadbalancer_id)
+        if not pid or not os.path.exists('/proc/%s' % pid):
+            pid = self._get_haproxy_pid(loadbalancer_id)
+            if not pid:
+                self.live_pids.pop(loadbalancer_id, None)
+                return False
+            self.live_pids[loadbalancer_id] = pid
+        return self._get_stats_socket(loadbalancer_id).ping()
 
     def create(self, loadbalancer):
         namespace = get_ns_name(loadbalancer.id)
 
-        self._plug(namespace, loadbalancer.vip_port, loadbalancer.vip_address)
-        self._spawn(loadbalancer)
+        start = timeutils.now()
+        interface_name = self._plug(namespace, loadbalancer.vip_port,
+                                    loadbalancer.vip_address)
+        plugged = timeutils.now()
+        # Haproxy socket binding to IPv6 VIP address will fail if this address
+        # is not yet ready(i.e tentative address), the configuration is
+        # rendered in the meantime.
+        address_ready = None
+        if netaddr.IPAddress(loadbalancer.vip_address).version == 6:
+            device = ip_lib.IPDevice(interface_name, namespace=namespace)
+            address_ready = eventlet.spawn(
+                device.addr.wait_until_address_ready,
+                loadbalancer.vip_address)
+        config = self._save_config(loadbalancer)
+        rendered = timeutils.now()
+        if address_ready is not None:
+            address_ready.wait()
+        ready = timeutils.now()
+        self._spawn(loadbalancer, config=config)
+        spawned = timeutils.now()
+        # Refreshing the ARP caches of the neighbours takes seconds and is
+        # not needed to serve.
+        eventlet.spawn_n(self._send_gratuitous_arp, namespace,
+                         loadbalancer.vip_port, interface_name)
+        LOG.info(_LI('Deployed loadbalancer %(lb)s in %(total).3fs: plug '
+                     '%(plug).3fs, configuration %(config).3fs, waiting for '
+                     'the VIP address %(address).3fs, haproxy start '
+                     '%(spawn).3fs'),
+                 {'lb': loadbalancer.id, 'total': spawned - start,
+                  'plug': plugged - start, 'config': rendered - plugged,
+                  'address': ready - rendered, 'spawn': spawned - ready})
 
     def deployable(self, loadbalancer):
         """Returns True if loadbalancer is active and has active listeners."""
@@ -213,37 +594,15 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
         return (bool(acceptable_listeners) and loadbalancer.admin_state_up and
                 loadbalancer.provisioning_status != constants.PENDING_DELETE)
 
-    def _get_stats_from_socket(self, socket_path, entity_type):
+    def _get_stats_from_socket(self, loadbalancer_id, entity_type):
+        columns = set(jinja_cfg.STATS_MAP.values())
+        columns.update(STATS_MEMBER_COLUMNS)
         try:
-            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            s.connect(socket_path)
-            s.send('show stat -1 %s -1\n' % entity_type)
-            raw_stats = ''
-            chunk_size = 1024
-            while True:
-                chunk = s.recv(chunk_size)
-                raw_stats += chunk
-                if len(chunk) < chunk_size:
-                    break
-
-            return self._parse_stats(raw_stats)
+            return list(self._get_stats_socket(loadbalancer_id).show_stat(
+                entity_type, columns=columns))
         except socket.error as e:
             LOG.warning(_LW('Error while connecting to stats socket: %s'), e)
-            return {}
-
-    def _parse_stats(self, raw_stats):
-        stat_lines = raw_stats.splitlines()
-        if len(stat_lines) < 2:
             return []
-        stat_names = [name.strip('# ') for name in stat_lines[0].split(',')]
-        res_stats = []
-        for raw_values in stat_lines[1:]:
-            if not raw_values:
-                continue
-            stat_values = [value.strip() for value in raw_values.split(',')]
-            res_stats.append(dict(zip(stat_names, stat_values)))
-
-        return res_stats
 
     def _get_backend_stats(self, parsed_stats):
         for stats in parsed_stats:
@@ -258,15 +617,198 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
         res = {}
         for stats in parsed_stats:
             if stats.get('type') == STATS_TYPE_SERVER_RESPONSE:
+                status = stats['status'].split(' ')[0]
                 res[stats['svname']] = {
                     lb_const.STATS_STATUS: (constants.INACTIVE
-                                            if stats['status'] == 'DOWN'
+                                            if status in MEMBER_DOWN_STATUSES
                                             else constants.ACTIVE),
                     lb_const.STATS_HEALTH: stats['check_status'],
                     lb_const.STATS_FAILED_CHECKS: stats['chkfail']
                 }
         return res
 
+    @n_utils.synchronized('haproxy-driver')
+    def update_member_runtime(self, member):
+        """Applies a member change through the haproxy runtime API.
+
+        Only weight and admin state changes of a member that is already
+        known to the running haproxy can be applied this way. The config
+        file is rewritten so that the next reload keeps the change.
+
+        :returns: True if the change was applied, False if a reload is needed
+        """
+        if not self.conf.haproxy.enable_runtime_api:
+            return False
+        loadbalancer = self.deployed_loadbalancers.get(
+            member.pool.loadbalancer.id)
+        deployed_member = _find_member(loadbalancer, member.pool.id,
+                                       member.id)
+        if not deployed_member:
+            return False
+        commands = _get_member_runtime_commands(deployed_member, member)
+        if commands is None:
+            return False
+
+        try:
+            self._get_stats_socket(loadbalancer.id).run_commands(commands)
+        except (socket.error, haproxy_socket.HaproxyRuntimeError) as e:
+            LOG.info(_LI('Unable to update member %(member)s at runtime, '
+                         'falling back to reload: %(error)s'),
+                     {'member': member.id, 'error': e})
+            return False
+
+        for attr in RUNTIME_MEMBER_ATTRS + ('provisioning_status',):
+            setattr(deployed_member, attr, getattr(member, attr))
+        # haproxy runs with the saved configuration now
+        digest = self._save_config(loadbalancer)[1]
+        self.config_digests[loadbalancer.id] = digest
+        self._save_snapshot(loadbalancer, digest)
+        return True
+
+    def _update_l7_maps_runtime(self, loadbalancer, l7_maps):
+        """Applies changes of L7 map files through the haproxy runtime API.
+
+        The map files have been written already, haproxy only needs to
+        learn about the entries that were added, changed or removed.
+
+        :returns: True if haproxy uses the given maps, False if a reload is
+                  needed
+        """
+        deployed_maps = self.l7_maps.get(loadbalancer.id, {})
+        if deployed_maps == l7_maps:
+            return True
+        if not self.conf.haproxy.enable_runtime_api:
+            return False
+        commands = []
+        for map_path, l7_map in l7_maps.items():
+            map_commands = _get_map_runtime_commands(
+                deployed_maps.get(map_path), l7_map)
+            if map_commands is None:
+                return False
+            commands.extend(map_commands)
+
+        haproxy = self._get_stats_socket(loadbalancer.id)
+        try:
+            for start in range(0, len(commands), MAP_COMMANDS_PER_REQUEST):
+                haproxy.run_commands(
+                    commands[start:start + MAP_COMMANDS_PER_REQUEST])
+        except (socket.error, haproxy_socket.HaproxyRuntimeError) as e:
+            LOG.info(_LI('Unable to update L7 maps of loadbalancer %(lb)s at '
+                         'runtime, falling back to reload: %(error)s'),
+                     {'lb': loadbalancer.id, 'error': e})
+            return False
+        self.l7_maps[loadbalancer.id] = l7_maps
+        return True
+
+    def _get_global_opts(self, loadbalancer):
+        global_opts = {}
+        if self.conf.haproxy.enable_runtime_api:
+            global_opts['stats_level'] = 'admin'
+        if self.seamless_reload:
+            global_opts['expose_fd'] = True
+        if self.conf.haproxy.hard_stop_after:
+            global_opts['hard_stop_after'] = (
+                '%ss' % self.conf.haproxy.hard_stop_after)
+        global_opts.update(self._get_process_opts(loadbalancer))
+        return global_opts
+
+    def _get_process_opts(self, loadbalancer):
+        """Returns the threads, CPUs and limits of a loadbalancer's haproxy.
+
+        The agent configuration provides the defaults, the flavor metadata
+        of the loadbalancer overrides them.
+        """
+        metadata = getattr(loadbalancer, 'flavor_metadata', None) or {}
+        nbthread = _get_int_metadata(metadata, 'nbthread',
+                                     self.conf.haproxy.nbthread, 1)
+        maxconn = _get_int_metadata(metadata, 'maxconn',
+                                    self.conf.haproxy.maxconn, 0)
+        tune = dict(self.conf.haproxy.tune_options)
+        if isinstance(metadata.get('tune'), dict):
+            tune.update(metadata['tune'])
+
+        opts = {}
+        if maxconn:
+            opts['maxconn'] = maxconn
+        tune = dict((name, value) for name, value in tune.items()
+                    if TUNE_NAME_RE.match(name) and
+                    TUNE_VALUE_RE.match(str(value)))
+        if tune:
+            opts['tune'] = tune
+        if not self.threads_supported:
+            nbthread = 1
+        elif nbthread > 1:
+            opts['nbthread'] = nbthread
+        if self.cpu_pool:
+            cpus = self.cpu_pool.allocate(loadbalancer.id, nbthread)
+            if cpus is None:
+                LOG.warning(_LW('Not enough free CPUs to pin the %(count)d '
+                                'haproxy threads of loadbalancer %(lb)s: '
+                                '%(report)s'),
+                            {'count': nbthread, 'lb': loadbalancer.id,
+                             'report': self.cpu_pool.report()})
+            elif nbthread > 1:
+                opts['cpu_map'] = 'auto:1/1-%d %s' % (
+                    nbthread, ' '.join(str(cpu) for cpu in cpus))
+            else:
+                opts['cpu_map'] = '1 %d' % cpus[0]
+        return opts
+
+    def get_capacity(self):
+        if not self.cpu_pool:
+            return {}
+        report = self.cpu_pool.report()
+        return {'cpus_total': report['cpus_total'],
+                'cpus_free': report['cpus_free']}
+
+    def _get_master_pid(self, loadbalancer_id):
+        """Returns the pid of the haproxy master of a loadbalancer.
+
+        :returns: the pid, or None if haproxy does not run in master-worker
+                  mode for this loadbalancer
+        """
+        pid_path = self._get_state_file_path(loadbalancer_id, 'haproxy.pid',
+                                             False)
+        try:
+            with open(pid_path, 'r') as pid_file:
+                pid = pid_file.readline().strip()
+            if not pid.isdigit():
+                return None
+            with open('/proc/%s/cmdline' % pid, 'r') as cmdline_file:
+                args = cmdline_file.read().split('\0')
+        except IOError:
+            return None
+        # A daemon started before master-worker mode was enabled must not
+        # get SIGUSR2, which would terminate it.
+        return pid if MASTER_WORKER_ARG in args else None
+
+    def get_worker_counts(self):
+        """Returns the number of haproxy workers of each loadbalancer.
+
+        Only loadbalancers served by an haproxy master are counted. Old
+        workers still finishing their connections are included.
+        """
+        masters = {}
+        for loadbalancer_id in list(self.deployed_loadbalancers):
+            master_pid = self._get_master_pid(loadbalancer_id)
+            if master_pid:
+                masters[master_pid] = loadbalancer_id
+        counts = dict((loadbalancer_id, 0)
+                      for loadbalancer_id in masters.values())
+        if masters:
+            for parent_pid in _get_parent_pids():
+                if parent_pid in masters:
+                    counts[masters[parent_pid]] += 1
+        return counts
+
+    def _prepare_templates(self):
+        # After a restart the agent renders the configurations of all its
+        # loadbalancers at once, the templates must not be compiled then.
+        cache_dir = os.path.join(self.conf.haproxy.loadbalancer_state_path,
+                                 TEMPLATE_CACHE_DIR)
+        n_utils.ensure_dir(cache_dir)
+        jinja_cfg.prepare_templates(cache_dir)
+
     def _get_state_file_path(self, loadbalancer_id, kind,
                              ensure_state_dir=True):
         """Returns the file name for a given kind of config file."""
@@ -277,16 +819,32 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
         return os.path.join(conf_dir, kind)
 
     def _plug(self, namespace, port, vip_address, reuse_existing=True):
+        """Plugs the VIP port into the namespace of a loadbalancer.
+
+        The VIP address may still be tentative when this returns.
+
+        :returns: name of the interface of the port
+        """
         self.plugin_rpc.plug_vip_port(port.id)
 
         interface_name = self.vif_driver.get_device_name(port)
 
+        cidrs = [
+            str(netaddr.IPNetwork(
+                '%s/%s' % (ip.ip_address,
+                           netaddr.IPNetwork(ip.subnet.cidr).prefixlen)))
+            for ip in port.fixed_ips
+        ]
         if ip_lib.device_exists(interface_name,
                                 namespace=namespace):
             if not reuse_existing:
                 raise exceptions.PreexistingDeviceFailure(
                     dev_name=interface_name
                 )
+            device = ip_lib.IPDevice(interface_name, namespace=namespace)
+            stale_cidrs = [address['cidr'] for address
+                           in device.addr.list(scope='global')
+                           if address['cidr'] not in cidrs]
         else:
             self.vif_driver.plug(
                 port.network_id,
@@ -295,81 +853,145 @@ class HaproxyNSDriver(agent_device_driver.AgentDeviceDriver):
                 port.mac_address,
                 namespace=namespace
             )
-
-        cidrs = [
-            '%s/%s' % (ip.ip_address,
-                       netaddr.IPNetwork(ip.subnet.cidr).prefixlen)
-            for ip in port.fixed_ips
-        ]
-        self.vif_driver.init_l3(interface_name, cidrs, namespace=namespace)
-
-        # Haproxy socket binding to IPv6 VIP address will fail if this address
-        # is not yet ready(i.e tentative address).
-        if netaddr.IPAddress(vip_address).version == 6:
-            device = ip_lib.IPDevice(interface_name, namespace=namespace)
-            device.addr.wait_until_address_ready(vip_address)
-
+            stale_cidrs = []
+
+        # Addresses and the default route are set with a single root helper
+        # call instead of one per address and route.
+        batch = ip_batch.IpBatch(namespace)
+        for cidr in stale_cidrs:
+            batch.add('addr', 'del', cidr, 'dev', interface_name)
+        for cidr in cidrs:
+            batch.add('addr', 'replace', cidr, 'dev', interface_name)
         gw_ip = port.fixed_ips[0].subnet.gateway_ip
-
-        if not gw_ip:
-            host_routes = port.fixed_ips[0].subnet.host_routes
-            for host_route in host_routes:
-                if host_route.destination == "0.0.0.0/0":
-                    gw_ip = host_route.nexthop
-                    break
-        else:
-            cmd = ['route', 'add', 'default', 'gw', gw_ip]
-            ip_wrapper = ip_lib.IPWrapper(namespace=namespace)
-            ip_wrapper.netns.execute(cmd, check_exit_code=False)
-            # When delete and re-add the same vip, we need to
-            # send gratuitous ARP to flush the ARP cache in the Router.
-            gratuitous_arp = self.conf.haproxy.send_gratuitous_arp
-            if gratuitous_arp > 0:
-                for ip in port.fixed_ips:
-                    cmd_arping = ['arping', '-U',
-                                  '-I', interface_name,
-                                  '-c', gratuitous_arp,
-                                  ip.ip_address]
-                    ip_wrapper.netns.execute(cmd_arping, check_exit_code=False)
+        if gw_ip:
+            batch.add('route', 'replace', 'default', 'via', gw_ip,
+                      'dev', interface_name)
+        batch.execute()
+        return interface_name
+
+    def _send_gratuitous_arp(self, namespace, port, interface_name):
+        # When delete and re-add the same vip, we need to
+        # send gratuitous ARP to flush the ARP cache in the Router.
+        gratuitous_arp = self.conf.haproxy.send_gratuitous_arp
+        if gratuitous_arp <= 0 or not port.fixed_ips[0].subnet.gateway_ip:
+            return
+        ip_wrapper = ip_lib.IPWrapper(namespace=namespace)
+        for ip in port.fixed_ips:
+            if netaddr.IPAddress(ip.ip_address).version != 4:
+                continue
+            cmd_arping = ['arping', '-U',
+                          '-I', interface_name,
+                          '-c', gratuitous_arp,
+                          ip.ip_address]
+            ip_wrapper.netns.execute(cmd_arping, check_exit_code=False)
 
     def _unplug(self, namespace, port):
         self.plugin_rpc.unplug_vip_port(port.id)
         interface_name = self.vif_driver.get_device_name(port)
         self.vif_driver.unplug(interface_name, namespace=namespace)
 
-    def _spawn(self, loadbalancer, extra_cmd_args=()):
-        namespace = get_ns_name(loadbalancer.id)
+    def _save_config(self, loadbalancer):
+        """Writes the haproxy configuration of a loadbalancer.
+
+        :returns: tuple of the path and the digest of the configuration, and
+                  the map files it uses
+        """
         conf_path = self._get_state_file_path(loadbalancer.id, 'haproxy.conf')
-        pid_path = self._get_state_file_path(loadbalancer.id,
-                                             'haproxy.pid')
         sock_path = self._get_state_file_path(loadbalancer.id,
                                               'haproxy_stats.sock')
         user_group = self.conf.haproxy.user_group
         haproxy_base_dir = self._get_state_file_path(loadbalancer.id, '')
-        jinja_cfg.save_config(conf_path,
-                              loadbalancer,
-                              sock_path,
-                              user_group,
-                              haproxy_base_dir)
+        digest = jinja_cfg.save_config(
+            conf_path,
+            loadbalancer,
+            sock_path,
+            user_group,
+            haproxy_base_dir,
+            global_opts=self._get_global_opts(loadbalancer))
+        return (conf_path, digest,
+                jinja_cfg.get_l7_maps(loadbalancer, haproxy_base_dir))
+
+    def _spawn(self, loadbalancer, extra_cmd_args=(), config=None):
+        namespace = get_ns_name(loadbalancer.id)
+        conf_path, digest, l7_maps = config or self._save_config(loadbalancer)
+        pid_path = self._get_state_file_path(loadbalancer.id,
+                                             'haproxy.pid')
         cmd = ['haproxy', '-f', conf_path, '-p', pid_path]
+        if self.master_worker:
+            cmd.append(MASTER_WORKER_ARG)
         cmd.extend(extra_cmd_args)
+        fingerprints = jinja_cfg.get_cert_fingerprints(loadbalancer)
 
         ns = ip_lib.IPWrapper(namespace=namespace)
         ns.netns.execute(cmd)
+        # the new haproxy has written its pid
+        self.live_pids.pop(loadbalancer.id, None)
 
         # remember deployed loadbalancer id
         self.deployed_loadbalancers[loadbalancer.id] = loadbalancer
+        self.config_digests[loadbalancer.id] = digest
+        self.l7_maps[loadbalancer.id] = l7_maps
+        self.cert_fingerprints[loadbalancer.id] = fingerprints
+        self._save_snapshot(loadbalancer, digest)
 
 
 class LoadBalancerManager(agent_device_driver.BaseLoadBalancerManager):
 
+    def __init__(self, driver):
+        super(LoadBalancerManager, self).__init__(driver)
+        # loadbalancer_id->event of the refresh waiting to run
+        self._pending_refreshes = {}
+
     def refresh(self, loadbalancer):
+        """Fetches the loadbalancer from the server and redeploys it.
+
+        Refreshes of the same loadbalancer requested within
+        refresh_coalesce_window are done by a single fetch and reload.
+        Every caller waits for that reload and gets its exception, if any,
+        so statuses are only reported once the change is in place.
+
+        The agent runs the operations on a loadbalancer one by one. Those
+        queued before the last successful refresh started to fetch the
+        loadbalancer are already deployed, and return right away.
+        """
+        queued = dispatcher.queued_at()
+        refreshed = self.driver.refresh_times.get(loadbalancer.id)
+        if queued is not None and refreshed is not None and (
+                queued <= refreshed):
+            LOG.debug('Loadbalancer %s was refreshed after the operation '
+                      'was queued', loadbalancer.id)
+            return
+        window = self.driver.conf.haproxy.refresh_coalesce_window
+        if not window:
+            return self._do_refresh(loadbalancer.id)
+        pending = self._pending_refreshes.get(loadbalancer.id)
+        if pending is None:
+            pending = eventlet.event.Event()
+            self._pending_refreshes[loadbalancer.id] = pending
+            eventlet.spawn_after(window, self._run_pending_refresh,
+                                 loadbalancer.id, pending)
+        pending.wait()
+
+    def _run_pending_refresh(self, loadbalancer_id, pending):
+        # Requests arriving from now on may not be part of what is fetched,
+        # so they get a refresh of their own.
+        del self._pending_refreshes[loadbalancer_id]
+        try:
+            self._do_refresh(loadbalancer_id)
+        except Exception as e:
+            pending.send_exception(e)
+        else:
+            pending.send()
+
+    def _do_refresh(self, loadbalancer_id):
+        started = timeutils.now()
         loadbalancer_dict = self.driver.plugin_rpc.get_loadbalancer(
-            loadbalancer.id)
+            loadbalancer_id)
         loadbalancer = data_models.LoadBalancer.from_dict(loadbalancer_dict)
         if (not self.driver.deploy_instance(loadbalancer) and
                 self.driver.exists(loadbalancer.id)):
             self.driver.undeploy_instance(loadbalancer.id)
+        self.driver.refresh_times[loadbalancer_id] = started
 
     def delete(self, loadbalancer):
         if self.driver.exists(loadbalancer.id):
@@ -429,11 +1051,41 @@ class PoolManager(agent_device_driver.BasePoolManager):
         for l in loadbalancer.listeners:
             if l.default_pool == pool:
                 l.default_pool = None
-        # TODO(sbalukoff): Will need to do this or L7Policies as well
+            # the plugin turns policies redirecting to the pool into rejects
+            for policy in l.l7_policies:
+                if (policy.action == lb_const.L7_POLICY_ACTION_REDIRECT_TO_POOL
+                        and policy.redirect_pool_id == pool.id):
+                    policy.action = lb_const.L7_POLICY_ACTION_REJECT
+                    policy.redirect_pool_id = None
         # just refresh because haproxy is fine if only frontend is listed
         self.driver.loadbalancer.refresh(loadbalancer)
 
 
+class L7PolicyManager(agent_device_driver.BaseL7PolicyManager):
+
+    def update(self, old_l7policy, new_l7policy):
+        self.driver.loadbalancer.refresh(new_l7policy.listener.loadbalancer)
+
+    def create(self, l7policy):
+        self.driver.loadbalancer.refresh(l7policy.listener.loadbalancer)
+
+    def delete(self, l7policy):
+        self.driver.loadbalancer.refresh(l7policy.listener.loadbalancer)
+
+
+class L7RuleManager(agent_device_driver.BaseL7RuleManager):
+
+    def update(self, old_l7rule, new_l7rule):
+        self.driver.loadbalancer.refresh(
+            new_l7rule.policy.listener.loadbalancer)
+
+    def create(self, l7rule):
+        self.driver.loadbalancer.refresh(l7rule.policy.listener.loadbalancer)
+
+    def delete(self, l7rule):
+        self.driver.loadbalancer.refresh(l7rule.policy.listener.loadbalancer)
+
+
 class MemberManager(agent_device_driver.BaseMemberManager):
 
     def _remove_member(self, pool, member_id):
@@ -444,7 +1096,8 @@ class MemberManager(agent_device_driver.BaseMemberManager):
         pool.members.pop(index_to_remove)
 
     def update(self, old_member, new_member):
-        self.driver.loadbalancer.refresh(new_member.pool.loadbalancer)
+        if not self.driver.update_member_runtime(new_member):
+            self.driver.loadbalancer.refresh(new_member.pool.loadbalancer)
 
     def create(self, member):
         self.driver.loadbalancer.refresh(member.pool.loadbalancer)
@@ -467,6 +1120,123 @@ class HealthMonitorManager(agent_device_driver.BaseHealthMonitorManager):
         self.driver.loadbalancer.refresh(hm.pool.loadbalancer)
 
 
+def _find_member(loadbalancer, pool_id, member_id):
+    if not loadbalancer:
+        return None
+    for pool in loadbalancer.pools:
+        if pool.id != pool_id:
+            continue
+        for member in pool.members:
+            if member.id == member_id:
+                return member
+    return None
+
+
+def _get_member_runtime_commands(deployed_member, member):
+    """Builds the runtime API commands moving a member to its new state.
+
+    :returns: list of commands, or None if the change needs a reload
+    """
+    for attr in data_models.Member.fields:
+        if attr in MEMBER_IGNORED_ATTRS + RUNTIME_MEMBER_ATTRS:
+            continue
+        if getattr(deployed_member, attr) != getattr(member, attr):
+            return None
+    # A member outside of the known statuses is not rendered at all and
+    # can't be brought back without a reload.
+    if member.provisioning_status not in jinja_cfg.MEMBER_STATUSES:
+        return None
+
+    server = '%s/%s' % (member.pool.id, member.id)
+    was_enabled = jinja_cfg._include_member(deployed_member)
+    commands = []
+    if member.admin_state_up and not was_enabled:
+        # haproxy answers "No such server" if the member was never rendered,
+        # which makes the caller fall back to a reload.
+        commands.append('enable server %s' % server)
+    if member.weight != deployed_member.weight:
+        commands.append('set weight %s %s' % (server, member.weight))
+    if not member.admin_state_up and was_enabled:
+        commands.append('disable server %s' % server)
+    return commands
+
+
+def _get_map_runtime_commands(deployed_map, l7_map):
+    """Builds the runtime API commands moving a map to its new entries.
+
+    :returns: list of commands, or None if the change needs a reload
+    """
+    if not deployed_map or deployed_map['lookup'] != l7_map['lookup']:
+        return None
+    deployed_entries = deployed_map['entries']
+    entries = l7_map['entries']
+    removed = [key for key in deployed_entries if key not in entries]
+    added = [key for key in entries if key not in deployed_entries]
+    changed = [key for key in entries if key in deployed_entries and
+               entries[key] != deployed_entries[key]]
+    if not all(MAP_RUNTIME_KEY_RE.match(key)
+               for key in removed + added + changed):
+        return None
+    # Added entries end up behind the existing ones, which changes which
+    # of two overlapping prefixes matches first.
+    if l7_map['prefix'] and any(key != other and (key.startswith(other) or
+                                                  other.startswith(key))
+                                for key in added for other in entries):
+        return None
+    map_path = l7_map['path']
+    return (['del map %s %s' % (map_path, key) for key in removed] +
+            ['set map %s %s %s' % (map_path, key, entries[key])
+             for key in changed] +
+            ['add map %s %s %s' % (map_path, key, entries[key])
+             for key in added])
+
+
+def _get_int_metadata(metadata, key, default, minimum):
+    if key not in metadata:
+        return default
+    try:
+        value = int(metadata[key])
+    except (TypeError, ValueError):
+        value = None
+    if value is None or value < minimum:
+        LOG.warning(_LW('Ignoring invalid flavor metadata %(key)s: '
+                        '%(value)s'), {'key': key, 'value': metadata[key]})
+        return default
+    return value
+
+
+def get_haproxy_version():
+    """Returns the (major, minor) version of haproxy, None if unknown."""
+    try:
+        output = linux_utils.execute(['haproxy', '-v'],
+                                     log_fail_as_error=False)
+    except (RuntimeError, OSError) as e:
+        LOG.warning(_LW('Unable to determine the haproxy version: %s'), e)
+        return None
+    match = HAPROXY_VERSION_RE.search(output)
+    if not match:
+        LOG.warning(_LW('Unable to determine the haproxy version from: %s'),
+                    output)
+        return None
+    return tuple(int(part) for part in match.groups())
+
+
+def _get_parent_pids():
+    """Yields the parent pid of every running process."""
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % entry, 'r') as stat_file:
+                stat = stat_file.read()
+        except IOError:
+            # the process exited in the meantime
+            continue
+        # The process name is in parentheses and may contain spaces, the
+        # state and the parent pid follow it.
+        yield stat[stat.rindex(')') + 1:].split()[1]
+
+
 def kill_pids_in_file(pid_path):
     if os.path.exists(pid_path):
         with open(pid_path, 'r') as pids:
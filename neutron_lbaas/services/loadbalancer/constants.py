@@ -154,6 +154,11 @@ LBAAS_AGENT_SCHEDULER_V2_EXT_ALIAS = 'lbaas_agent_schedulerv2'
 AGENT_TYPE_LOADBALANCERV2 = 'Loadbalancerv2 agent'
 LOADBALANCER_PLUGINV2 = 'n-lbaasv2-plugin'
 LOADBALANCER_AGENTV2 = 'n-lbaasv2_agent'
+# Agent configuration flag of agents which accept member deltas
+AGENT_MEMBER_DELTAS = 'member_deltas'
+MEMBER_DELTA_CREATE = 'create'
+MEMBER_DELTA_UPDATE = 'update'
+MEMBER_DELTA_DELETE = 'delete'
 
 # LBasS V1 Agent Constants
 LOADBALANCER_PLUGIN = 'n-lbaas-plugin'
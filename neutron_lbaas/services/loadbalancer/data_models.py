@@ -42,21 +42,55 @@ class BaseDataModel(object):
     # implementation. That would require handling custom default values though.
     fields = []
 
+    def __getattr__(self, name):
+        # Only reached for attributes the instance does not have, such as
+        # the nested models from_dict leaves to be built on first access.
+        builders = self.__dict__.get('_builders')
+        if not builders or name not in builders:
+            raise AttributeError(name)
+        builder, args = builders.pop(name)
+        value = builder(*args)
+        setattr(self, name, value)
+        return value
+
+    def _build_later(self, name, builder, *args):
+        """Sets the attribute name to builder(*args) when it is first read."""
+        self.__dict__.pop(name, None)
+        self.__dict__.setdefault('_builders', {})[name] = (builder, args)
+
+    def _build_all(self):
+        builders = self.__dict__.pop('_builders', {})
+        for name, (builder, args) in builders.items():
+            if name not in self.__dict__:
+                setattr(self, name, builder(*args))
+
     def to_dict(self, **kwargs):
+        return self._to_dict(kwargs, ())
+
+    def _to_dict(self, kwargs, parents):
+        self._build_all()
+        # Graphs built by LoadBalancer.from_dict link objects back to their
+        # parents, which are then given without their nested objects.
+        shallow = any(self is parent for parent in parents)
+        parents += (self,)
         ret = {}
         for attr in self.__dict__:
             if attr.startswith('_') or not kwargs.get(attr, True):
                 continue
             value = self.__dict__[attr]
             if isinstance(getattr(self, attr), list):
+                if shallow:
+                    continue
                 ret[attr] = []
                 for item in value:
                     if isinstance(item, BaseDataModel):
-                        ret[attr].append(item.to_dict())
+                        ret[attr].append(item._to_dict({}, parents))
                     else:
                         ret[attr] = item
             elif isinstance(getattr(self, attr), BaseDataModel):
-                ret[attr] = value.to_dict()
+                if shallow:
+                    continue
+                ret[attr] = value._to_dict({}, parents)
             elif six.PY2 and isinstance(value, six.text_type):
                 ret[attr.encode('utf8')] = value.encode('utf8')
             else:
@@ -137,6 +171,10 @@ class BaseDataModel(object):
         return lb
 
 
+def _from_dicts(model_cls, model_dicts):
+    return [model_cls.from_dict(model_dict) for model_dict in model_dicts]
+
+
 # NOTE(brandon-logan) AllocationPool, HostRoute, Subnet, IPAllocation, Port,
 # and ProviderResourceAssociation are defined here because there aren't any
 # data_models defined in core neutron or neutron services.  Instead of jumping
@@ -286,10 +324,10 @@ class SessionPersistence(BaseDataModel):
     @classmethod
     def from_dict(cls, model_dict):
         pool = model_dict.pop('pool', None)
+        instance = super(SessionPersistence, cls).from_dict(model_dict)
         if pool:
-            model_dict['pool'] = Pool.from_dict(
-                pool)
-        return super(SessionPersistence, cls).from_dict(model_dict)
+            instance._build_later('pool', Pool.from_dict, pool)
+        return instance
 
 
 class LoadBalancerStatistics(BaseDataModel):
@@ -358,10 +396,10 @@ class HealthMonitor(BaseDataModel):
     @classmethod
     def from_dict(cls, model_dict):
         pool = model_dict.pop('pool', None)
+        instance = super(HealthMonitor, cls).from_dict(model_dict)
         if pool:
-            model_dict['pool'] = Pool.from_dict(
-                pool)
-        return super(HealthMonitor, cls).from_dict(model_dict)
+            instance._build_later('pool', Pool.from_dict, pool)
+        return instance
 
 
 class Pool(BaseDataModel):
@@ -437,24 +475,30 @@ class Pool(BaseDataModel):
         model_dict.pop('sessionpersistence', None)
         loadbalancer = model_dict.pop('loadbalancer', None)
         members = model_dict.pop('members', [])
-        model_dict['members'] = [Member.from_dict(member)
-                                 for member in members]
         listeners = model_dict.pop('listeners', [])
-        model_dict['listeners'] = [Listener.from_dict(listener)
-                                   for listener in listeners]
         l7_policies = model_dict.pop('l7_policies', [])
-        model_dict['l7_policies'] = [L7Policy.from_dict(policy)
-                                     for policy in l7_policies]
-
+        instance = super(Pool, cls).from_dict(model_dict)
+        if members:
+            instance._build_later('members', _from_dicts, Member, members)
+        if listeners:
+            instance._build_later('listeners', _from_dicts, Listener,
+                                  listeners)
+        if l7_policies:
+            instance._build_later('l7_policies', _from_dicts, L7Policy,
+                                  l7_policies)
         if healthmonitor:
-            model_dict['healthmonitor'] = HealthMonitor.from_dict(
-                healthmonitor)
+            instance._build_later('healthmonitor', HealthMonitor.from_dict,
+                                  healthmonitor)
         if session_persistence:
-            model_dict['session_persistence'] = SessionPersistence.from_dict(
-                session_persistence)
+            instance._build_later('session_persistence',
+                                  SessionPersistence.from_dict,
+                                  session_persistence)
+            instance._build_later('sessionpersistence', getattr, instance,
+                                  'session_persistence')
         if loadbalancer:
-            model_dict['loadbalancer'] = LoadBalancer.from_dict(loadbalancer)
-        return super(Pool, cls).from_dict(model_dict)
+            instance._build_later('loadbalancer', LoadBalancer.from_dict,
+                                  loadbalancer)
+        return instance
 
 
 class Member(BaseDataModel):
@@ -490,10 +534,10 @@ class Member(BaseDataModel):
     @classmethod
     def from_dict(cls, model_dict):
         pool = model_dict.pop('pool', None)
+        instance = super(Member, cls).from_dict(model_dict)
         if pool:
-            model_dict['pool'] = Pool.from_dict(
-                pool)
-        return super(Member, cls).from_dict(model_dict)
+            instance._build_later('pool', Pool.from_dict, pool)
+        return instance
 
 
 class SNI(BaseDataModel):
@@ -566,9 +610,10 @@ class L7Rule(BaseDataModel):
     @classmethod
     def from_dict(cls, model_dict):
         policy = model_dict.pop('policy', None)
+        instance = super(L7Rule, cls).from_dict(model_dict)
         if policy:
-            model_dict['policy'] = L7Policy.from_dict(policy)
-        return super(L7Rule, cls).from_dict(model_dict)
+            instance._build_later('policy', L7Policy.from_dict, policy)
+        return instance
 
 
 class L7Policy(BaseDataModel):
@@ -618,13 +663,15 @@ class L7Policy(BaseDataModel):
         listener = model_dict.pop('listener', None)
         redirect_pool = model_dict.pop('redirect_pool', None)
         rules = model_dict.pop('rules', [])
+        instance = super(L7Policy, cls).from_dict(model_dict)
         if listener:
-            model_dict['listener'] = Listener.from_dict(listener)
+            instance._build_later('listener', Listener.from_dict, listener)
         if redirect_pool:
-            model_dict['redirect_pool'] = Pool.from_dict(redirect_pool)
-        model_dict['rules'] = [L7Rule.from_dict(rule)
-                               for rule in rules]
-        return super(L7Policy, cls).from_dict(model_dict)
+            instance._build_later('redirect_pool', Pool.from_dict,
+                                  redirect_pool)
+        if rules:
+            instance._build_later('rules', _from_dicts, L7Rule, rules)
+        return instance
 
 
 class Listener(BaseDataModel):
@@ -689,13 +736,17 @@ class Listener(BaseDataModel):
         model_dict['sni_containers'] = [SNI.from_dict(sni)
                                         for sni in sni_containers]
         l7_policies = model_dict.pop('l7_policies', [])
+        instance = super(Listener, cls).from_dict(model_dict)
         if default_pool:
-            model_dict['default_pool'] = Pool.from_dict(default_pool)
+            instance._build_later('default_pool', Pool.from_dict,
+                                  default_pool)
         if loadbalancer:
-            model_dict['loadbalancer'] = LoadBalancer.from_dict(loadbalancer)
-        model_dict['l7_policies'] = [L7Policy.from_dict(policy)
-                                     for policy in l7_policies]
-        return super(Listener, cls).from_dict(model_dict)
+            instance._build_later('loadbalancer', LoadBalancer.from_dict,
+                                  loadbalancer)
+        if l7_policies:
+            instance._build_later('l7_policies', _from_dicts, L7Policy,
+                                  l7_policies)
+        return instance
 
 
 class LoadBalancer(BaseDataModel):
@@ -818,17 +869,108 @@ class LoadBalancer(BaseDataModel):
         pools = model_dict.pop('pools', [])
         vip_port = model_dict.pop('vip_port', None)
         provider = model_dict.pop('provider', None)
+        flavor_metadata = model_dict.pop('flavor_metadata', None)
         model_dict.pop('stats', None)
-        model_dict['listeners'] = [Listener.from_dict(listener)
-                                   for listener in listeners]
-        model_dict['pools'] = [Pool.from_dict(pool)
-                               for pool in pools]
+        instance = super(LoadBalancer, cls).from_dict(model_dict)
+        if listeners or pools:
+            graph = _LoadBalancerGraph(instance, listeners, pools)
+            instance._build_later('listeners', graph.build, 'listeners')
+            instance._build_later('pools', graph.build, 'pools')
         if vip_port:
-            model_dict['vip_port'] = Port.from_dict(vip_port)
+            instance._build_later('vip_port', Port.from_dict, vip_port)
         if provider:
-            model_dict['provider'] = ProviderResourceAssociation.from_dict(
-                provider)
-        return super(LoadBalancer, cls).from_dict(model_dict)
+            instance._build_later('provider',
+                                  ProviderResourceAssociation.from_dict,
+                                  provider)
+        if flavor_metadata is not None:
+            setattr(instance, 'flavor_metadata', flavor_metadata)
+        return instance
+
+
+class _LoadBalancerGraph(object):
+    """Builds the listeners and pools of a loadbalancer in a single pass.
+
+    The dict of a loadbalancer holds a copy of a pool for every listener
+    and L7 policy using it, and copies of the loadbalancer and listeners
+    within those. Each pool is built once here, from the first copy seen,
+    and shared by everything referring to it. Nested objects link back to
+    their parents within the graph instead of to copies.
+    """
+
+    def __init__(self, loadbalancer, listener_dicts, pool_dicts):
+        self.loadbalancer = loadbalancer
+        self.listener_dicts = listener_dicts
+        self.pool_dicts = pool_dicts
+        self.listeners = None
+        self.pools = None
+        self._pools_by_id = {}
+
+    def build(self, name):
+        if self.pools is None:
+            self.pools = [self._get_pool(pool_dict)
+                          for pool_dict in self.pool_dicts]
+            self.listeners = [self._build_listener(listener_dict)
+                              for listener_dict in self.listener_dicts]
+        return getattr(self, name)
+
+    @staticmethod
+    def _build_child(model_cls, model_dict, parent_name, parent):
+        model_dict.pop(parent_name, None)
+        child = model_cls.from_dict(model_dict)
+        setattr(child, parent_name, parent)
+        return child
+
+    def _get_pool(self, pool_dict):
+        pool = self._pools_by_id.get(pool_dict.get('id'))
+        if pool:
+            return pool
+        for name in ('loadbalancer', 'listener', 'listeners', 'l7_policies'):
+            pool_dict.pop(name, None)
+        members = pool_dict.pop('members', [])
+        healthmonitor = pool_dict.pop('healthmonitor', None)
+        session_persistence = pool_dict.pop('session_persistence', None)
+        pool = Pool.from_dict(pool_dict)
+        pool.loadbalancer = self.loadbalancer
+        pool.members = [self._build_child(Member, member, 'pool', pool)
+                        for member in members]
+        if healthmonitor:
+            pool.healthmonitor = self._build_child(
+                HealthMonitor, healthmonitor, 'pool', pool)
+        if session_persistence:
+            pool.session_persistence = self._build_child(
+                SessionPersistence, session_persistence, 'pool', pool)
+            pool.sessionpersistence = pool.session_persistence
+        if pool.id is not None:
+            self._pools_by_id[pool.id] = pool
+        return pool
+
+    def _build_listener(self, listener_dict):
+        listener_dict.pop('loadbalancer', None)
+        default_pool = listener_dict.pop('default_pool', None)
+        l7_policies = listener_dict.pop('l7_policies', [])
+        listener = Listener.from_dict(listener_dict)
+        listener.loadbalancer = self.loadbalancer
+        if default_pool:
+            pool = self._get_pool(default_pool)
+            listener.default_pool = pool
+            pool.listeners.append(listener)
+            pool.listener = pool.listener or listener
+        listener.l7_policies = [self._build_l7_policy(policy, listener)
+                                for policy in l7_policies]
+        return listener
+
+    def _build_l7_policy(self, policy_dict, listener):
+        policy_dict.pop('listener', None)
+        redirect_pool = policy_dict.pop('redirect_pool', None)
+        rules = policy_dict.pop('rules', [])
+        policy = L7Policy.from_dict(policy_dict)
+        policy.listener = listener
+        if redirect_pool:
+            policy.redirect_pool = self._get_pool(redirect_pool)
+            policy.redirect_pool.l7_policies.append(policy)
+        policy.rules = [self._build_child(L7Rule, rule, 'policy', policy)
+                        for rule in rules]
+        return policy
 
 
 SA_MODEL_TO_DATA_MODEL_MAP = {
@@ -13,11 +13,13 @@
 #    under the License.
 
 import itertools
+
 from neutron.common import utils as n_utils
 from neutron.plugins.common import constants as qconstants
 from six import moves
 
 from neutron_lbaas.services.loadbalancer import constants
+from neutron_lbaas.services.loadbalancer.drivers.haproxy import status_codes
 
 PROTOCOL_MAP = {
     constants.PROTOCOL_TCP: 'tcp',
@@ -184,7 +186,8 @@ def _get_server_health_option(config):
         opts.append('option httpchk %(http_method)s %(url_path)s' % monitor)
         opts.append(
             'http-check expect rstatus %s' %
-            '|'.join(_expand_expected_codes(monitor['expected_codes']))
+            status_codes.compile_regex(
+                _expand_expected_codes(monitor['expected_codes']))
         )
 
     if monitor['type'] == constants.HEALTH_MONITOR_HTTPS:
@@ -12,7 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
+import operator
 import os
+import re
+import tempfile
 
 import jinja2
 import six
@@ -20,12 +25,16 @@ import six
 from neutron.common import utils as n_utils
 from neutron.plugins.common import constants as plugin_constants
 from oslo_config import cfg
+from oslo_utils import encodeutils
+from oslo_utils import excutils
+from oslo_utils import timeutils
 
 from neutron_lbaas._i18n import _
 from neutron_lbaas.common import cert_manager
 from neutron_lbaas.common.tls_utils import cert_parser
 from neutron_lbaas.services.loadbalancer import constants
 from neutron_lbaas.services.loadbalancer import data_models
+from neutron_lbaas.services.loadbalancer.drivers.haproxy import status_codes
 
 CERT_MANAGER_PLUGIN = cert_manager.get_backend()
 
@@ -58,37 +67,177 @@ STATS_MAP = {
 MEMBER_STATUSES = plugin_constants.ACTIVE_PENDING_STATUSES + (
     plugin_constants.INACTIVE,)
 
+L7_RULE_FETCH_MAP = {
+    constants.L7_RULE_TYPE_HOST_NAME: 'req.hdr(host) -i',
+    constants.L7_RULE_TYPE_PATH: 'path',
+    constants.L7_RULE_TYPE_FILE_TYPE: 'path',
+    constants.L7_RULE_TYPE_HEADER: 'req.hdr(%s)',
+    constants.L7_RULE_TYPE_COOKIE: 'req.cook(%s)'
+}
+
+L7_COMPARE_TYPE_MAP = {
+    constants.L7_RULE_COMPARE_TYPE_REGEX: '-m reg',
+    constants.L7_RULE_COMPARE_TYPE_STARTS_WITH: '-m beg',
+    constants.L7_RULE_COMPARE_TYPE_ENDS_WITH: '-m end',
+    constants.L7_RULE_COMPARE_TYPE_CONTAINS: '-m sub',
+    constants.L7_RULE_COMPARE_TYPE_EQUAL_TO: '-m str'
+}
+
+# Rules which can be looked up in a map file instead of an ACL per rule
+L7_MAP_FETCH_MAP = {
+    constants.L7_RULE_TYPE_HOST_NAME: 'req.hdr(host),lower',
+    constants.L7_RULE_TYPE_PATH: 'path'
+}
+
+L7_MAP_CONVERTER_MAP = {
+    constants.L7_RULE_COMPARE_TYPE_EQUAL_TO: 'map',
+    constants.L7_RULE_COMPARE_TYPE_STARTS_WITH: 'map_beg'
+}
+
+# Map lookups in a rendered configuration, see _new_l7_map
+L7_MAP_LOOKUP_RE = re.compile(
+    r'use_backend %\[(?P<lookup>[^\]]+,(?P<converter>map(?:_beg)?)'
+    r'\((?P<path>[^)]+)\))\]')
+
 TEMPLATES_DIR = os.path.abspath(
     os.path.join(os.path.dirname(__file__), 'templates/'))
 JINJA_ENV = None
 
+# (project id, container ref) -> CachedCert of the TLS containers fetched
+# from the certificate manager
+CERT_CACHE = {}
+CachedCert = collections.namedtuple('CachedCert',
+                                    ['expires', 'fingerprint', 'tls_cert'])
+
 jinja_opts = [
     cfg.StrOpt(
         'jinja_config_template',
         default=os.path.join(
             TEMPLATES_DIR,
             'haproxy.loadbalancer.j2'),
-        help=_('Jinja template file for haproxy configuration'))
+        help=_('Jinja template file for haproxy configuration')),
+    cfg.IntOpt(
+        'tls_cache_ttl',
+        default=300,
+        min=0,
+        help=_('Seconds TLS certificates fetched from the certificate '
+               'manager are reused for, before they are fetched again. '
+               '0 fetches them on every configuration change.'))
 ]
 
 cfg.CONF.register_opts(jinja_opts, 'haproxy')
 
 
 def save_config(conf_path, loadbalancer, socket_path, user_group,
-                haproxy_base_dir):
+                haproxy_base_dir, global_opts=None):
     """Convert a logical configuration to the HAProxy version.
 
+    The configuration is written as it is rendered, it is never held in
+    memory as a whole.
+
     :param conf_path: location of Haproxy configuration
     :param loadbalancer: the load balancer object
     :param socket_path: location of haproxy socket data
     :param user_group: user group
     :param haproxy_base_dir: location of the instances state data
+    :param global_opts: dictionary of haproxy process settings
+    :returns: SHA-256 hex digest of the configuration
+    """
+    chunks = generate_loadbalancer_obj(loadbalancer,
+                                       user_group,
+                                       socket_path,
+                                       haproxy_base_dir,
+                                       global_opts=global_opts)
+    return _replace_file_streamed(conf_path, chunks)
+
+
+def load_config(conf_path):
+    """Reads back a configuration written by save_config
+
+    :param conf_path: location of Haproxy configuration
+    :returns: tuple of the SHA-256 hex digest of the configuration, its
+              text and the map files it uses, like get_l7_maps returns them
+    """
+    with open(conf_path, 'rb') as conf_file:
+        data = conf_file.read()
+    config = encodeutils.safe_decode(data)
+    l7_maps = {}
+    for match in L7_MAP_LOOKUP_RE.finditer(config):
+        map_path = match.group('path')
+        if map_path in l7_maps:
+            continue
+        entries = collections.OrderedDict()
+        with open(map_path, 'r') as map_file:
+            for line in map_file:
+                key, _sep, backend = line.rstrip('\n').rpartition(' ')
+                entries[key] = backend
+        l7_maps[map_path] = {
+            'path': map_path,
+            'lookup': match.group('lookup'),
+            'prefix': match.group('converter') == 'map_beg',
+            'entries': entries
+        }
+    return hashlib.sha256(data).hexdigest(), config, l7_maps
+
+
+def _replace_file_streamed(file_path, chunks, file_mode=0o644):
+    """Atomically replace a file with data written as it is produced
+
+    :param file_path: location of the file
+    :param chunks: iterable of the text making up the file
+    :param file_mode: permissions of the file
+    :returns: SHA-256 hex digest of the data
+    """
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    tmp_file = tempfile.NamedTemporaryFile('wb', dir=base_dir, delete=False)
+    try:
+        with tmp_file:
+            for chunk in chunks:
+                data = encodeutils.safe_encode(chunk)
+                tmp_file.write(data)
+                digest.update(data)
+        os.chmod(tmp_file.name, file_mode)
+        os.rename(tmp_file.name, file_path)
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            os.unlink(tmp_file.name)
+    return digest.hexdigest()
+
+
+def _create_environment(cache_dir=None):
+    """Create the Jinja environment of the haproxy templates
+
+    Templates are not checked for changes once loaded, they only change
+    with the agent.
+
+    :param cache_dir: directory to keep compiled templates in
+    :returns: Jinja environment
+    """
+    template_loader = jinja2.FileSystemLoader(
+        searchpath=os.path.dirname(cfg.CONF.haproxy.jinja_config_template))
+    bytecode_cache = None
+    if cache_dir:
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir)
+    return jinja2.Environment(
+        loader=template_loader, trim_blocks=True, lstrip_blocks=True,
+        auto_reload=False, bytecode_cache=bytecode_cache)
+
+
+def prepare_templates(cache_dir=None):
+    """Compile the Jinja templates ahead of the first render
+
+    The compiled templates are kept in cache_dir, so that they are only
+    compiled again after the templates or Jinja changed.
+
+    :param cache_dir: directory to keep compiled templates in
     """
-    config_str = render_loadbalancer_obj(loadbalancer,
-                                         user_group,
-                                         socket_path,
-                                         haproxy_base_dir)
-    n_utils.replace_file(conf_path, config_str)
+    global JINJA_ENV
+    JINJA_ENV = _create_environment(cache_dir)
+    # templates extended or imported by the configured template are only
+    # loaded on first render otherwise
+    for name in JINJA_ENV.list_templates(extensions=['j2']):
+        JINJA_ENV.get_template(name)
 
 
 def _get_template():
@@ -98,10 +247,7 @@ def _get_template():
     """
     global JINJA_ENV
     if not JINJA_ENV:
-        template_loader = jinja2.FileSystemLoader(
-            searchpath=os.path.dirname(cfg.CONF.haproxy.jinja_config_template))
-        JINJA_ENV = jinja2.Environment(
-            loader=template_loader, trim_blocks=True, lstrip_blocks=True)
+        JINJA_ENV = _create_environment()
     return JINJA_ENV.get_template(os.path.basename(
         cfg.CONF.haproxy.jinja_config_template))
 
@@ -118,10 +264,25 @@ def _store_listener_crt(haproxy_base_dir, listener, cert):
                                    cert.primary_cn)
     # build a string that represents the pem file to be saved
     pem = _build_pem(cert)
-    n_utils.replace_file(cert_path, pem)
+    _replace_file_if_changed(cert_path, pem)
     return cert_path
 
 
+def _replace_file_if_changed(file_path, data):
+    """Replace a file unless it already holds the data
+
+    :param file_path: location of the file
+    :param data: the new file content
+    """
+    try:
+        with open(file_path, 'r') as f:
+            if f.read() == data:
+                return
+    except IOError:
+        pass
+    n_utils.replace_file(file_path, data)
+
+
 def _retrieve_crt_path(haproxy_base_dir, listener, primary_cn):
     """Retrieve TLS certificate location
 
@@ -153,32 +314,76 @@ def _process_tls_certificates(listener):
     sni_certs = []
     # Retrieve, map and store default TLS certificate
     if listener.default_tls_container_id:
-        tls_cert = _map_cert_tls_container(
-            cert_mgr.get_cert(
-                project_id=listener.tenant_id,
-                cert_ref=listener.default_tls_container_id,
-                resource_ref=cert_mgr.get_service_url(
-                    listener.loadbalancer_id),
-                check_only=True
-            )
-        )
+        tls_cert = _get_tls_container(cert_mgr, listener,
+                                      listener.default_tls_container_id)
     if listener.sni_containers:
         # Retrieve, map and store SNI certificates
         for sni_cont in listener.sni_containers:
-            cert_container = _map_cert_tls_container(
-                cert_mgr.get_cert(
-                    project_id=listener.tenant_id,
-                    cert_ref=sni_cont.tls_container_id,
-                    resource_ref=cert_mgr.get_service_url(
-                        listener.loadbalancer_id),
-                    check_only=True
-                )
-            )
+            cert_container = _get_tls_container(cert_mgr, listener,
+                                                sni_cont.tls_container_id)
             sni_certs.append(cert_container)
 
     return {'tls_cert': tls_cert, 'sni_certs': sni_certs}
 
 
+def _get_tls_container(cert_mgr, listener, cert_ref):
+    """Retrieve a TLS container, from the cache while it is fresh
+
+    Once the cached container expired it is fetched again, but only mapped
+    again when the certificate material changed.
+
+    :param cert_mgr: the certificate manager
+    :param listener: the listener object
+    :param cert_ref: reference of the TLS container
+    :returns: mapped TLSContainer object
+    """
+    key = (listener.tenant_id, cert_ref)
+    now = timeutils.now()
+    cached = CERT_CACHE.get(key)
+    if cached and now < cached.expires:
+        return cached.tls_cert
+
+    cert = cert_mgr.get_cert(
+        project_id=listener.tenant_id,
+        cert_ref=cert_ref,
+        resource_ref=cert_mgr.get_service_url(listener.loadbalancer_id),
+        check_only=True
+    )
+    fingerprint = _get_cert_fingerprint(cert)
+    if cached and cached.fingerprint == fingerprint:
+        tls_cert = cached.tls_cert
+    else:
+        tls_cert = _map_cert_tls_container(cert)
+
+    ttl = cfg.CONF.haproxy.tls_cache_ttl
+    if ttl:
+        CERT_CACHE[key] = CachedCert(now + ttl, fingerprint, tls_cert)
+        # forget containers no listener used for a whole period
+        for stale_key in [k for k, v in CERT_CACHE.items()
+                          if v.expires + ttl <= now]:
+            del CERT_CACHE[stale_key]
+    else:
+        CERT_CACHE.pop(key, None)
+    return tls_cert
+
+
+def _get_cert_fingerprint(cert):
+    """Calculate a digest of the certificate material
+
+    :param cert: TLS certificate
+    :returns: hex digest of the certificate, key and intermediates
+    """
+    intermediates = cert.get_intermediates() or []
+    if isinstance(intermediates, (six.text_type, six.binary_type)):
+        intermediates = [intermediates]
+    fingerprint = hashlib.sha256()
+    for part in ([cert.get_certificate(), cert.get_private_key(),
+                  cert.get_private_key_passphrase()] + list(intermediates)):
+        fingerprint.update(encodeutils.safe_encode(part or ''))
+        fingerprint.update(b'\0')
+    return fingerprint.hexdigest()
+
+
 def _get_primary_cn(tls_cert):
     """Retrieve primary cn for TLS certificate
 
@@ -222,20 +427,40 @@ def _build_pem(tls_cert):
 
 
 def render_loadbalancer_obj(loadbalancer, user_group, socket_path,
-                            haproxy_base_dir):
+                            haproxy_base_dir, global_opts=None):
     """Renders load balancer object
 
     :param loadbalancer: the load balancer object
     :param user_group: the user group
     :param socket_path: location of the instances socket data
     :param haproxy_base_dir:  location of the instances state data
+    :param global_opts: dictionary of haproxy process settings
     :returns: rendered load balancer configuration
     """
+    return ''.join(generate_loadbalancer_obj(loadbalancer,
+                                             user_group,
+                                             socket_path,
+                                             haproxy_base_dir,
+                                             global_opts=global_opts))
+
+
+def generate_loadbalancer_obj(loadbalancer, user_group, socket_path,
+                              haproxy_base_dir, global_opts=None):
+    """Renders load balancer object piece by piece
+
+    :param loadbalancer: the load balancer object
+    :param user_group: the user group
+    :param socket_path: location of the instances socket data
+    :param haproxy_base_dir:  location of the instances state data
+    :param global_opts: dictionary of haproxy process settings
+    :returns: iterator of the rendered load balancer configuration
+    """
     loadbalancer = _transform_loadbalancer(loadbalancer, haproxy_base_dir)
-    return _get_template().render({'loadbalancer': loadbalancer,
-                                   'user_group': user_group,
-                                   'stats_sock': socket_path},
-                                  constants=constants)
+    return _get_template().generate({'loadbalancer': loadbalancer,
+                                     'user_group': user_group,
+                                     'stats_sock': socket_path,
+                                     'global_opts': global_opts or {}},
+                                    constants=constants)
 
 
 def _transform_loadbalancer(loadbalancer, haproxy_base_dir):
@@ -247,6 +472,7 @@ def _transform_loadbalancer(loadbalancer, haproxy_base_dir):
     """
     listeners = [_transform_listener(x, haproxy_base_dir)
         for x in loadbalancer.listeners if x.admin_state_up]
+    _remove_unused_l7_maps(haproxy_base_dir, listeners)
     pools = [_transform_pool(x) for x in loadbalancer.pools]
     return {
         'name': loadbalancer.name,
@@ -284,9 +510,218 @@ def _transform_listener(listener, haproxy_base_dir):
         for c in certs['sni_certs']:
             _store_listener_crt(haproxy_base_dir, listener, c)
         ret_value['crt_dir'] = data_dir
+
+    if ret_value['protocol_mode'] == 'http':
+        ret_value['l7_policies'] = _transform_l7_policies(listener,
+                                                          haproxy_base_dir)
+        for policy in ret_value['l7_policies']:
+            if policy.get('map'):
+                _store_listener_map(policy['map']['path'],
+                                    policy['map']['entries'])
     return ret_value
 
 
+def get_l7_maps(loadbalancer, haproxy_base_dir):
+    """Returns the map files the configuration of a loadbalancer uses
+
+    :param loadbalancer: the load balancer object
+    :param haproxy_base_dir: location of the instances state data
+    :returns: dictionary of map file locations to transformed map values
+    """
+    l7_maps = {}
+    for listener in loadbalancer.listeners:
+        if (listener.admin_state_up and
+                PROTOCOL_MAP[listener.protocol] == 'http'):
+            for policy in _transform_l7_policies(listener, haproxy_base_dir):
+                if policy.get('map'):
+                    l7_maps[policy['map']['path']] = policy['map']
+    return l7_maps
+
+
+def get_cert_fingerprints(loadbalancer):
+    """Returns the fingerprints of the certificates of a loadbalancer
+
+    They are looked up in CERT_CACHE, as the last rendering of the
+    configuration of the loadbalancer left them.
+
+    :param loadbalancer: the load balancer object
+    :returns: sorted list of the fingerprints, None if one of the
+              certificates is not cached
+    """
+    fingerprints = []
+    for listener in loadbalancer.listeners:
+        if not listener.admin_state_up:
+            continue
+        cert_refs = [sni.tls_container_id for sni in listener.sni_containers]
+        if listener.default_tls_container_id:
+            cert_refs.append(listener.default_tls_container_id)
+        for cert_ref in cert_refs:
+            cached = CERT_CACHE.get((listener.tenant_id, cert_ref))
+            if not cached:
+                return None
+            fingerprints.append(cached.fingerprint)
+    return sorted(fingerprints)
+
+
+def _transform_l7_policies(listener, haproxy_base_dir):
+    """Transforms the L7 policies of a listener
+
+    Policies redirecting to a pool on a single host name or path rule are
+    looked up in map files. Consecutive policies of the same kind share one
+    map, so that thousands of them cost one lookup instead of one ACL
+    each. All other policies are evaluated rule by rule.
+
+    :param listener: the listener object
+    :param haproxy_base_dir: location of the instances state data
+    :returns: list of transformed L7 policy values, in position order
+    """
+    policies = []
+    l7_map = map_kind = None
+    for policy in sorted(listener.l7_policies,
+                         key=operator.attrgetter('position')):
+        rules = [rule for rule in policy.rules if rule.admin_state_up]
+        if not policy.admin_state_up or not rules:
+            continue
+        if policy.action == constants.L7_POLICY_ACTION_REDIRECT_TO_POOL:
+            if not policy.redirect_pool_id:
+                continue
+            rule_map_kind = _get_l7_map_kind(rules)
+            if rule_map_kind:
+                if rule_map_kind != map_kind:
+                    map_kind = rule_map_kind
+                    l7_map = _new_l7_map(listener, haproxy_base_dir,
+                                         map_kind, policy.id)
+                    policies.append({'id': policy.id,
+                                     'action': policy.action,
+                                     'map': l7_map})
+                _add_l7_map_entry(l7_map, rules[0], policy.redirect_pool_id)
+                continue
+            # only use_backend rules are evaluated in declaration order,
+            # policies with other actions do not split a map
+            l7_map = map_kind = None
+        policies.append({
+            'id': policy.id,
+            'action': policy.action,
+            'redirect_pool_id': policy.redirect_pool_id,
+            'redirect_url': _escape_haproxy_config_string(
+                policy.redirect_url or ''),
+            'rules': [_transform_l7_rule(rule) for rule in rules]
+        })
+    return policies
+
+
+def _get_l7_map_kind(rules):
+    """Returns the fetch and converter looking up a rule in a map file
+
+    :param rules: the enabled rules of a L7 policy
+    :returns: tuple of fetch and converter, or None if the rules cannot
+              be looked up in a map file
+    """
+    if len(rules) != 1:
+        return None
+    rule = rules[0]
+    if (rule.invert or rule.type not in L7_MAP_FETCH_MAP or
+            rule.compare_type not in L7_MAP_CONVERTER_MAP):
+        return None
+    # map files hold one key per line, up to the first whitespace
+    if (not rule.value or rule.value.startswith('#') or
+            len(rule.value.split()) != 1 or rule.value != rule.value.strip()):
+        return None
+    return (L7_MAP_FETCH_MAP[rule.type],
+            L7_MAP_CONVERTER_MAP[rule.compare_type])
+
+
+def _new_l7_map(listener, haproxy_base_dir, map_kind, policy_id):
+    # Named after the first policy of the map, so that changes to other
+    # policies keep the lookup and can be applied at runtime.
+    fetch, converter = map_kind
+    map_path = os.path.join(os.path.abspath(haproxy_base_dir),
+                            '{0}_{1}.map'.format(listener.id, policy_id))
+    return {
+        'path': map_path,
+        'lookup': '{0},{1}({2})'.format(fetch, converter, map_path),
+        'prefix': converter == 'map_beg',
+        'entries': collections.OrderedDict()
+    }
+
+
+def _add_l7_map_entry(l7_map, rule, backend):
+    """Adds the rule of a L7 policy to a map unless it can never match
+
+    A key matches the first policy it was added for. A prefix is never
+    reached either if a policy before it matches a shorter prefix of it.
+    """
+    key = rule.value
+    if rule.type == constants.L7_RULE_TYPE_HOST_NAME:
+        key = key.lower()
+    entries = l7_map['entries']
+    if key in entries:
+        return
+    if l7_map['prefix'] and any(key.startswith(prefix)
+                                for prefix in entries):
+        return
+    entries[key] = backend
+
+
+def _transform_l7_rule(rule):
+    """Transforms L7 rule object
+
+    :param rule: the L7 rule object
+    :returns: dictionary of transformed L7 rule values
+    """
+    fetch = L7_RULE_FETCH_MAP[rule.type]
+    if '%s' in fetch:
+        fetch = fetch % _escape_haproxy_config_string(rule.key)
+    value = rule.value
+    compare_type = rule.compare_type
+    if (rule.type == constants.L7_RULE_TYPE_FILE_TYPE and
+            compare_type == constants.L7_RULE_COMPARE_TYPE_EQUAL_TO):
+        value = '.' + value
+        compare_type = constants.L7_RULE_COMPARE_TYPE_ENDS_WITH
+    return {
+        'id': rule.id,
+        'invert': rule.invert,
+        'criterion': '{0} {1} {2}'.format(
+            fetch, L7_COMPARE_TYPE_MAP[compare_type],
+            _escape_haproxy_config_string(value))
+    }
+
+
+def _escape_haproxy_config_string(value):
+    """Escapes a string so haproxy reads it as one word"""
+    value = value.replace('\\', '\\\\')
+    return re.sub(r'([ #\'"])', r'\\\1', value)
+
+
+def _remove_unused_l7_maps(haproxy_base_dir, listeners):
+    """Removes the map files no transformed listener uses anymore
+
+    :param haproxy_base_dir: location of the instances state data
+    :param listeners: the transformed listeners of the load balancer
+    """
+    base_dir = os.path.abspath(haproxy_base_dir)
+    if not os.path.isdir(base_dir):
+        return
+    used = set(policy['map']['path'] for listener in listeners
+               for policy in listener.get('l7_policies', ())
+               if policy.get('map'))
+    for name in os.listdir(base_dir):
+        map_path = os.path.join(base_dir, name)
+        if name.endswith('.map') and map_path not in used:
+            os.remove(map_path)
+
+
+def _store_listener_map(map_path, entries):
+    """Store the map file of L7 policies
+
+    :param map_path: location of the map file
+    :param entries: ordered dictionary of keys to backend names
+    """
+    data = ''.join('{0} {1}\n'.format(key, backend)
+                   for key, backend in entries.items())
+    _replace_file_if_changed(map_path, data)
+
+
 def _transform_pool(pool):
     """Transforms pool object
 
@@ -358,7 +793,7 @@ def _transform_health_monitor(monitor):
         'max_retries': monitor.max_retries,
         'http_method': monitor.http_method,
         'url_path': monitor.url_path,
-        'expected_codes': '|'.join(
+        'expected_codes': status_codes.compile_regex(
             _expand_expected_codes(monitor.expected_codes)),
         'admin_state_up': monitor.admin_state_up,
     }
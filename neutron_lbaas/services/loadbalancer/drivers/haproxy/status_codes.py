@@ -0,0 +1,71 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import itertools
+import re
+
+
+def _digit_class(digits):
+    """Builds a regular expression matching one of a set of digits"""
+    digits = sorted(digits)
+    if len(digits) == 1:
+        return digits[0]
+    ranges = []
+    for _key, run in itertools.groupby(enumerate(digits),
+                                       lambda item: int(item[1]) - item[0]):
+        run = [digit for _index, digit in run]
+        if len(run) > 2:
+            ranges.append('%s-%s' % (run[0], run[-1]))
+        else:
+            ranges.extend(run)
+    return '[%s]' % ''.join(ranges)
+
+
+def compile_regex(codes):
+    """Compile a set of HTTP status codes into a regular expression.
+
+    Status codes are merged digit by digit instead of listing every code:
+
+    200-299, 302 -> ^(2[0-9][0-9]|302)$
+    200-599 -> ^[2-5][0-9][0-9]$
+
+    :param codes: the status codes, as strings
+    :returns: the regular expression, empty if there are no codes
+    """
+    units = collections.defaultdict(set)
+    patterns = []
+    for code in codes:
+        if len(code) == 3 and code.isdigit():
+            units[code[:2]].add(code[2])
+        else:
+            patterns.append(re.escape(code))
+    # hundreds digit -> tens digits which accept the same last digits
+    tens = collections.defaultdict(lambda: collections.defaultdict(set))
+    for prefix, digits in units.items():
+        tens[prefix[0]][_digit_class(digits)].add(prefix[1])
+    # hundreds digits which accept the same last two digits
+    hundreds = collections.defaultdict(set)
+    for hundred, classes in tens.items():
+        suffixes = tuple(sorted(_digit_class(digits) + unit_class
+                                for unit_class, digits in classes.items()))
+        hundreds[suffixes].add(hundred)
+    for suffixes, digits in hundreds.items():
+        patterns.extend(_digit_class(digits) + suffix for suffix in suffixes)
+    if not patterns:
+        return ''
+    patterns.sort()
+    if len(patterns) == 1:
+        return '^%s$' % patterns[0]
+    return '^(%s)$' % '|'.join(patterns)
@@ -17,6 +17,7 @@ import copy
 import mock
 
 from neutron_lbaas.agent import agent_api as api
+from neutron_lbaas.common import payload_codec
 from neutron_lbaas.tests import base
 
 
@@ -54,8 +55,19 @@ class TestApiCache(base.BaseTestCase):
         self._test_method('get_ready_devices')
 
     def test_get_loadbalancer(self):
-        self._test_method('get_loadbalancer',
-                          loadbalancer_id='loadbalancer_id')
+        with mock.patch.object(self.api.client, 'call') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            rpc_mock.return_value = payload_codec.encode(
+                {'id': 'loadbalancer_id', 'name': 'x' * 10000}, ['json'])
+            rv = self.api.get_loadbalancer('loadbalancer_id')
+
+        self.assertEqual({'id': 'loadbalancer_id', 'name': 'x' * 10000}, rv)
+        prepare_mock.assert_called_once_with(version='1.2')
+        rpc_mock.assert_called_once_with(
+            mock.sentinel.context, 'get_loadbalancer',
+            loadbalancer_id='loadbalancer_id',
+            formats=payload_codec.get_formats())
 
     def test_loadbalancer_destroyed(self):
         self._test_method('loadbalancer_destroyed',
@@ -79,3 +91,14 @@ class TestApiCache(base.BaseTestCase):
     def test_update_loadbalancer_stats(self):
         self._test_method('update_loadbalancer_stats', loadbalancer_id='id',
                           stats='stats')
+
+    def test_update_loadbalancer_stats_bulk(self):
+        with mock.patch.object(self.api.client, 'cast') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            self.api.update_loadbalancer_stats_bulk({'id': 'stats'})
+
+        prepare_mock.assert_called_once_with(version='1.1')
+        rpc_mock.assert_called_once_with(mock.sentinel.context,
+                                         'update_loadbalancer_stats_bulk',
+                                         stats={'id': 'stats'})
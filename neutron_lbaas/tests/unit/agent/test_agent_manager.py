@@ -14,6 +14,11 @@
 #    under the License.
 
 import collections
+import copy
+import json
+import os
+
+import fixtures
 import mock
 from neutron.plugins.common import constants
 
@@ -29,6 +34,10 @@ class TestManager(base.BaseTestCase):
 
         mock_conf = mock.Mock()
         mock_conf.device_driver = ['devdriver']
+        mock_conf.stats_collection_workers = 4
+        mock_conf.stats_full_report_interval = 300
+        mock_conf.instance_snapshot_path = ''
+        mock_conf.dispatch_workers = 0
 
         self.mock_importer = mock.patch.object(manager, 'importutils').start()
 
@@ -51,10 +60,80 @@ class TestManager(base.BaseTestCase):
             self.mgr, '_update_statuses')
         self.update_statuses = self.update_statuses_patcher.start()
 
-    def test_initialize_service_hook(self):
-        with mock.patch.object(self.mgr, 'sync_state') as sync:
-            self.mgr.initialize_service_hook(mock.Mock())
-            sync.assert_called_once_with()
+    @mock.patch('eventlet.spawn_n')
+    def test_initialize_service_hook(self, spawn_n):
+        self.driver_mock.adopt_instances.return_value = []
+        self.mgr.initialize_service_hook(mock.Mock())
+        self.driver_mock.adopt_instances.assert_called_once_with()
+        spawn_n.assert_called_once_with(self.mgr.sync_state)
+
+    def _use_instance_snapshot(self):
+        snapshot_path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'lbaas',
+            'instances.json')
+        self.mgr.conf.instance_snapshot_path = snapshot_path
+        return snapshot_path
+
+    def test_load_instance_snapshot(self):
+        snapshot_path = self._use_instance_snapshot()
+        os.mkdir(os.path.dirname(snapshot_path))
+        with open(snapshot_path, 'w') as snapshot_file:
+            json.dump({'3': 'devdriver', '4': 'olddriver'}, snapshot_file)
+        self.mgr.instance_mapping = {}
+        self.mgr._load_instance_snapshot()
+        self.assertEqual({'3': 'devdriver'}, self.mgr.instance_mapping)
+
+    def test_load_instance_snapshot_invalid(self):
+        snapshot_path = self._use_instance_snapshot()
+        os.mkdir(os.path.dirname(snapshot_path))
+        with open(snapshot_path, 'w') as snapshot_file:
+            snapshot_file.write('{"3": ')
+        self.mgr.instance_mapping = {}
+        self.mgr._load_instance_snapshot()
+        self.assertEqual({}, self.mgr.instance_mapping)
+        self.assertTrue(self.log.warning.called)
+
+    def test_load_instance_snapshot_missing(self):
+        self._use_instance_snapshot()
+        self.mgr._load_instance_snapshot()
+        self.assertEqual({'1': 'devdriver', '2': 'devdriver'},
+                         self.mgr.instance_mapping)
+
+    def test_save_instance_snapshot(self):
+        snapshot_path = self._use_instance_snapshot()
+        self.mgr._save_instance_snapshot()
+        with open(snapshot_path) as snapshot_file:
+            self.assertEqual({'1': 'devdriver', '2': 'devdriver'},
+                             json.load(snapshot_file))
+        with mock.patch('neutron.common.utils.replace_file') as replace:
+            self.mgr._save_instance_snapshot()
+            self.assertFalse(replace.called)
+
+    def test_save_instance_snapshot_disabled(self):
+        with mock.patch('neutron.common.utils.replace_file') as replace:
+            self.mgr._save_instance_snapshot()
+            self.assertFalse(replace.called)
+
+    def test_adopt_instances(self):
+        self.mgr.instance_mapping = {}
+        self.driver_mock.adopt_instances.return_value = ['1', '3']
+        self.mgr._adopt_instances()
+        self.assertEqual({'1': 'devdriver', '3': 'devdriver'},
+                         self.mgr.instance_mapping)
+
+    def test_adopt_instances_not_implemented(self):
+        self.mgr.instance_mapping = {}
+        self.driver_mock.adopt_instances.side_effect = NotImplementedError
+        self.mgr._adopt_instances()
+        self.assertEqual({}, self.mgr.instance_mapping)
+        self.assertFalse(self.log.exception.called)
+
+    def test_adopt_instances_failed(self):
+        self.mgr.instance_mapping = {}
+        self.driver_mock.adopt_instances.side_effect = RuntimeError
+        self.mgr._adopt_instances()
+        self.assertEqual({}, self.mgr.instance_mapping)
+        self.assertTrue(self.log.exception.called)
 
     def test_periodic_resync_needs_sync(self):
         with mock.patch.object(self.mgr, 'sync_state') as sync:
@@ -69,21 +148,142 @@ class TestManager(base.BaseTestCase):
             self.assertFalse(sync.called)
 
     def test_collect_stats(self):
+        self.driver_mock.loadbalancer.get_stats.side_effect = (
+            lambda lb_id: {'bytes_in': lb_id})
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'1': {'bytes_in': '1'}, '2': {'bytes_in': '2'}})
+        self.assertFalse(self.rpc_mock.update_loadbalancer_stats.called)
+
+    def test_collect_stats_skips_empty(self):
+        self.driver_mock.loadbalancer.get_stats.side_effect = (
+            lambda lb_id: {'bytes_in': lb_id} if lb_id == '2' else {})
         self.mgr.collect_stats(mock.Mock())
-        self.rpc_mock.update_loadbalancer_stats.assert_has_calls([
-            mock.call('1', mock.ANY),
-            mock.call('2', mock.ANY)
-        ], any_order=True)
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'2': {'bytes_in': '2'}})
 
     def test_collect_stats_exception(self):
         self.driver_mock.loadbalancer.get_stats.side_effect = Exception
 
         self.mgr.collect_stats(mock.Mock())
 
-        self.assertFalse(self.rpc_mock.called)
+        self.assertFalse(self.rpc_mock.update_loadbalancer_stats_bulk.called)
         self.assertTrue(self.mgr.needs_resync)
         self.assertTrue(self.log.exception.called)
 
+    def test_collect_stats_partial_exception(self):
+        self.driver_mock.loadbalancer.get_stats.side_effect = [
+            Exception, {'bytes_in': '2'}]
+
+        self.mgr.collect_stats(mock.Mock())
+
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'2': {'bytes_in': '2'}})
+        self.assertTrue(self.mgr.needs_resync)
+
+    def test_collect_stats_rpc_exception(self):
+        self.driver_mock.loadbalancer.get_stats.return_value = {
+            'bytes_in': '1'}
+        self.rpc_mock.update_loadbalancer_stats_bulk.side_effect = Exception
+
+        self.mgr.collect_stats(mock.Mock())
+
+        self.assertTrue(self.mgr.needs_resync)
+        self.assertTrue(self.log.exception.called)
+
+    def test_collect_stats_reports_changes_only(self):
+        stats = {'1': {'bytes_in': '1', 'bytes_out': '1',
+                       'members': {'m1': {'status': 'ACTIVE'},
+                                   'm2': {'status': 'ACTIVE'}}},
+                 '2': {'bytes_in': '2', 'bytes_out': '2'}}
+        self.driver_mock.loadbalancer.get_stats.side_effect = (
+            lambda lb_id: copy.deepcopy(stats[lb_id]))
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            stats)
+
+        self.rpc_mock.reset_mock()
+        stats['1']['bytes_in'] = '10'
+        stats['1']['members']['m2']['status'] = 'INACTIVE'
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'1': {'bytes_in': '10',
+                   'members': {'m2': {'status': 'INACTIVE'}}}})
+
+        self.rpc_mock.reset_mock()
+        self.mgr.collect_stats(mock.Mock())
+        self.assertFalse(self.rpc_mock.update_loadbalancer_stats_bulk.called)
+
+    def test_collect_stats_full_report(self):
+        self.driver_mock.loadbalancer.get_stats.return_value = {
+            'bytes_in': '1'}
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.reset_mock()
+        with mock.patch.object(self.mgr, 'full_stats_watch') as watch:
+            watch.expired.return_value = True
+            self.mgr.collect_stats(mock.Mock())
+            watch.restart.assert_called_once_with()
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'1': {'bytes_in': '1'}, '2': {'bytes_in': '1'}})
+
+    def test_collect_stats_resends_after_rpc_exception(self):
+        self.driver_mock.loadbalancer.get_stats.return_value = {
+            'bytes_in': '1'}
+        self.rpc_mock.update_loadbalancer_stats_bulk.side_effect = Exception
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.update_loadbalancer_stats_bulk.side_effect = None
+        self.rpc_mock.reset_mock()
+        self.mgr.collect_stats(mock.Mock())
+        self.rpc_mock.update_loadbalancer_stats_bulk.assert_called_once_with(
+            {'1': {'bytes_in': '1'}, '2': {'bytes_in': '1'}})
+
+    def test_report_state_worker_counts(self):
+        self.driver_mock.get_worker_counts.return_value = {'1': 1, '2': 3}
+        self.driver_mock.get_capacity.return_value = {'cpus_total': 8,
+                                                      'cpus_free': 2}
+        with mock.patch.object(self.mgr, 'state_rpc') as state_rpc:
+            self.mgr._report_state()
+            configurations = self.mgr.agent_state['configurations']
+            self.assertEqual(2, configurations['instances'])
+            self.assertEqual(4, configurations['workers'])
+            self.assertEqual(2, configurations['old_workers'])
+            self.assertEqual(8, configurations['cpus_total'])
+            self.assertEqual(2, configurations['cpus_free'])
+            self.assertEqual({'1': 1, '2': 3}, self.mgr.worker_counts)
+            state_rpc.report_state.assert_called_once_with(
+                self.mgr.context, self.mgr.agent_state)
+
+    def test_report_state_worker_counts_not_supported(self):
+        self.driver_mock.get_worker_counts.side_effect = NotImplementedError
+        self.driver_mock.get_capacity.side_effect = NotImplementedError
+        with mock.patch.object(self.mgr, 'state_rpc') as state_rpc:
+            self.mgr._report_state()
+            configurations = self.mgr.agent_state['configurations']
+            self.assertEqual(0, configurations['workers'])
+            self.assertEqual(0, configurations['old_workers'])
+            self.assertNotIn('cpus_free', configurations)
+            self.assertTrue(state_rpc.report_state.called)
+
+    @mock.patch.object(manager.dispatcher, 'LoadBalancerDispatcher')
+    def test_init_dispatcher(self, dispatcher_cls):
+        self.mgr.conf.dispatch_workers = 4
+        mgr = manager.LbaasAgentManager(self.mgr.conf)
+        dispatcher_cls.assert_called_once_with(4)
+        self.assertEqual(dispatcher_cls.return_value, mgr.dispatcher)
+
+    def test_report_state_dispatch_stats(self):
+        self.driver_mock.get_worker_counts.side_effect = NotImplementedError
+        self.driver_mock.get_capacity.side_effect = NotImplementedError
+        self.mgr.dispatcher = mock.Mock()
+        self.mgr.dispatcher.get_stats.return_value = {
+            'queued_operations': 3, 'queue_wait_avg': 0.2,
+            'queue_wait_max': 0.5}
+        with mock.patch.object(self.mgr, 'state_rpc'):
+            self.mgr._report_state()
+        configurations = self.mgr.agent_state['configurations']
+        self.assertEqual(3, configurations['queued_operations'])
+        self.assertEqual(0.5, configurations['queue_wait_max'])
+
     def _sync_state_helper(self, ready, reloaded, destroyed):
         with mock.patch.object(self.mgr, '_reload_loadbalancer') as reload, \
                 mock.patch.object(self.mgr, '_destroy_loadbalancer') as \
@@ -139,6 +339,19 @@ class TestManager(base.BaseTestCase):
         self.assertIn(lb['id'], self.mgr.instance_mapping)
         self.rpc_mock.loadbalancer_deployed.assert_called_once_with(lb_id)
 
+    def test_reload_loadbalancer_caches_graph(self):
+        lb = data_models.LoadBalancer(id='1').to_dict()
+        lb['provider'] = {'device_driver': 'devdriver'}
+        lb['revision'] = 3
+        self.rpc_mock.get_loadbalancer.return_value = lb
+
+        self.mgr._reload_loadbalancer('1')
+
+        graph = self.mgr.graph_cache['1']
+        self.assertEqual(3, graph['revision'])
+        self.assertEqual('1', json.loads(graph['graph'])['id'])
+        self.assertNotIn('revision', json.loads(graph['graph']))
+
     def test_reload_loadbalancer_driver_not_found(self):
         lb = data_models.LoadBalancer(id='1').to_dict()
         lb['provider'] = {'device_driver': 'unknowndriver'}
@@ -204,7 +417,16 @@ class TestManager(base.BaseTestCase):
 
     def test_remove_orphans(self):
         self.mgr.remove_orphans()
-        self.driver_mock.remove_orphans.assert_called_once_with(['1', '2'])
+        self.driver_mock.remove_orphans.assert_called_once_with(
+            set(['1', '2']))
+
+    def test_remove_orphans_driver_without_instances(self):
+        other_driver = mock.Mock()
+        self.mgr.device_drivers['otherdriver'] = other_driver
+        self.mgr.remove_orphans()
+        self.driver_mock.remove_orphans.assert_called_once_with(
+            set(['1', '2']))
+        other_driver.remove_orphans.assert_called_once_with(set())
 
     def test_agent_disabled(self):
         payload = {'admin_state_up': False}
@@ -355,6 +577,16 @@ class TestManager(base.BaseTestCase):
             loadbalancer)
         self.update_statuses.assert_called_once_with(loadbalancer)
 
+    @mock.patch.object(data_models.LoadBalancer, 'from_dict')
+    def test_create_loadbalancer_saves_snapshot(self, mlb):
+        snapshot_path = self._use_instance_snapshot()
+        loadbalancer = data_models.LoadBalancer(id='3')
+        mlb.return_value = loadbalancer
+        self.mgr.create_loadbalancer(mock.Mock(), loadbalancer.to_dict(),
+                                     'devdriver')
+        with open(snapshot_path) as snapshot_file:
+            self.assertEqual('devdriver', json.load(snapshot_file)['3'])
+
     @mock.patch.object(data_models.LoadBalancer, 'from_dict')
     def test_create_loadbalancer_failed(self, mlb):
         loadbalancer = data_models.LoadBalancer(id='1')
@@ -593,6 +825,178 @@ class TestManager(base.BaseTestCase):
         self.mgr.delete_member(mock.Mock(), member.to_dict())
         self.driver_mock.member.delete.assert_called_once_with(member)
 
+    def _cache_member_delta_graph(self, revision=3):
+        member = data_models.Member(
+            id='member1', pool_id='pool1', address='10.0.0.5',
+            protocol_port=80, weight=1, admin_state_up=True,
+            provisioning_status=constants.ACTIVE)
+        pool = data_models.Pool(id='pool1', members=[member])
+        listener = data_models.Listener(id='listener1', default_pool=pool)
+        lb = data_models.LoadBalancer(id='1', listeners=[listener],
+                                      pools=[pool])
+        self.mgr.graph_cache['1'] = {'revision': revision,
+                                     'graph': json.dumps(lb.to_dict())}
+        return lb.to_dict()
+
+    def _get_member_delta(self, operation='update', revision=4, **kwargs):
+        delta = {'operation': operation, 'loadbalancer_id': '1',
+                 'pool_id': 'pool1', 'member_id': 'member1',
+                 'revision': revision}
+        if operation == 'update':
+            delta['member'] = {'weight': 5,
+                               'provisioning_status': constants.PENDING_UPDATE}
+            delta['old_member'] = {'weight': 1,
+                                   'provisioning_status': constants.ACTIVE}
+        delta.update(kwargs)
+        return delta
+
+    def _get_cached_pools(self):
+        lb = json.loads(self.mgr.graph_cache['1']['graph'])
+        return [lb['pools'][0], lb['listeners'][0]['default_pool']]
+
+    def test_member_delta_update(self):
+        self._cache_member_delta_graph()
+        self.mgr.member_delta(mock.Mock(), self._get_member_delta())
+
+        old_member, member = self.driver_mock.member.update.call_args[0]
+        self.assertEqual(1, old_member.weight)
+        self.assertEqual(5, member.weight)
+        self.assertEqual('10.0.0.5', member.address)
+        self.assertEqual('1', member.pool.loadbalancer.id)
+        self.assertEqual(['listener1'],
+                         [listener.id for listener
+                          in member.pool.loadbalancer.listeners])
+        self.update_statuses.assert_called_once_with(member)
+        self.assertEqual(4, self.mgr.graph_cache['1']['revision'])
+        for pool in self._get_cached_pools():
+            self.assertEqual(5, pool['members'][0]['weight'])
+        self.assertFalse(self.rpc_mock.get_loadbalancer.called)
+
+    def test_member_delta_create(self):
+        self._cache_member_delta_graph()
+        delta = self._get_member_delta(
+            'create', member_id='member2',
+            member={'id': 'member2', 'pool_id': 'pool1',
+                    'address': '10.0.0.6', 'protocol_port': 80,
+                    'weight': 1, 'admin_state_up': True,
+                    'provisioning_status': constants.PENDING_CREATE})
+        self.mgr.member_delta(mock.Mock(), delta)
+
+        member = self.driver_mock.member.create.call_args[0][0]
+        self.assertEqual('member2', member.id)
+        self.assertIn(member, member.pool.members)
+        self.update_statuses.assert_called_once_with(member)
+        for pool in self._get_cached_pools():
+            self.assertEqual(['member1', 'member2'],
+                             [m['id'] for m in pool['members']])
+
+    def test_member_delta_delete(self):
+        self._cache_member_delta_graph()
+        self.mgr.member_delta(mock.Mock(), self._get_member_delta('delete'))
+
+        member = self.driver_mock.member.delete.call_args[0][0]
+        self.assertEqual('member1', member.id)
+        self.assertIn(member, member.pool.members)
+        self.assertFalse(self.update_statuses.called)
+        for pool in self._get_cached_pools():
+            self.assertEqual([], pool['members'])
+
+    def test_member_delta_stale(self):
+        self._cache_member_delta_graph(revision=4)
+        self.mgr.member_delta(mock.Mock(), self._get_member_delta())
+
+        self.assertFalse(self.driver_mock.member.update.called)
+        self.assertFalse(self.rpc_mock.get_loadbalancer.called)
+        member = self.update_statuses.call_args[0][0]
+        self.assertEqual('member1', member.id)
+        self.assertEqual('1', member.root_loadbalancer.id)
+
+    def _test_member_delta_fetch(self, delta, lb):
+        lb['revision'] = 6
+        self.rpc_mock.get_loadbalancer.return_value = lb
+        self.mgr.member_delta(mock.Mock(), delta)
+
+        self.rpc_mock.get_loadbalancer.assert_called_once_with('1')
+        self.assertFalse(self.driver_mock.member.update.called)
+        called_lb = self.driver_mock.deploy_instance.call_args[0][0]
+        self.assertEqual('1', called_lb.id)
+        self.assertEqual(6, self.mgr.graph_cache['1']['revision'])
+        self.assertTrue(self.update_statuses.called)
+
+    def test_member_delta_revision_gap(self):
+        lb = self._cache_member_delta_graph()
+        self._test_member_delta_fetch(self._get_member_delta(revision=5), lb)
+
+    def test_member_delta_member_changed(self):
+        lb = self._cache_member_delta_graph()
+        self._test_member_delta_fetch(self._get_member_delta(
+            old_member={'weight': 2}), lb)
+
+    def test_member_delta_unknown_pool(self):
+        lb = self._cache_member_delta_graph()
+        self._test_member_delta_fetch(self._get_member_delta(
+            pool_id='pool2'), lb)
+
+    def test_member_delta_after_full_payload(self):
+        lb = self._cache_member_delta_graph()
+        self.mgr.update_pool(mock.Mock(), {'id': 'pool1'}, {
+            'id': 'pool1', 'loadbalancer': {'id': '1'}})
+        self.assertEqual({}, self.mgr.graph_cache['1'])
+        self._test_member_delta_fetch(self._get_member_delta(), lb)
+
+    def test_member_delta_fetch_failed(self):
+        self.rpc_mock.get_loadbalancer.side_effect = Exception
+        self.mgr.member_delta(mock.Mock(), self._get_member_delta())
+
+        self.assertTrue(self.log.exception.called)
+        self.assertTrue(self.mgr.needs_resync)
+        self.assertNotIn('1', self.mgr.graph_cache)
+        self.assertFalse(self.update_statuses.called)
+
+    def test_member_delta_failed(self):
+        self._cache_member_delta_graph()
+        self.driver_mock.member.update.side_effect = Exception
+        self.mgr.member_delta(mock.Mock(), self._get_member_delta())
+
+        member = self.driver_mock.member.update.call_args[0][1]
+        self.update_statuses.assert_called_once_with(member, error=True)
+        self.assertEqual({}, self.mgr.graph_cache['1'])
+
+    def test_member_delta_unknown_loadbalancer(self):
+        self.assertRaises(manager.DeviceNotFoundOnAgent,
+                          self.mgr.member_delta, mock.Mock(),
+                          self._get_member_delta(loadbalancer_id='3'))
+
+    def _test_dispatched(self, handler, expected_lb_id, *args, **kwargs):
+        self.mgr.dispatcher = mock.Mock()
+        context = mock.Mock()
+        getattr(self.mgr, handler)(context, *args, **kwargs)
+        dispatch_args, dispatch_kwargs = self.mgr.dispatcher.dispatch.call_args
+        self.assertEqual((expected_lb_id, mock.ANY, self.mgr, context) + args,
+                         dispatch_args)
+        self.assertEqual(kwargs, dispatch_kwargs)
+        self.assertFalse(self.driver_mock.method_calls)
+        # the queued call runs the handler itself
+        dispatch_args[1](*dispatch_args[2:], **dispatch_kwargs)
+
+    def test_dispatched_by_loadbalancer(self):
+        member = {'id': '1', 'pool_id': '1',
+                  'pool': {'id': '1', 'loadbalancer_id': '2',
+                           'loadbalancer': {'id': '2'}}}
+        self._test_dispatched('create_member', '2', member=member)
+        self.driver_mock.member.create.assert_called_once_with(mock.ANY)
+
+    def test_dispatched_positional(self):
+        l7rule = {'id': '1', 'policy': {'id': '1', 'listener': {
+            'id': '1', 'loadbalancer_id': '2', 'loadbalancer': {'id': '2'}}}}
+        self._test_dispatched('update_l7rule', '2', {}, l7rule)
+        self.assertTrue(self.driver_mock.l7rule.update.called)
+
+    def test_dispatched_unknown_loadbalancer(self):
+        with mock.patch.object(self.mgr, 'dispatcher') as dispatcher:
+            self.mgr.delete_pool(mock.Mock(), pool={'id': '1'})
+        self.assertIsNone(dispatcher.dispatch.call_args[0][0])
+
     @mock.patch.object(data_models.HealthMonitor, 'from_dict')
     def test_create_monitor(self, mmonitor):
         loadbalancer = data_models.LoadBalancer(id='1')
@@ -656,3 +1060,62 @@ class TestManager(base.BaseTestCase):
         self.mgr.delete_healthmonitor(mock.Mock(), monitor.to_dict())
         self.driver_mock.healthmonitor.delete.assert_called_once_with(
             monitor)
+
+    def _l7policy(self, **kwargs):
+        loadbalancer = data_models.LoadBalancer(id='1')
+        listener = data_models.Listener(id='1', loadbalancer=loadbalancer)
+        return data_models.L7Policy(id='1', listener=listener, **kwargs)
+
+    @mock.patch.object(data_models.L7Policy, 'from_dict')
+    def test_create_l7policy(self, mpolicy):
+        l7policy = self._l7policy()
+        mpolicy.return_value = l7policy
+        self.mgr.create_l7policy(mock.Mock(), l7policy.to_dict())
+        self.driver_mock.l7policy.create.assert_called_once_with(l7policy)
+        self.update_statuses.assert_called_once_with(l7policy)
+
+    @mock.patch.object(data_models.L7Policy, 'from_dict')
+    def test_update_l7policy_failed(self, mpolicy):
+        l7policy = self._l7policy(position=1)
+        old_l7policy = self._l7policy(position=2)
+        mpolicy.side_effect = [l7policy, old_l7policy]
+        self.driver_mock.l7policy.update.side_effect = Exception
+        self.mgr.update_l7policy(mock.Mock(), old_l7policy.to_dict(),
+                                 l7policy.to_dict())
+        self.driver_mock.l7policy.update.assert_called_once_with(
+            old_l7policy, l7policy)
+        self.update_statuses.assert_called_once_with(l7policy, error=True)
+
+    @mock.patch.object(data_models.L7Policy, 'from_dict')
+    def test_delete_l7policy(self, mpolicy):
+        l7policy = self._l7policy()
+        mpolicy.return_value = l7policy
+        self.mgr.delete_l7policy(mock.Mock(), l7policy.to_dict())
+        self.driver_mock.l7policy.delete.assert_called_once_with(l7policy)
+
+    @mock.patch.object(data_models.L7Rule, 'from_dict')
+    def test_create_l7rule(self, mrule):
+        l7rule = data_models.L7Rule(id='1', policy=self._l7policy())
+        mrule.return_value = l7rule
+        self.mgr.create_l7rule(mock.Mock(), l7rule.to_dict())
+        self.driver_mock.l7rule.create.assert_called_once_with(l7rule)
+        self.update_statuses.assert_called_once_with(l7rule)
+
+    @mock.patch.object(data_models.L7Rule, 'from_dict')
+    def test_update_l7rule(self, mrule):
+        l7policy = self._l7policy()
+        l7rule = data_models.L7Rule(id='1', policy=l7policy, value='a')
+        old_l7rule = data_models.L7Rule(id='1', policy=l7policy, value='b')
+        mrule.side_effect = [l7rule, old_l7rule]
+        self.mgr.update_l7rule(mock.Mock(), old_l7rule.to_dict(),
+                               l7rule.to_dict())
+        self.driver_mock.l7rule.update.assert_called_once_with(old_l7rule,
+                                                               l7rule)
+        self.update_statuses.assert_called_once_with(l7rule)
+
+    @mock.patch.object(data_models.L7Rule, 'from_dict')
+    def test_delete_l7rule(self, mrule):
+        l7rule = data_models.L7Rule(id='1', policy=self._l7policy())
+        mrule.return_value = l7rule
+        self.mgr.delete_l7rule(mock.Mock(), l7rule.to_dict())
+        self.driver_mock.l7rule.delete.assert_called_once_with(l7rule)
@@ -0,0 +1,102 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import mock
+
+from neutron_lbaas.agent import dispatcher
+from neutron_lbaas.tests import base
+
+
+class TestLoadBalancerDispatcher(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestLoadBalancerDispatcher, self).setUp()
+        self.dispatcher = dispatcher.LoadBalancerDispatcher(2)
+        self.started = []
+        self.events = {}
+
+    def _operation(self, name):
+        self.started.append(name)
+        self.events.setdefault(name, eventlet.event.Event()).wait()
+
+    @staticmethod
+    def _run_greenthreads():
+        # every step of a dispatch is a greenthread switch
+        for _ in range(5):
+            eventlet.sleep(0)
+
+    def _finish(self, name):
+        self.events.setdefault(name, eventlet.event.Event()).send()
+        self._run_greenthreads()
+
+    def test_dispatch_in_order_per_loadbalancer(self):
+        for name in ('a1', 'b1', 'a2'):
+            self.dispatcher.dispatch(name[0], self._operation, name)
+        self._run_greenthreads()
+        self.assertEqual(['a1', 'b1'], self.started)
+        self.assertEqual(1, self.dispatcher.get_stats()['queued_operations'])
+        self._finish('b1')
+        self.assertEqual(['a1', 'b1'], self.started)
+        self._finish('a1')
+        self.assertEqual(['a1', 'b1', 'a2'], self.started)
+        self._finish('a2')
+        self.assertEqual({}, self.dispatcher._queues)
+
+    def test_dispatch_bounded_workers(self):
+        for name in ('a1', 'b1', 'c1'):
+            self.dispatcher.dispatch(name[0], self._operation, name)
+        self._run_greenthreads()
+        self.assertEqual(['a1', 'b1'], self.started)
+        self._finish('a1')
+        self.assertEqual(['a1', 'b1', 'c1'], self.started)
+
+    @mock.patch('oslo_utils.timeutils.now')
+    def test_queued_at(self, now):
+        queued = []
+        now.return_value = 10
+        self.dispatcher.dispatch('a', self._operation, 'a1')
+        now.return_value = 11
+        self.dispatcher.dispatch(
+            'a', lambda: queued.append(dispatcher.queued_at()))
+        self.assertIsNone(dispatcher.queued_at())
+        self._finish('a1')
+        self.assertEqual([11], queued)
+        self.assertIsNone(dispatcher.queued_at())
+
+    @mock.patch.object(dispatcher, 'LOG')
+    def test_dispatch_failed_operation(self, log):
+        operation = mock.Mock(side_effect=Exception, __name__='operation')
+        self.dispatcher.dispatch('a', operation, 'a1')
+        self.dispatcher.dispatch('a', self._operation, 'a2')
+        self._run_greenthreads()
+        operation.assert_called_once_with('a1')
+        self.assertTrue(log.exception.called)
+        self.assertEqual(['a2'], self.started)
+
+    @mock.patch('oslo_utils.timeutils.now')
+    def test_get_stats(self, now):
+        now.return_value = 10
+        self.dispatcher.dispatch('a', self._operation, 'a1')
+        self.dispatcher.dispatch('a', self._operation, 'a2')
+        now.return_value = 12
+        self._run_greenthreads()
+        now.return_value = 13
+        self._finish('a1')
+        self.assertEqual({'queued_operations': 0, 'queue_wait_avg': 2.5,
+                          'queue_wait_max': 3},
+                         self.dispatcher.get_stats())
+        self.assertEqual({'queued_operations': 0, 'queue_wait_avg': 0,
+                          'queue_wait_max': 0},
+                         self.dispatcher.get_stats())
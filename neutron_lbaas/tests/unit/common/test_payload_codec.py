@@ -0,0 +1,88 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import mock
+
+from neutron_lbaas.common import payload_codec
+from neutron_lbaas.tests import base
+
+
+class TestPayloadCodec(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPayloadCodec, self).setUp()
+        self.payload = {
+            'id': 'lb1', 'name': u'\xe9quilibreur',
+            'pools': [{'id': 'pool1', 'members': [
+                {'id': 'member%d' % index, 'address': '10.0.0.%d' % index,
+                 'protocol_port': 80, 'weight': 1, 'admin_state_up': True,
+                 'subnet_id': None} for index in range(200)]}]}
+
+    def _test_round_trip(self, payload_format):
+        encoded = payload_codec.encode(self.payload, [payload_format])
+        self.assertEqual(payload_format,
+                         encoded[payload_codec.ENCODED]['format'])
+        # the encoded payload still travels as JSON
+        encoded = json.loads(json.dumps(encoded))
+        self.assertLess(len(json.dumps(encoded)),
+                        len(json.dumps(self.payload)) // 4)
+        self.assertEqual(self.payload, payload_codec.decode(encoded))
+
+    def test_round_trip_json(self):
+        self._test_round_trip(payload_codec.JSON)
+
+    def test_round_trip_msgpack(self):
+        if not payload_codec.msgpackutils:
+            self.skipTest('msgpack is not installed')
+        self._test_round_trip(payload_codec.MSGPACK)
+
+    def test_decode_msgpack(self):
+        if not payload_codec.msgpackutils:
+            self.skipTest('msgpack is not installed')
+        encoded = payload_codec.encode(self.payload, [payload_codec.MSGPACK])
+        with mock.patch.object(payload_codec.msgpackutils, 'loads',
+                               return_value=self.payload) as loads:
+            self.assertEqual(self.payload, payload_codec.decode(encoded))
+        # no msgpack arguments which only some of its versions know
+        loads.assert_called_once_with(mock.ANY)
+
+    def test_encode_prefers_receiver_order(self):
+        with mock.patch.object(payload_codec, 'get_formats',
+                               return_value=['msgpack', 'json']), \
+                mock.patch.object(payload_codec, '_pack',
+                                  return_value=b'x' * 10000) as pack:
+            encoded = payload_codec.encode(self.payload,
+                                           ['yaml', 'json', 'msgpack'])
+        pack.assert_called_once_with(self.payload, 'json')
+        self.assertEqual('json', encoded[payload_codec.ENCODED]['format'])
+
+    def test_encode_small_payload(self):
+        payload = {'id': 'lb1'}
+        self.assertIs(payload, payload_codec.encode(payload, ['json']))
+
+    def test_encode_unknown_formats(self):
+        self.assertIs(self.payload,
+                      payload_codec.encode(self.payload, ['yaml']))
+        self.assertIs(self.payload, payload_codec.encode(self.payload, []))
+
+    def test_decode_plain_payload(self):
+        self.assertIs(self.payload, payload_codec.decode(self.payload))
+        self.assertIsNone(payload_codec.decode(None))
+
+    def test_decode_unknown_format(self):
+        self.assertRaises(ValueError, payload_codec.decode,
+                          {payload_codec.ENCODED: {'format': 'yaml',
+                                                   'data': ''}})
@@ -4191,6 +4191,83 @@ class LbaasStatusesTest(MemberTestBase):
         self._assertNotDegraded(self._traverse_statuses(statuses,
             listener='listener_HTTPS'))
 
+    def test_member_stats_set_operating_status(self):
+        ctx = context.get_admin_context()
+        lb_dict = self._create_new_populated_loadbalancer()
+        lb_id = lb_dict['id']
+        listener_id = lb_dict['listeners'][0]['id']
+        pool_id = lb_dict['listeners'][0]['pools'][0]['id']
+        members = lb_dict['listeners'][0]['pools'][0]['members']
+        alt_listener_id = lb_dict['listeners'][1]['id']
+        alt_pool_id = lb_dict['listeners'][1]['pools'][0]['id']
+        alt_members = lb_dict['listeners'][1]['pools'][0]['members']
+        self.plugin.db.update_loadbalancer_stats_bulk(ctx, {lb_id: {
+            'members': {
+                members[0]['id']: {
+                    lb_const.STATS_STATUS: constants.INACTIVE,
+                    lb_const.STATS_HEALTH: 'L4CON'},
+                members[1]['id']: {
+                    lb_const.STATS_STATUS: constants.ACTIVE,
+                    lb_const.STATS_HEALTH: ''},
+                alt_members[0]['id']: {
+                    lb_const.STATS_STATUS: constants.ACTIVE,
+                    lb_const.STATS_HEALTH: 'L7OK'}}}})
+
+        member = self.plugin.db.get_pool_member(ctx, members[0]['id'])
+        self.assertEqual(lb_const.OFFLINE, member.operating_status)
+        member = self.plugin.db.get_pool_member(ctx, members[1]['id'])
+        self.assertEqual(lb_const.NO_MONITOR, member.operating_status)
+        self.assertEqual(lb_const.DEGRADED,
+                         self.plugin.db.get_pool(ctx, pool_id)
+                         .operating_status)
+        self.assertEqual(lb_const.DEGRADED,
+                         self.plugin.db.get_listener(ctx, listener_id)
+                         .operating_status)
+        self.assertEqual(lb_const.DEGRADED,
+                         self.plugin.db.get_loadbalancer(ctx, lb_id)
+                         .operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_pool(ctx, alt_pool_id)
+                         .operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_listener(ctx, alt_listener_id)
+                         .operating_status)
+
+        self.plugin.db.update_loadbalancer_stats_bulk(ctx, {lb_id: {
+            'members': {
+                members[0]['id']: {
+                    lb_const.STATS_STATUS: constants.ACTIVE,
+                    lb_const.STATS_HEALTH: 'L7OK'}}}})
+
+        member = self.plugin.db.get_pool_member(ctx, members[0]['id'])
+        self.assertEqual(lb_const.ONLINE, member.operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_pool(ctx, pool_id)
+                         .operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_listener(ctx, listener_id)
+                         .operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_loadbalancer(ctx, lb_id)
+                         .operating_status)
+
+    def test_member_stats_keep_disabled_members_out_of_degraded(self):
+        ctx = context.get_admin_context()
+        lb_dict = self._create_new_populated_loadbalancer()
+        pool_id = lb_dict['listeners'][0]['pools'][0]['id']
+        member_id = lb_dict['listeners'][0]['pools'][0]['members'][0]['id']
+        self._update_member_api(pool_id, member_id,
+                                {'member': {'admin_state_up': False}})
+        self.plugin.db.update_loadbalancer_stats_bulk(ctx, {lb_dict['id']: {
+            'members': {member_id: {
+                lb_const.STATS_STATUS: constants.INACTIVE,
+                lb_const.STATS_HEALTH: ''}}}})
+        member = self.plugin.db.get_pool_member(ctx, member_id)
+        self.assertEqual(lb_const.OFFLINE, member.operating_status)
+        self.assertEqual(lb_const.ONLINE,
+                         self.plugin.db.get_pool(ctx, pool_id)
+                         .operating_status)
+
     def _assertOnline(self, obj):
         OS = "operating_status"
         if OS in obj:
@@ -23,6 +23,7 @@ from oslo_utils import uuidutils
 import six
 from six import moves
 
+from neutron_lbaas.common import payload_codec
 from neutron_lbaas.db.loadbalancer import loadbalancer_dbv2 as ldb
 from neutron_lbaas.db.loadbalancer import models as db_models
 from neutron_lbaas.drivers.common import agent_callbacks
@@ -155,9 +156,60 @@ class TestLoadBalancerCallbacks(
                 ctx, expected_lb['vip_subnet_id'])
             subnet = data_models.Subnet.from_dict(subnet).to_dict()
             expected_lb['vip_port']['fixed_ips'][0]['subnet'] = subnet
+            expected_lb['revision'] = 0
             del expected_lb['stats']
             self.assertEqual(expected_lb, load_balancer)
 
+    def test_get_loadbalancer_revision(self):
+        with self.loadbalancer() as loadbalancer:
+            ctx = context.get_admin_context()
+            lb_id = loadbalancer['loadbalancer']['id']
+            self.assertEqual(1, self.plugin_instance.db.
+                             bump_loadbalancer_revision(ctx, lb_id))
+            self.assertEqual(2, self.plugin_instance.db.
+                             bump_loadbalancer_revision(ctx, lb_id))
+
+            load_balancer = self.callbacks.get_loadbalancer(ctx, lb_id)
+            self.assertEqual(2, load_balancer['revision'])
+
+    def test_get_loadbalancer_formats(self):
+        with self.loadbalancer() as loadbalancer:
+            ctx = context.get_admin_context()
+            lb_id = loadbalancer['loadbalancer']['id']
+            load_balancer = self.callbacks.get_loadbalancer(ctx, lb_id)
+            with mock.patch.object(payload_codec, 'COMPRESS_MIN_SIZE', 0):
+                encoded = self.callbacks.get_loadbalancer(
+                    ctx, lb_id, formats=[payload_codec.JSON])
+
+            self.assertIn(payload_codec.ENCODED, encoded)
+            self.assertEqual(load_balancer, payload_codec.decode(encoded))
+
+    def _test_get_flavor_metadata(self, metainfo, profiles=('sp1',)):
+        flavors_plugin = mock.Mock()
+        flavors_plugin.get_flavor.return_value = {
+            'id': 'flavor1', 'service_profiles': list(profiles)}
+        flavors_plugin.get_service_profile.return_value = {
+            'id': 'sp1', 'metainfo': metainfo}
+        with mock.patch('neutron.manager.NeutronManager.'
+                        'get_service_plugins') as get_service_plugins:
+            get_service_plugins.return_value = {
+                constants.FLAVORS: flavors_plugin}
+            return self.callbacks._get_flavor_metadata(
+                context.get_admin_context(), 'flavor1')
+
+    def test_get_flavor_metadata(self):
+        self.assertEqual(
+            {'nbthread': 4, 'tune': {'bufsize': 32768}},
+            self._test_get_flavor_metadata(
+                '{"nbthread": 4, "tune": {"bufsize": 32768}}'))
+
+    def test_get_flavor_metadata_invalid(self):
+        self.assertEqual({}, self._test_get_flavor_metadata('nbthread=4'))
+        self.assertEqual({}, self._test_get_flavor_metadata('[4]'))
+        self.assertEqual({}, self._test_get_flavor_metadata(''))
+        self.assertEqual({}, self._test_get_flavor_metadata('{}',
+                                                            profiles=()))
+
     def _update_port_test_helper(self, expected, func, **kwargs):
         core = self.plugin_instance.db._core_plugin
 
@@ -289,3 +341,32 @@ class TestLoadBalancerCallbacks(
                                          loadbalancer_id,
                                          provisioning_status=constants.ACTIVE)
             self.assertTrue(mock_log.warning.called)
+
+    def test_update_loadbalancer_stats_bulk(self):
+        with self.loadbalancer() as loadbalancer:
+            loadbalancer_id = loadbalancer['loadbalancer']['id']
+            ctx = context.get_admin_context()
+            stats = {lb_const.STATS_IN_BYTES: 10,
+                     lb_const.STATS_OUT_BYTES: 20,
+                     lb_const.STATS_ACTIVE_CONNECTIONS: 1}
+            self.callbacks.update_loadbalancer_stats_bulk(
+                ctx, stats={loadbalancer_id: stats,
+                            'deleted_lb': {lb_const.STATS_IN_BYTES: 1}})
+            lb_stats = self.plugin_instance.db.stats(ctx, loadbalancer_id)
+            self.assertEqual(10, lb_stats.bytes_in)
+            self.assertEqual(20, lb_stats.bytes_out)
+            self.assertEqual(1, lb_stats.active_connections)
+            self.assertEqual(0, lb_stats.total_connections)
+
+    def test_update_loadbalancer_stats_bulk_partial(self):
+        with self.loadbalancer() as loadbalancer:
+            loadbalancer_id = loadbalancer['loadbalancer']['id']
+            ctx = context.get_admin_context()
+            self.callbacks.update_loadbalancer_stats_bulk(
+                ctx, stats={loadbalancer_id: {lb_const.STATS_IN_BYTES: 10,
+                                              lb_const.STATS_OUT_BYTES: 20}})
+            self.callbacks.update_loadbalancer_stats_bulk(
+                ctx, stats={loadbalancer_id: {lb_const.STATS_IN_BYTES: 30}})
+            lb_stats = self.plugin_instance.db.stats(ctx, loadbalancer_id)
+            self.assertEqual(30, lb_stats.bytes_in)
+            self.assertEqual(20, lb_stats.bytes_out)
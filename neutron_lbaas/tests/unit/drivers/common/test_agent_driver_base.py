@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
 import mock
 
 from neutron import context
@@ -22,6 +24,7 @@ from neutron.plugins.common import constants
 from neutron_lbaas.db.loadbalancer import models
 from neutron_lbaas.drivers.common import agent_driver_base
 from neutron_lbaas.extensions import loadbalancerv2
+from neutron_lbaas.services.loadbalancer import data_models
 from neutron_lbaas.tests import base
 from neutron_lbaas.tests.unit.db.loadbalancer import test_db_loadbalancerv2
 
@@ -109,6 +112,16 @@ class TestLoadBalancerAgentApi(base.BaseTestCase):
     def test_delete_member(self):
         self._call_test_helper('delete_member', {'member': 'test'})
 
+    def test_member_delta(self):
+        with mock.patch.object(self.api.client, 'cast') as rpc_mock, \
+                mock.patch.object(self.api.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = self.api.client
+            self.api.member_delta(mock.sentinel.context, 'test', 'host')
+
+        prepare_mock.assert_called_once_with(server='host', version='1.2')
+        rpc_mock.assert_called_once_with(mock.sentinel.context,
+                                         'member_delta', delta='test')
+
     def test_create_monitor(self):
         self._call_test_helper('create_healthmonitor',
                                {'healthmonitor': 'test'})
@@ -122,6 +135,96 @@ class TestLoadBalancerAgentApi(base.BaseTestCase):
         self._call_test_helper('delete_healthmonitor',
                                {'healthmonitor': 'test'})
 
+    def test_create_l7policy(self):
+        self._call_test_helper('create_l7policy', {'l7policy': 'test'})
+
+    def test_update_l7policy(self):
+        self._call_test_helper('update_l7policy', {'old_l7policy': 'test',
+                                                   'l7policy': 'test'})
+
+    def test_delete_l7policy(self):
+        self._call_test_helper('delete_l7policy', {'l7policy': 'test'})
+
+    def test_create_l7rule(self):
+        self._call_test_helper('create_l7rule', {'l7rule': 'test'})
+
+    def test_update_l7rule(self):
+        self._call_test_helper('update_l7rule', {'old_l7rule': 'test',
+                                                 'l7rule': 'test'})
+
+    def test_delete_l7rule(self):
+        self._call_test_helper('delete_l7rule', {'l7rule': 'test'})
+
+
+class TestMemberDelta(base.BaseTestCase):
+    def setUp(self):
+        super(TestMemberDelta, self).setUp()
+        lb = data_models.LoadBalancer(id='lb1')
+        pool = data_models.Pool(id='pool1', loadbalancer=lb)
+        self.old_member = data_models.Member(
+            id='member1', pool_id='pool1', address='10.0.0.5',
+            protocol_port=80, weight=1, admin_state_up=True,
+            operating_status='ONLINE', provisioning_status='ACTIVE',
+            pool=pool)
+        self.member = copy.copy(self.old_member)
+        self.member.weight = 5
+        self.member.provisioning_status = constants.PENDING_UPDATE
+        self.member.operating_status = 'OFFLINE'
+
+        self.driver = mock.Mock()
+        self.driver.plugin.db.bump_loadbalancer_revision.return_value = 7
+        self.manager = agent_driver_base.MemberManager(self.driver)
+
+    def test_get_member_delta_update(self):
+        delta = agent_driver_base.get_member_delta(
+            'update', self.member, 7, self.old_member)
+        self.assertEqual(
+            {'operation': 'update', 'loadbalancer_id': 'lb1',
+             'pool_id': 'pool1', 'member_id': 'member1', 'revision': 7,
+             'member': {'weight': 5,
+                        'provisioning_status': constants.PENDING_UPDATE},
+             'old_member': {'weight': 1,
+                            'provisioning_status': constants.ACTIVE}},
+            delta)
+
+    def test_get_member_delta_create(self):
+        delta = agent_driver_base.get_member_delta('create', self.member, 7)
+        self.assertEqual(10, len(delta['member']))
+        self.assertEqual('10.0.0.5', delta['member']['address'])
+        self.assertNotIn('pool', delta['member'])
+        self.assertNotIn('operating_status', delta['member'])
+        self.assertNotIn('old_member', delta)
+
+    def test_get_member_delta_delete(self):
+        delta = agent_driver_base.get_member_delta('delete', self.member, 7)
+        self.assertEqual(
+            {'operation': 'delete', 'loadbalancer_id': 'lb1',
+             'pool_id': 'pool1', 'member_id': 'member1', 'revision': 7},
+            delta)
+
+    def test_update_sends_delta(self):
+        self.driver.get_loadbalancer_agent.return_value = {
+            'host': 'host', 'configurations': {'member_deltas': True}}
+        self.manager.update(mock.sentinel.context, self.old_member,
+                            self.member)
+        self.driver.plugin.db.bump_loadbalancer_revision.\
+            assert_called_once_with(mock.sentinel.context, 'lb1')
+        self.driver.agent_rpc.member_delta.assert_called_once_with(
+            mock.sentinel.context, agent_driver_base.get_member_delta(
+                'update', self.member, 7, self.old_member), 'host')
+        self.assertFalse(self.driver.agent_rpc.update_member.called)
+
+    def test_update_without_delta_support(self):
+        self.driver.get_loadbalancer_agent.return_value = {
+            'host': 'host', 'configurations': {}}
+        self.manager.update(mock.sentinel.context, self.old_member,
+                            self.member)
+        self.assertFalse(
+            self.driver.plugin.db.bump_loadbalancer_revision.called)
+        self.assertFalse(self.driver.agent_rpc.member_delta.called)
+        self.driver.agent_rpc.update_member.assert_called_once_with(
+            mock.sentinel.context, self.old_member, self.member, 'host')
+
 
 class TestLoadBalancerPluginNotificationWrapper(TestLoadBalancerPluginBase):
     def setUp(self):
@@ -580,3 +683,50 @@ class TestLoadBalancerPluginNotificationWrapper(TestLoadBalancerPluginBase):
                             loadbalancerv2.EntityNotFound,
                             self.plugin_instance.db.get_healthmonitor,
                             ctx, hm_id)
+
+    def test_create_l7policy(self):
+        with self.loadbalancer(no_delete=True) as loadbalancer:
+            lb_id = loadbalancer['loadbalancer']['id']
+            self._update_status(models.LoadBalancer, constants.ACTIVE, lb_id)
+            with self.listener(loadbalancer_id=lb_id,
+                               no_delete=True) as listener:
+                listener_id = listener['listener']['id']
+                self._update_status(models.LoadBalancer, constants.ACTIVE,
+                                    lb_id)
+                with self.l7policy(listener_id, no_delete=True) as l7policy:
+                    l7policy_id = l7policy['l7policy']['id']
+                    calls = self.mock_api.create_l7policy.call_args_list
+                    _, called_l7policy, called_host = calls[0][0]
+                    self.assertEqual(l7policy_id, called_l7policy.id)
+                    self.assertEqual('host', called_host)
+                    self.assertEqual(constants.PENDING_CREATE,
+                                     called_l7policy.provisioning_status)
+
+    def test_delete_l7policy(self):
+        with self.loadbalancer(no_delete=True) as loadbalancer:
+            lb_id = loadbalancer['loadbalancer']['id']
+            self._update_status(models.LoadBalancer, constants.ACTIVE, lb_id)
+            with self.listener(loadbalancer_id=lb_id,
+                               no_delete=True) as listener:
+                listener_id = listener['listener']['id']
+                self._update_status(models.LoadBalancer, constants.ACTIVE,
+                                    lb_id)
+                with self.l7policy(listener_id, no_delete=True) as l7policy:
+                    l7policy_id = l7policy['l7policy']['id']
+                    self._update_status(models.LoadBalancer, constants.ACTIVE,
+                                        lb_id)
+                    ctx = context.get_admin_context()
+                    self.plugin_instance.delete_l7policy(ctx, l7policy_id)
+                    calls = self.mock_api.delete_l7policy.call_args_list
+                    _, called_l7policy, called_host = calls[0][0]
+                    self.assertEqual(l7policy_id, called_l7policy.id)
+                    self.assertEqual('host', called_host)
+                    self.assertEqual(constants.PENDING_DELETE,
+                                     called_l7policy.provisioning_status)
+                    lb = self.plugin_instance.db.get_loadbalancer(ctx, lb_id)
+                    self.assertEqual(constants.ACTIVE,
+                                     lb.provisioning_status)
+                    self.assertRaises(
+                        loadbalancerv2.EntityNotFound,
+                        self.plugin_instance.db.get_l7policy,
+                        ctx, l7policy_id)
@@ -0,0 +1,63 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# Output of "show stat -1 6 -1" captured from haproxy 1.6 serving one pool.
+# The last_chk column is quoted by haproxy as soon as it contains a comma.
+STATS_HEADER = (
+    '# pxname,svname,qcur,qmax,scur,smax,slim,stot,bin,bout,dreq,dresp,ereq,'
+    'econ,eresp,wretr,wredis,status,weight,act,bck,chkfail,chkdown,lastchg,'
+    'downtime,qlimit,pid,iid,sid,throttle,lbtot,tracked,type,rate,rate_lim,'
+    'rate_max,check_status,check_code,check_duration,hrsp_1xx,hrsp_2xx,'
+    'hrsp_3xx,hrsp_4xx,hrsp_5xx,hrsp_other,hanafail,req_rate,req_rate_max,'
+    'req_tot,cli_abrt,srv_abrt,comp_in,comp_out,comp_byp,comp_rsp,lastsess,'
+    'last_chk,last_agt,qtime,ctime,rtime,ttime,\n')
+
+POOL_ID = '8e271901-69ed-403e-a59b-f53cf77ef208'
+
+SERVER_UP = (
+    '%(pool)s,%(server)s,0,0,2,9,,4211,1850364,3377311,,0,,0,0,0,0,UP,1,1,0,'
+    '0,0,86211,0,,1,3,%(sid)d,,4211,,2,1,,12,L7OK,200,1,0,4180,0,31,0,0,0,,,,'
+    '0,0,0,0,0,0,0,"HTTP status check returned code <200>",,0,1,3,5,\n')
+
+SERVER_DOWN = (
+    '%(pool)s,%(server)s,0,0,0,3,,112,4480,0,,0,,14,0,3,1,DOWN,1,1,0,9,2,308,'
+    '675,,1,3,%(sid)d,,98,,2,0,,2,L4CON,,2999,0,0,0,0,0,0,0,,,,0,0,0,0,0,0,'
+    '-1,"Layer4 connection problem, info: ""Connection refused""",,0,0,0,0,\n')
+
+BACKEND = (
+    '%(pool)s,BACKEND,1,2,3,4,200,%(stot)d,7764,2365,0,0,,0,0,0,0,UP,%(act)d,'
+    '%(act)d,0,,0,103780,0,,1,3,0,,%(stot)d,,1,0,,0,,,,0,0,0,0,0,0,,,,,0,0,0,'
+    '0,0,0,0,,,0,1,3,5,\n')
+
+
+def server_id(index):
+    return '32a6c2a3-420a-44c3-955d-%012d' % index
+
+
+def show_stat_output(server_count, down_every=10, pool_id=POOL_ID):
+    """Builds "show stat" output for a pool with many servers.
+
+    Every down_every-th server is reported DOWN with a quoted check message.
+    """
+    rows = [STATS_HEADER]
+    for index in range(server_count):
+        template = SERVER_DOWN if index % down_every == 0 else SERVER_UP
+        rows.append(template % {'pool': pool_id,
+                                'server': server_id(index),
+                                'sid': index + 1})
+    rows.append(BACKEND % {'pool': pool_id,
+                           'stot': server_count * 10,
+                           'act': server_count})
+    rows.append('\n')
+    return ''.join(rows)
@@ -0,0 +1,60 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron_lbaas.drivers.haproxy import cpu_pool
+from neutron_lbaas.tests import base
+
+
+class TestCpuPool(base.BaseTestCase):
+
+    def test_parse_cpu_list(self):
+        self.assertEqual([2, 3, 4, 5, 8],
+                         cpu_pool.parse_cpu_list('2-5, 8,4'))
+        self.assertEqual([0], cpu_pool.parse_cpu_list('0,'))
+        for cpu_list in ('a', '5-2', '-1', '1-b'):
+            self.assertRaises(cpu_pool.InvalidCpuList,
+                              cpu_pool.parse_cpu_list, cpu_list)
+
+    def test_allocate_disjoint(self):
+        pool = cpu_pool.CpuPool(range(4))
+        self.assertEqual([0, 1], pool.allocate('lb1', 2))
+        self.assertEqual([2], pool.allocate('lb2', 1))
+        self.assertIsNone(pool.allocate('lb3', 2))
+        self.assertEqual([3], pool.free_cpus())
+        self.assertEqual({'cpus_total': 4, 'cpus_free': 1,
+                          'assignments': {'lb1': [0, 1], 'lb2': [2]}},
+                         pool.report())
+
+    def test_allocate_keeps_assignment(self):
+        pool = cpu_pool.CpuPool(range(4))
+        pool.allocate('lb1', 1)
+        pool.allocate('lb2', 1)
+        self.assertEqual([0], pool.allocate('lb1', 1))
+        self.assertEqual([0, 2], pool.allocate('lb1', 2))
+        self.assertEqual([3], pool.free_cpus())
+
+    def test_release(self):
+        pool = cpu_pool.CpuPool(range(2))
+        pool.allocate('lb1', 2)
+        pool.release('lb1')
+        pool.release('unknown')
+        self.assertEqual([0, 1], pool.free_cpus())
+
+    def test_adopt(self):
+        pool = cpu_pool.CpuPool(range(4))
+        self.assertTrue(pool.adopt('lb1', [3, 1]))
+        self.assertFalse(pool.adopt('lb2', [1, 2]))
+        self.assertFalse(pool.adopt('lb3', [4]))
+        self.assertEqual([1, 3], pool.allocate('lb1', 2))
+        self.assertEqual([0, 2], pool.free_cpus())
@@ -0,0 +1,127 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+
+import mock
+
+from neutron_lbaas.drivers.haproxy import haproxy_socket
+from neutron_lbaas.tests import base
+from neutron_lbaas.tests.unit.drivers.haproxy import sample_stats
+
+
+class TestHaproxySocket(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestHaproxySocket, self).setUp()
+        self.socket_cls = mock.patch('socket.socket').start()
+        self.mock_socket = self.socket_cls.return_value
+        self.haproxy_socket = haproxy_socket.HaproxySocket('/sock')
+
+    def test_execute_reads_until_eof(self):
+        self.mock_socket.recv.side_effect = [b'a' * 8192, b'b' * 10, b'']
+        response = self.haproxy_socket.execute('show stat')
+        self.assertEqual('a' * 8192 + 'b' * 10, response)
+        self.socket_cls.assert_called_once_with(socket.AF_UNIX,
+                                                socket.SOCK_STREAM)
+        self.mock_socket.connect.assert_called_once_with('/sock')
+        self.mock_socket.sendall.assert_called_once_with(b'show stat\n')
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_execute_closes_socket_on_connect_error(self):
+        self.mock_socket.connect.side_effect = socket.error
+        self.assertRaises(socket.error, self.haproxy_socket.execute,
+                          'show stat')
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_ping(self):
+        self.assertTrue(self.haproxy_socket.ping())
+        self.mock_socket.connect.assert_called_once_with('/sock')
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_ping_refused(self):
+        self.mock_socket.connect.side_effect = socket.error
+        self.assertFalse(self.haproxy_socket.ping())
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_run_commands(self):
+        self.mock_socket.recv.side_effect = [b'\n\n', b'']
+        self.haproxy_socket.run_commands(['set weight p/m 2',
+                                          'enable server p/m'])
+        self.mock_socket.sendall.assert_called_once_with(
+            b'set weight p/m 2;enable server p/m\n')
+
+    def test_run_commands_no_commands(self):
+        self.haproxy_socket.run_commands([])
+        self.assertFalse(self.socket_cls.called)
+
+    def _set_response(self, response, chunk_size=haproxy_socket.RECV_SIZE):
+        data = response.encode('utf-8')
+        chunks = [data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size)]
+        self.mock_socket.recv.side_effect = chunks + [b'']
+
+    def test_show_stat(self):
+        self._set_response(sample_stats.show_stat_output(2))
+        rows = list(self.haproxy_socket.show_stat(6))
+        self.mock_socket.sendall.assert_called_once_with(
+            b'show stat -1 6 -1\n')
+        self.assertEqual(3, len(rows))
+        self.assertEqual(sample_stats.server_id(0), rows[0]['svname'])
+        self.assertEqual('DOWN', rows[0]['status'])
+        self.assertEqual(
+            'Layer4 connection problem, info: "Connection refused"',
+            rows[0]['last_chk'])
+        self.assertEqual('UP', rows[1]['status'])
+        self.assertEqual('BACKEND', rows[2]['svname'])
+        self.assertEqual('7764', rows[2]['bin'])
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_show_stat_columns(self):
+        self._set_response(sample_stats.show_stat_output(1))
+        rows = list(self.haproxy_socket.show_stat(
+            columns=('svname', 'status', 'unknown')))
+        self.assertEqual([{'svname': sample_stats.server_id(0),
+                           'status': 'DOWN'},
+                          {'svname': 'BACKEND', 'status': 'UP'}], rows)
+
+    def test_show_stat_lines_split_across_reads(self):
+        server_count = 5000
+        self._set_response(sample_stats.show_stat_output(server_count),
+                           chunk_size=1000)
+        rows = list(self.haproxy_socket.show_stat(
+            6, columns=('svname', 'status')))
+        self.assertEqual(server_count + 1, len(rows))
+        self.assertEqual(server_count // 10,
+                         len([r for r in rows if r['status'] == 'DOWN']))
+        self.assertEqual(sample_stats.server_id(server_count - 1),
+                         rows[-2]['svname'])
+
+    def test_show_stat_no_header(self):
+        self._set_response('Unknown command.\n')
+        self.assertEqual([], list(self.haproxy_socket.show_stat()))
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_show_stat_closes_socket_when_abandoned(self):
+        self._set_response(sample_stats.show_stat_output(10))
+        rows = self.haproxy_socket.show_stat()
+        next(rows)
+        rows.close()
+        self.mock_socket.close.assert_called_once_with()
+
+    def test_run_commands_error(self):
+        self.mock_socket.recv.side_effect = [b'No such server.\n\n', b'']
+        self.assertRaises(haproxy_socket.HaproxyRuntimeError,
+                          self.haproxy_socket.run_commands,
+                          ['enable server p/m'])
@@ -0,0 +1,56 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron_lbaas.drivers.haproxy import ip_batch
+from neutron_lbaas.tests import base
+
+
+class TestIpBatch(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestIpBatch, self).setUp()
+        self.execute = mock.patch(
+            'neutron.agent.linux.utils.execute').start()
+        self.batch = ip_batch.IpBatch('ns1')
+
+    def test_execute(self):
+        self.batch.add('addr', 'add', '10.0.0.5/24', 'dev', 'tap1')
+        self.batch.add('route', 'replace', 'default', 'via', '10.0.0.1')
+        self.batch.execute()
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns1', 'ip', '-batch', '-'],
+            process_input='addr add 10.0.0.5/24 dev tap1\n'
+                          'route replace default via 10.0.0.1\n',
+            run_as_root=True)
+        self.assertEqual([], self.batch.commands)
+
+    def test_execute_empty(self):
+        self.batch.execute()
+        self.assertFalse(self.execute.called)
+
+    def test_add_invalid_argument(self):
+        for arg in ('', '10.0.0.5/24\nlink', 'tap 1'):
+            self.assertRaises(ip_batch.InvalidIpArgument,
+                              self.batch.add, 'addr', 'add', arg)
+        self.assertEqual([], self.batch.commands)
+
+    def test_add_invalid_command(self):
+        for args in ((), ('link', 'set', 'tap1', 'up'),
+                     ('netns', 'exec', 'ns2', 'ip', 'link'),
+                     ('route', 'add', 'default', 'netns', 'ns2')):
+            self.assertRaises(ip_batch.InvalidIpCommand,
+                              self.batch.add, *args)
+        self.assertEqual([], self.batch.commands)
@@ -14,13 +14,18 @@
 #    under the License.
 
 import collections
-import socket
 
+import eventlet
 import mock
 from neutron.plugins.common import constants
 from neutron_lib import exceptions
+from oslo_serialization import jsonutils
 
+from neutron_lbaas.agent import dispatcher
+from neutron_lbaas.drivers.haproxy import cpu_pool
+from neutron_lbaas.drivers.haproxy import haproxy_socket
 from neutron_lbaas.drivers.haproxy import namespace_driver
+from neutron_lbaas.services.loadbalancer import constants as lb_const
 from neutron_lbaas.services.loadbalancer import data_models
 from neutron_lbaas.tests import base
 
@@ -29,16 +34,28 @@ class TestHaproxyNSDriver(base.BaseTestCase):
 
     def setUp(self):
         super(TestHaproxyNSDriver, self).setUp()
+        self.prepare_templates_patcher = mock.patch.object(
+            namespace_driver.HaproxyNSDriver, '_prepare_templates')
+        self.prepare_templates = self.prepare_templates_patcher.start()
 
         conf = mock.Mock()
         conf.haproxy.loadbalancer_state_path = '/the/path'
         conf.interface_driver = 'intdriver'
         conf.haproxy.user_group = 'test_group'
         conf.haproxy.send_gratuitous_arp = 3
+        conf.haproxy.seamless_reload = False
+        conf.haproxy.master_worker = False
+        conf.haproxy.hard_stop_after = 0
+        conf.haproxy.nbthread = 1
+        conf.haproxy.cpu_pool = ''
+        conf.haproxy.maxconn = 0
+        conf.haproxy.tune_options = {}
         self.conf = conf
         self.rpc_mock = mock.Mock()
         with mock.patch(
-                'neutron.common.utils.load_class_by_alias_or_classname'):
+                'neutron.common.utils.load_class_by_alias_or_classname'), \
+                mock.patch.object(namespace_driver, 'get_haproxy_version',
+                                  return_value=(1, 8)):
             self.driver = namespace_driver.HaproxyNSDriver(
                 conf,
                 self.rpc_mock
@@ -108,6 +125,29 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         mock_shutil.assert_called_once_with('/path/' + self.lb.id)
         mock_ns.garbage_collect_namespace.assert_called_once_with()
 
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_undeploy_instance_releases_cpus(self, mock_isdir):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        namespace_driver.kill_pids_in_file = mock.Mock()
+        self.driver.cpu_pool = cpu_pool.CpuPool([2, 3])
+        self.driver.cpu_pool.allocate(self.lb.id, 2)
+        self.driver.undeploy_instance(self.lb.id)
+        self.assertEqual([2, 3], self.driver.cpu_pool.free_cpus())
+
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_undeploy_instance_forgets_config_digest(self, mock_isdir):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        namespace_driver.kill_pids_in_file = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'abc'
+        self.driver.l7_maps[self.lb.id] = {}
+        self.driver.cert_fingerprints[self.lb.id] = []
+        self.driver.refresh_times[self.lb.id] = 10
+        self.driver.undeploy_instance(self.lb.id)
+        self.assertNotIn(self.lb.id, self.driver.config_digests)
+        self.assertNotIn(self.lb.id, self.driver.l7_maps)
+        self.assertNotIn(self.lb.id, self.driver.cert_fingerprints)
+        self.assertNotIn(self.lb.id, self.driver.refresh_times)
+
     @mock.patch('os.path.exists')
     @mock.patch('os.listdir')
     def test_remove_orphans(self, list_dir, exists):
@@ -129,6 +169,164 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         self.driver.undeploy_instance.assert_called_once_with(
             'lb2', cleanup_namespace=True)
 
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('os.listdir')
+    def test_remove_orphans_incremental(self, list_dir, exists):
+        self.driver.exists = mock.Mock(return_value=False)
+        self.driver.undeploy_instance = mock.Mock()
+        list_dir.return_value = ['lb1', 'lb2', 'lb3']
+        self.driver.remove_orphans(['lb1'])
+        self.assertEqual(set(['lb2', 'lb3']),
+                         set(c[0][0] for c in
+                             self.driver.exists.call_args_list))
+        self.assertEqual(set(['lb2', 'lb3']), self.driver.stopped_orphans)
+
+        # lb3 is gone, lb4 was created and lb1 was forgotten
+        self.driver.exists.reset_mock()
+        list_dir.return_value = ['lb1', 'lb2', 'lb4']
+        self.driver.remove_orphans([])
+        self.assertEqual(set(['lb1', 'lb4']),
+                         set(c[0][0] for c in
+                             self.driver.exists.call_args_list))
+        self.assertEqual(set(['lb1', 'lb2', 'lb4']),
+                         self.driver.stopped_orphans)
+        self.assertFalse(self.driver.undeploy_instance.called)
+
+        # lb2 became known again
+        self.driver.exists.reset_mock()
+        self.driver.remove_orphans(['lb2'])
+        self.assertFalse(self.driver.exists.called)
+        self.assertEqual(set(['lb1', 'lb4']), self.driver.stopped_orphans)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_undeploy_instance_adopted(self, mock_isdir, mock_ip_wrap):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        namespace_driver.kill_pids_in_file = mock.Mock()
+        mock_ns = mock_ip_wrap.return_value
+        mock_ns.get_devices.return_value = [collections.namedtuple(
+            'Device', ['name'])(name='test_device')]
+        self.driver.undeploy_instance(self.lb.id, delete_namespace=True)
+        ns = namespace_driver.get_ns_name(self.lb.id)
+        self.vif_driver.unplug.assert_called_once_with('test_device',
+                                                       namespace=ns)
+        mock_ns.garbage_collect_namespace.assert_called_once_with()
+
+    @mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
+                'jinja_cfg.load_config')
+    @mock.patch('os.listdir')
+    @mock.patch('os.path.isdir')
+    def test_adopt_instances(self, mock_isdir, mock_listdir, load_config):
+        mock_isdir.return_value = True
+        mock_listdir.return_value = ['lb1', 'lb2']
+        self.driver.exists = mock.Mock(
+            side_effect=lambda lb_id: lb_id != 'lb2')
+        self.driver.cpu_pool = cpu_pool.CpuPool([1, 2, 3])
+        self.driver._load_snapshot = mock.Mock(return_value={
+            'digest': 'abc',
+            'vip_port': {'id': 'port1', 'network_id': 'network1',
+                         'mac_address': '12-34-56-78-9A-BC'}})
+        load_config.return_value = ('abc', 'global\n    cpu-map 1 2 3\n',
+                                    {'/m': mock.sentinel.map})
+        self.assertEqual(['lb1'], self.driver.adopt_instances())
+        self.assertEqual({'lb1': 'abc'}, self.driver.config_digests)
+        self.assertEqual({'lb1': {'/m': mock.sentinel.map}},
+                         self.driver.l7_maps)
+        self.assertEqual('port1', self.driver.adopted_vip_ports['lb1'].id)
+        self.assertEqual([1], self.driver.cpu_pool.free_cpus())
+        load_config.assert_called_once_with(
+            self.driver._get_state_file_path('lb1', 'haproxy.conf', False))
+
+    @mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
+                'jinja_cfg.load_config')
+    @mock.patch('os.listdir', return_value=['lb1'])
+    @mock.patch('os.path.isdir', return_value=True)
+    def test_adopt_instances_config_not_loaded(self, mock_isdir,
+                                               mock_listdir, load_config):
+        self.driver.exists = mock.Mock(return_value=True)
+        self.driver._load_snapshot = mock.Mock(return_value={'digest': 'old'})
+        load_config.return_value = ('abc', '', {})
+        self.assertEqual(['lb1'], self.driver.adopt_instances())
+        self.assertEqual({}, self.driver.config_digests)
+        self.assertEqual({}, self.driver.l7_maps)
+        self.assertEqual({}, self.driver.adopted_vip_ports)
+
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_adopt_instances_no_state(self, mock_isdir):
+        self.assertEqual([], self.driver.adopt_instances())
+
+    @mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
+                'jinja_cfg.load_config', side_effect=IOError)
+    @mock.patch('os.listdir', return_value=['lb1'])
+    @mock.patch('os.path.isdir', return_value=True)
+    def test_adopt_instances_unreadable(self, mock_isdir, mock_listdir,
+                                        load_config):
+        self.driver.exists = mock.Mock(return_value=True)
+        self.assertEqual([], self.driver.adopt_instances())
+        self.assertEqual({}, self.driver.config_digests)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_undeploy_instance_adopted_vip_port(self, mock_isdir,
+                                                mock_ip_wrap):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        namespace_driver.kill_pids_in_file = mock.Mock()
+        self.driver._unplug = mock.Mock()
+        self.driver.adopted_vip_ports[self.lb.id] = self.lb.vip_port
+        self.driver.undeploy_instance(self.lb.id, delete_namespace=True)
+        self.driver._unplug.assert_called_once_with(
+            namespace_driver.get_ns_name(self.lb.id), self.lb.vip_port)
+        self.assertFalse(mock_ip_wrap.return_value.get_devices.called)
+        self.assertEqual({}, self.driver.adopted_vip_ports)
+
+    @mock.patch('neutron.common.utils.replace_file')
+    @mock.patch('neutron.common.utils.ensure_dir')
+    def test_save_snapshot(self, ensure_dir, replace_file):
+        self.driver._save_snapshot(self.lb, 'abc')
+        snapshot_path, data = replace_file.call_args[0]
+        self.assertEqual(
+            self.driver._get_state_file_path(self.lb.id, 'snapshot.json'),
+            snapshot_path)
+        self.assertEqual({'digest': 'abc',
+                          'vip_port': {'id': 'port1',
+                                       'network_id': 'network1',
+                                       'mac_address': '12-34-56-78-9A-BC'}},
+                         jsonutils.loads(data))
+
+    def test_load_snapshot(self):
+        self.driver._get_state_file_path = mock.Mock(return_value='/snap')
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {'/snap': '{"digest": "abc"}'})
+            self.assertEqual({'digest': 'abc'},
+                             self.driver._load_snapshot(self.lb.id))
+            self._mock_files(m_open, {'/snap': '["abc"]'})
+            self.assertEqual({}, self.driver._load_snapshot(self.lb.id))
+            self._mock_files(m_open, {'/snap': '{"digest'})
+            self.assertEqual({}, self.driver._load_snapshot(self.lb.id))
+            self._mock_files(m_open, {})
+            self.assertEqual({}, self.driver._load_snapshot(self.lb.id))
+
+    def test_get_haproxy_pid(self):
+        self.driver._get_state_file_path = mock.Mock(
+            side_effect=lambda lb_id, kind, ensure_dir: '/' + kind)
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {
+                '/haproxy.pid': '123\n',
+                '/proc/123/cmdline': '/usr/sbin/haproxy\0-f\0/haproxy.conf\0'})
+            self.assertEqual('123', self.driver._get_haproxy_pid(self.lb.id))
+            self._mock_files(m_open, {
+                '/haproxy.pid': '123\n',
+                '/proc/123/cmdline': '/usr/sbin/haproxy\0-f\0/other\0'})
+            self.assertIsNone(self.driver._get_haproxy_pid(self.lb.id))
+            self._mock_files(m_open, {
+                '/haproxy.pid': '123\n',
+                '/proc/123/cmdline': 'bash\0/haproxy.conf\0'})
+            self.assertIsNone(self.driver._get_haproxy_pid(self.lb.id))
+            self._mock_files(m_open, {'/haproxy.pid': '123\n'})
+            self.assertIsNone(self.driver._get_haproxy_pid(self.lb.id))
+            self._mock_files(m_open, {'/haproxy.pid': '\n'})
+            self.assertIsNone(self.driver._get_haproxy_pid(self.lb.id))
+
     def test_get_stats(self):
         # Shamelessly stolen from v1 namespace driver tests.
         raw_stats = ('# pxname,svname,qcur,qmax,scur,smax,slim,stot,bin,bout,'
@@ -164,7 +362,7 @@ class TestHaproxyNSDriver(base.BaseTestCase):
             gsp.side_effect = lambda x, y, z: '/pool/' + y
             path_exists.return_value = True
             mocket.return_value = mocket
-            mocket.recv.return_value = raw_stats
+            mocket.recv.side_effect = [raw_stats.encode('utf-8'), b'']
 
             exp_stats = {'connection_errors': '0',
                          'active_connections': '3',
@@ -192,7 +390,7 @@ class TestHaproxyNSDriver(base.BaseTestCase):
             stats = self.driver.get_stats(self.lb.id)
             self.assertEqual(exp_stats, stats)
 
-            mocket.recv.return_value = raw_stats_empty
+            mocket.recv.side_effect = [raw_stats_empty.encode('utf-8'), b'']
             self.assertEqual({'members': {}},
                              self.driver.get_stats(self.lb.id))
 
@@ -201,6 +399,21 @@ class TestHaproxyNSDriver(base.BaseTestCase):
             self.assertEqual({}, self.driver.get_stats(self.lb.id))
             self.assertFalse(mocket.called)
 
+    def test_get_servers_stats_status(self):
+        parsed_stats = [
+            {'type': '2', 'svname': name, 'status': status,
+             'check_status': '', 'chkfail': '0'}
+            for name, status in (('up', 'UP'), ('going_down', 'UP 1/3'),
+                                 ('down', 'DOWN'), ('going_up', 'DOWN 1/2'),
+                                 ('maint', 'MAINT'), ('no_check', 'no check'))]
+        stats = self.driver._get_servers_stats(parsed_stats)
+        self.assertEqual(
+            {'up': constants.ACTIVE, 'going_down': constants.ACTIVE,
+             'down': constants.INACTIVE, 'going_up': constants.INACTIVE,
+             'maint': constants.INACTIVE, 'no_check': constants.ACTIVE},
+            dict((name, member_stats['status'])
+                 for name, member_stats in stats.items()))
+
     def test_deploy_instance(self):
         self.driver.deployable = mock.Mock(return_value=False)
         self.driver.exists = mock.Mock(return_value=True)
@@ -237,6 +450,7 @@ class TestHaproxyNSDriver(base.BaseTestCase):
 
     def test_update(self):
         self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
         self.driver._spawn = mock.Mock()
         with mock.patch('six.moves.builtins.open') as m_open:
             file_mock = mock.MagicMock()
@@ -244,75 +458,364 @@ class TestHaproxyNSDriver(base.BaseTestCase):
             file_mock.__enter__.return_value = file_mock
             file_mock.__iter__.return_value = iter(['123'])
             self.driver.update(self.lb)
+            self.driver._save_config.assert_called_once_with(self.lb)
             self.driver._spawn.assert_called_once_with(self.lb,
-                                                       ['-sf', '123'])
+                                                       ['-sf', '123'],
+                                                       ('/conf', 'abc', {}))
+
+    def test_update_config_unchanged(self):
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._spawn = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'abc'
+        self.driver.update(self.lb)
+        self.assertFalse(self.driver._spawn.called)
+        self.assertEqual(self.lb,
+                         self.driver.deployed_loadbalancers[self.lb.id])
+
+    def _update_tls(self, fingerprints):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._spawn = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'abc'
+        self.driver.cert_fingerprints[self.lb.id] = ['fp1']
+        with mock.patch('six.moves.builtins.open') as m_open, \
+                mock.patch.object(namespace_driver.jinja_cfg,
+                                  'get_cert_fingerprints',
+                                  return_value=fingerprints) as get_fps:
+            self._mock_files(m_open, {'/path': '123\n'})
+            self.driver.update(self.lb)
+        get_fps.assert_called_once_with(self.lb)
+
+    def test_update_config_unchanged_tls(self):
+        self._update_tls(['fp1'])
+        self.assertFalse(self.driver._spawn.called)
+
+    def test_update_config_unchanged_tls_cert_changed(self):
+        self._update_tls(['fp2'])
+        self.driver._spawn.assert_called_once_with(self.lb, ['-sf', '123'],
+                                                   ('/conf', 'abc', {}))
+
+    def test_update_config_unchanged_tls_cert_not_cached(self):
+        self._update_tls(None)
+        self.driver._spawn.assert_called_once_with(self.lb, ['-sf', '123'],
+                                                   ('/conf', 'abc', {}))
+
+    def _l7_map(self, *entries):
+        return {'path': '/path/l1_0.map', 'lookup': 'req.hdr(host),lower',
+                'prefix': False,
+                'entries': collections.OrderedDict(entries)}
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_l7_maps_runtime(self, mock_socket):
+        l7_map = self._l7_map(('a.example.com', 'pool2'),
+                              ('c.example.com', 'pool1'))
+        self.driver._save_config = mock.Mock(
+            return_value=('/conf', 'abc', {l7_map['path']: l7_map}))
+        self.driver._get_state_file_path = mock.Mock(return_value='/sock')
+        self.driver._spawn = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'abc'
+        self.driver.l7_maps[self.lb.id] = {l7_map['path']: self._l7_map(
+            ('a.example.com', 'pool1'), ('b.example.com', 'pool1'))}
+
+        self.driver.update(self.lb)
+        self.assertFalse(self.driver._spawn.called)
+        mock_socket.assert_called_once_with('/sock')
+        mock_socket.return_value.run_commands.assert_called_once_with([
+            'del map /path/l1_0.map b.example.com',
+            'set map /path/l1_0.map a.example.com pool2',
+            'add map /path/l1_0.map c.example.com pool1'])
+        self.assertEqual({l7_map['path']: l7_map},
+                         self.driver.l7_maps[self.lb.id])
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_l7_maps_runtime_rejected(self, mock_socket):
+        l7_map = self._l7_map(('a.example.com', 'pool2'))
+        config = ('/conf', 'abc', {l7_map['path']: l7_map})
+        self.driver._save_config = mock.Mock(return_value=config)
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        self.driver._spawn = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'abc'
+        self.driver.l7_maps[self.lb.id] = {l7_map['path']: self._l7_map(
+            ('a.example.com', 'pool1'))}
+        mock_socket.return_value.run_commands.side_effect = (
+            haproxy_socket.HaproxyRuntimeError(command='c', error='e'))
+
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {'/path': '123\n'})
+            self.driver.update(self.lb)
+        self.driver._spawn.assert_called_once_with(self.lb, ['-sf', '123'],
+                                                   config)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_l7_maps_runtime_disabled(self, mock_socket):
+        self.conf.haproxy.enable_runtime_api = False
+        l7_map = self._l7_map(('a.example.com', 'pool2'))
+        self.driver.l7_maps[self.lb.id] = {l7_map['path']: self._l7_map()}
+        self.assertFalse(self.driver._update_l7_maps_runtime(
+            self.lb, {l7_map['path']: l7_map}))
+        self.assertFalse(mock_socket.called)
+
+    def _test_update_seamless(self, spawn_side_effect=None):
+        self.driver.seamless_reload = True
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._spawn = mock.Mock(side_effect=spawn_side_effect)
+        with mock.patch('six.moves.builtins.open') as m_open:
+            file_mock = mock.MagicMock()
+            m_open.return_value = file_mock
+            file_mock.__enter__.return_value = file_mock
+            file_mock.__iter__.return_value = iter(['123'])
+            self.driver.update(self.lb)
+
+    def test_update_seamless(self):
+        self._test_update_seamless()
+        self.driver._spawn.assert_called_once_with(
+            self.lb, ['-x', '/path', '-sf', '123'], ('/conf', 'abc', {}))
+
+    def test_update_seamless_fallback(self):
+        self._test_update_seamless(spawn_side_effect=[RuntimeError, None])
+        self.driver._spawn.assert_has_calls([
+            mock.call(self.lb, ['-x', '/path', '-sf', '123'],
+                      ('/conf', 'abc', {})),
+            mock.call(self.lb, ['-sf', '123'], ('/conf', 'abc', {}))])
+
+    def test_seamless_reload_detection(self):
+        for version, enabled, expected in (((1, 8), True, True),
+                                           ((2, 0), True, True),
+                                           ((1, 6), True, False),
+                                           (None, True, False),
+                                           ((1, 8), False, False)):
+            self.conf.haproxy.seamless_reload = enabled
+            with mock.patch(
+                    'neutron.common.utils.'
+                    'load_class_by_alias_or_classname'), \
+                    mock.patch.object(namespace_driver,
+                                      'get_haproxy_version',
+                                      return_value=version):
+                driver = namespace_driver.HaproxyNSDriver(self.conf,
+                                                          self.rpc_mock)
+            self.assertEqual(expected, driver.seamless_reload)
+
+    def test_prepare_templates(self):
+        self.prepare_templates.assert_called_once_with()
+        self.prepare_templates_patcher.stop()
+        with mock.patch('neutron.common.utils.ensure_dir') as ensure_dir, \
+                mock.patch('neutron_lbaas.services.loadbalancer.drivers.'
+                           'haproxy.jinja_cfg.prepare_templates') as prepare:
+            self.driver._prepare_templates()
+            ensure_dir.assert_called_once_with('/the/path/templates')
+            prepare.assert_called_once_with('/the/path/templates')
+
+    def test_master_worker_detection(self):
+        for version, enabled, expected in (((1, 8), True, True),
+                                           ((1, 6), True, False),
+                                           (None, True, False),
+                                           ((1, 8), False, False)):
+            self.conf.haproxy.master_worker = enabled
+            with mock.patch(
+                    'neutron.common.utils.'
+                    'load_class_by_alias_or_classname'), \
+                    mock.patch.object(namespace_driver,
+                                      'get_haproxy_version',
+                                      return_value=version):
+                driver = namespace_driver.HaproxyNSDriver(self.conf,
+                                                          self.rpc_mock)
+            self.assertEqual(expected, driver.master_worker)
+
+    def _mock_files(self, m_open, files):
+        def open_file(path, mode='r'):
+            if path not in files:
+                raise IOError(path)
+            file_mock = mock.MagicMock()
+            file_mock.__enter__.return_value = file_mock
+            file_mock.readline.return_value = files[path]
+            file_mock.read.return_value = files[path]
+            file_mock.__iter__.return_value = iter(
+                files[path].splitlines())
+            return file_mock
+        m_open.side_effect = open_file
 
-    @mock.patch('socket.socket')
-    @mock.patch('os.path.exists')
     @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
-    def test_exists(self, ip_wrap, exists, mocket):
-        socket_path = '/path/haproxy_stats.sock'
-        mock_ns = ip_wrap.return_value
-        mock_socket = mocket.return_value
-        self.driver._get_state_file_path = mock.Mock(return_value=socket_path)
-        mock_ns.netns.exists.return_value = False
-        exists.return_value = False
+    @mock.patch('neutron.agent.linux.utils.execute')
+    def test_update_master_worker(self, execute, ip_wrap):
+        self.driver.master_worker = True
+        self.driver._get_state_file_path = mock.Mock(return_value='/pid')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._save_snapshot = mock.Mock()
+        self.driver._spawn = mock.Mock()
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {
+                '/pid': '123\n',
+                '/proc/123/cmdline': 'haproxy\0-f\0/conf\0-W\0'})
+            self.driver.update(self.lb)
+        self.driver._save_snapshot.assert_called_once_with(self.lb, 'abc')
+        self.driver._save_config.assert_called_once_with(self.lb)
+        ip_wrap.assert_called_once_with(
+            namespace=namespace_driver.get_ns_name(self.lb.id))
+        ip_wrap.return_value.netns.execute.assert_called_once_with(
+            ['haproxy', '-c', '-f', '/conf'])
+        execute.assert_called_once_with(['kill', '-USR2', '123'],
+                                        run_as_root=True)
+        self.assertFalse(self.driver._spawn.called)
+        self.assertEqual(self.lb,
+                         self.driver.deployed_loadbalancers[self.lb.id])
+        self.assertEqual('abc', self.driver.config_digests[self.lb.id])
 
-        def reset():
-            ip_wrap.reset_mock()
-            self.driver._get_state_file_path.reset_mock()
-            mock_ns.reset_mock()
-            exists.reset_mock()
-            mocket.reset_mock()
-            mock_socket.reset_mock()
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    @mock.patch('neutron.agent.linux.utils.execute')
+    def test_update_master_worker_invalid_config(self, execute, ip_wrap):
+        self.driver.master_worker = True
+        self.driver._get_state_file_path = mock.Mock(return_value='/pid')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._save_snapshot = mock.Mock()
+        self.driver.config_digests[self.lb.id] = 'old'
+        ip_wrap.return_value.netns.execute.side_effect = RuntimeError
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {
+                '/pid': '123\n',
+                '/proc/123/cmdline': 'haproxy\0-f\0/conf\0-W\0'})
+            self.assertRaises(RuntimeError, self.driver.update, self.lb)
+        self.assertFalse(execute.called)
+        self.assertFalse(self.driver._save_snapshot.called)
+        self.assertEqual('old', self.driver.config_digests[self.lb.id])
+        self.assertNotIn(self.lb.id, self.driver.l7_maps)
 
-        ret_exists = self.driver.exists(self.lb.id)
-        ip_wrap.assert_called_once_with()
-        self.driver._get_state_file_path.assert_called_once_with(
-            self.lb.id, 'haproxy_stats.sock', False)
-        mock_ns.netns.exists.assert_called_once_with(
-            namespace_driver.get_ns_name(self.lb.id))
-        self.assertFalse(exists.called)
-        self.assertFalse(mocket.called)
-        self.assertFalse(mock_socket.connect.called)
-        self.assertFalse(ret_exists)
+    @mock.patch('neutron.agent.linux.utils.execute')
+    def test_update_master_worker_daemon_running(self, execute):
+        self.driver.master_worker = True
+        self.driver._get_state_file_path = mock.Mock(return_value='/pid')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._spawn = mock.Mock()
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {
+                '/pid': '123\n',
+                '/proc/123/cmdline': 'haproxy\0-f\0/conf\0'})
+            self.driver.update(self.lb)
+        self.assertFalse(execute.called)
+        self.driver._spawn.assert_called_once_with(self.lb, ['-sf', '123'],
+                                                   ('/conf', 'abc', {}))
 
-        reset()
-        mock_ns.netns.exists.return_value = True
-        exists.return_value = False
-        ret_exists = self.driver.exists(self.lb.id)
-        ip_wrap.assert_called_once_with()
-        self.driver._get_state_file_path.assert_called_once_with(
-            self.lb.id, 'haproxy_stats.sock', False)
-        mock_ns.netns.exists.assert_called_once_with(
-            namespace_driver.get_ns_name(self.lb.id))
-        exists.assert_called_once_with(socket_path)
-        self.assertFalse(mocket.called)
-        self.assertFalse(mock_socket.connect.called)
-        self.assertFalse(ret_exists)
+    def test_get_master_pid_not_running(self):
+        self.driver._get_state_file_path = mock.Mock(return_value='/pid')
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {'/pid': '123\n'})
+            self.assertIsNone(self.driver._get_master_pid(self.lb.id))
+            self._mock_files(m_open, {})
+            self.assertIsNone(self.driver._get_master_pid(self.lb.id))
 
-        reset()
-        mock_ns.netns.exists.return_value = True
-        exists.return_value = True
-        ret_exists = self.driver.exists(self.lb.id)
-        ip_wrap.assert_called_once_with()
+    @mock.patch('os.listdir')
+    def test_get_worker_counts(self, listdir):
+        self.driver.deployed_loadbalancers = {'lb1': mock.Mock(),
+                                              'lb2': mock.Mock()}
+        self.driver._get_master_pid = mock.Mock(
+            side_effect=lambda lb_id: '10' if lb_id == 'lb1' else None)
+        listdir.return_value = ['10', '11', '12', '13', 'self']
+        with mock.patch('six.moves.builtins.open') as m_open:
+            self._mock_files(m_open, {
+                '/proc/10/stat': '10 (haproxy) S 1 10 10 0',
+                '/proc/11/stat': '11 (haproxy) S 10 10 10 0',
+                '/proc/12/stat': '12 (my proc) S 10 10 10 0',
+                '/proc/13/stat': '13 (bash) S 1 13 13 0'})
+            self.assertEqual({'lb1': 2}, self.driver.get_worker_counts())
+        listdir.assert_called_once_with('/proc')
+
+    @mock.patch('os.listdir')
+    def test_get_worker_counts_no_master(self, listdir):
+        self.driver.deployed_loadbalancers = {'lb1': mock.Mock()}
+        self.driver._get_master_pid = mock.Mock(return_value=None)
+        self.assertEqual({}, self.driver.get_worker_counts())
+        self.assertFalse(listdir.called)
+
+    @mock.patch('os.path.exists')
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_exists(self, mock_socket, path_exists):
+        self.driver._get_haproxy_pid = mock.Mock(return_value=None)
+        self.driver._get_state_file_path = mock.Mock(return_value='/sock')
+        self.assertFalse(self.driver.exists(self.lb.id))
+        self.assertFalse(mock_socket.called)
+        self.assertEqual({}, self.driver.live_pids)
+
+        self.driver._get_haproxy_pid.return_value = '123'
+        mock_socket.return_value.ping.return_value = True
+        self.assertTrue(self.driver.exists(self.lb.id))
+        mock_socket.assert_called_once_with('/sock')
+        self.assertEqual({self.lb.id: '123'}, self.driver.live_pids)
+
+        mock_socket.return_value.ping.return_value = False
+        self.assertFalse(self.driver.exists(self.lb.id))
+
+    @mock.patch('os.path.exists')
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_exists_cached_pid(self, mock_socket, path_exists):
+        self.driver._get_haproxy_pid = mock.Mock(return_value='124')
+        self.driver.live_pids[self.lb.id] = '123'
+        path_exists.return_value = True
+        self.assertTrue(self.driver.exists(self.lb.id))
+        path_exists.assert_called_once_with('/proc/123')
+        self.assertFalse(self.driver._get_haproxy_pid.called)
+        self.assertFalse(mock_socket.return_value.connect.called)
+
+        # the cached haproxy exited, e.g. after a reload
+        path_exists.return_value = False
+        self.assertTrue(self.driver.exists(self.lb.id))
+        self.driver._get_haproxy_pid.assert_called_once_with(self.lb.id)
+        self.assertEqual({self.lb.id: '124'}, self.driver.live_pids)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    def test_exists_does_not_list_namespaces(self, ip_wrap):
+        self.driver._get_haproxy_pid = mock.Mock(return_value='123')
+        with mock.patch('socket.socket') as mocket:
+            self.assertTrue(self.driver.exists(self.lb.id))
+            mocket.return_value.close.assert_called_once_with()
+        self.assertFalse(ip_wrap.called)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_get_stats_socket(self, mock_socket):
+        self.driver._get_state_file_path = mock.Mock(return_value='/sock')
+        haproxy = self.driver._get_stats_socket(self.lb.id)
+        self.assertIs(haproxy, self.driver._get_stats_socket(self.lb.id))
+        mock_socket.assert_called_once_with('/sock')
         self.driver._get_state_file_path.assert_called_once_with(
             self.lb.id, 'haproxy_stats.sock', False)
-        mock_ns.netns.exists.assert_called_once_with(
-            namespace_driver.get_ns_name(self.lb.id))
-        exists.assert_called_once_with(socket_path)
-        mocket.assert_called_once_with(socket.AF_UNIX, socket.SOCK_STREAM)
-        mock_socket.connect.assert_called_once_with(socket_path)
-        self.assertTrue(ret_exists)
 
-    def test_create(self):
-        self.driver._plug = mock.Mock()
+    @mock.patch('os.path.isdir', return_value=False)
+    def test_undeploy_instance_forgets_liveness(self, mock_isdir):
+        self.driver._get_state_file_path = mock.Mock(return_value='/path')
+        namespace_driver.kill_pids_in_file = mock.Mock()
+        self.driver.live_pids[self.lb.id] = '123'
+        self.driver.stats_sockets[self.lb.id] = mock.Mock()
+        self.driver.undeploy_instance(self.lb.id)
+        self.assertEqual({}, self.driver.live_pids)
+        self.assertEqual({}, self.driver.stats_sockets)
+
+    @mock.patch('eventlet.spawn_n')
+    def test_create(self, spawn_n):
+        self.driver._plug = mock.Mock(return_value='tap1')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
         self.driver._spawn = mock.Mock()
         self.driver.create(self.lb)
+        namespace = namespace_driver.get_ns_name(self.lb.id)
         self.driver._plug.assert_called_once_with(
-            namespace_driver.get_ns_name(self.lb.id),
-            self.lb.vip_port, self.lb.vip_address)
-        self.driver._spawn.assert_called_once_with(self.lb)
+            namespace, self.lb.vip_port, self.lb.vip_address)
+        self.driver._spawn.assert_called_once_with(
+            self.lb, config=('/conf', 'abc', {}))
+        spawn_n.assert_called_once_with(self.driver._send_gratuitous_arp,
+                                        namespace, self.lb.vip_port, 'tap1')
+
+    @mock.patch('eventlet.spawn_n')
+    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
+    def test_create_ipv6(self, ip_device, spawn_n):
+        self.lb.vip_address = 'fd00::10'
+        self.driver._plug = mock.Mock(return_value='tap1')
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._spawn = mock.Mock()
+        self.driver.create(self.lb)
+        ip_device.assert_called_once_with(
+            'tap1', namespace=namespace_driver.get_ns_name(self.lb.id))
+        wait = ip_device.return_value.addr.wait_until_address_ready
+        wait.assert_called_once_with('fd00::10')
+        self.driver._spawn.assert_called_once_with(
+            self.lb, config=('/conf', 'abc', {}))
 
     def test_deployable(self):
         # test None
@@ -361,9 +864,11 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         self.assertEqual('/the/path/v2/lb1/conf', path)
         self.assertTrue(ensure_dir.called)
 
+    @mock.patch('neutron.agent.linux.utils.execute')
+    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
     @mock.patch('neutron.agent.linux.ip_lib.device_exists')
     @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
-    def test_plug(self, ip_wrap, device_exists):
+    def test_plug(self, ip_wrap, device_exists, ip_device, execute):
         device_exists.return_value = True
         interface_name = 'tap-d4nc3'
         self.vif_driver.get_device_name.return_value = interface_name
@@ -377,6 +882,8 @@ class TestHaproxyNSDriver(base.BaseTestCase):
 
         device_exists.reset_mock()
         self.rpc_mock.plug_vip_port.reset_mock()
+        ip_device.return_value.addr.list.return_value = [
+            {'cidr': '10.0.0.1/24'}, {'cidr': '10.0.0.9/24'}]
         mock_ns = ip_wrap.return_value
         self.driver._plug('ns1', self.lb.vip_port, self.lb.vip_address)
         self.rpc_mock.plug_vip_port.assert_called_once_with(
@@ -384,16 +891,56 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         device_exists.assert_called_once_with(interface_name,
                                               namespace='ns1')
         self.assertFalse(self.vif_driver.plug.called)
-        expected_cidrs = ['10.0.0.1/24']
-        self.vif_driver.init_l3.assert_called_once_with(
-            interface_name, expected_cidrs, namespace='ns1')
-        calls = [mock.call(['route', 'add', 'default', 'gw', '192.0.0.1'],
-                           check_exit_code=False),
-                 mock.call(['arping', '-U', '-I', interface_name,
-                            '-c', 3, '10.0.0.1'],
-                           check_exit_code=False)]
-        mock_ns.netns.execute.has_calls(calls)
-        self.assertEqual(2, mock_ns.netns.execute.call_count)
+        self.assertFalse(self.vif_driver.init_l3.called)
+        ip_device.return_value.addr.list.assert_called_once_with(
+            scope='global')
+        execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns1', 'ip', '-batch', '-'],
+            process_input='addr del 10.0.0.9/24 dev tap-d4nc3\n'
+                          'addr replace 10.0.0.1/24 dev tap-d4nc3\n'
+                          'route replace default via 10.0.0.2 '
+                          'dev tap-d4nc3\n',
+            run_as_root=True)
+        self.assertFalse(mock_ns.netns.execute.called)
+
+    @mock.patch('neutron.agent.linux.utils.execute')
+    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
+    @mock.patch('neutron.agent.linux.ip_lib.device_exists')
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    def test_plug_new_device(self, ip_wrap, device_exists, ip_device,
+                             execute):
+        device_exists.return_value = False
+        self.vif_driver.get_device_name.return_value = 'tap-d4nc3'
+        self.assertEqual('tap-d4nc3', self.driver._plug(
+            'ns1', self.lb.vip_port, self.lb.vip_address))
+        self.vif_driver.plug.assert_called_once_with(
+            'network1', 'port1', 'tap-d4nc3', '12-34-56-78-9A-BC',
+            namespace='ns1')
+        self.assertFalse(ip_device.return_value.addr.list.called)
+        execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns1', 'ip', '-batch', '-'],
+            process_input='addr replace 10.0.0.1/24 dev tap-d4nc3\n'
+                          'route replace default via 10.0.0.2 '
+                          'dev tap-d4nc3\n',
+            run_as_root=True)
+        self.assertFalse(ip_wrap.return_value.netns.execute.called)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    def test_send_gratuitous_arp(self, ip_wrap):
+        fixed_ip = data_models.IPAllocation(ip_address='fd00::10')
+        fixed_ip.subnet = self.lb.vip_port.fixed_ips[0].subnet
+        self.lb.vip_port.fixed_ips.append(fixed_ip)
+        self.driver._send_gratuitous_arp('ns1', self.lb.vip_port, 'tap1')
+        ip_wrap.assert_called_once_with(namespace='ns1')
+        ip_wrap.return_value.netns.execute.assert_called_once_with(
+            ['arping', '-U', '-I', 'tap1', '-c', 3, '10.0.0.1'],
+            check_exit_code=False)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    def test_send_gratuitous_arp_disabled(self, ip_wrap):
+        self.conf.haproxy.send_gratuitous_arp = 0
+        self.driver._send_gratuitous_arp('ns1', self.lb.vip_port, 'tap1')
+        self.assertFalse(ip_wrap.called)
 
     def test_unplug(self):
         interface_name = 'tap-d4nc3'
@@ -406,12 +953,14 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         self.vif_driver.unplug.assert_called_once_with(interface_name,
                                                        namespace='ns1')
 
+    @mock.patch('neutron.common.utils.replace_file')
     @mock.patch('neutron.common.utils.ensure_dir')
     @mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
                 'jinja_cfg.save_config')
     @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
-    def test_spawn(self, ip_wrap, jinja_save, ensure_dir):
+    def test_spawn(self, ip_wrap, jinja_save, ensure_dir, replace_file):
         mock_ns = ip_wrap.return_value
+        jinja_save.return_value = 'abc'
         self.driver._spawn(self.lb)
         conf_dir = self.driver.state_path + '/' + self.lb.id + '/%s'
         jinja_save.assert_called_once_with(
@@ -419,7 +968,8 @@ class TestHaproxyNSDriver(base.BaseTestCase):
             self.lb,
             conf_dir % 'haproxy_stats.sock',
             'test_group',
-            conf_dir % '')
+            conf_dir % '',
+            global_opts={'stats_level': 'admin'})
         ip_wrap.assert_called_once_with(
             namespace=namespace_driver.get_ns_name(self.lb.id))
         mock_ns.netns.execute.assert_called_once_with(
@@ -428,6 +978,156 @@ class TestHaproxyNSDriver(base.BaseTestCase):
         self.assertIn(self.lb.id, self.driver.deployed_loadbalancers)
         self.assertEqual(self.lb,
                          self.driver.deployed_loadbalancers[self.lb.id])
+        self.assertEqual('abc', self.driver.config_digests[self.lb.id])
+        self.assertEqual([], self.driver.cert_fingerprints[self.lb.id])
+        replace_file.assert_called_once_with(conf_dir % 'snapshot.json',
+                                             mock.ANY)
+
+    @mock.patch('neutron.common.utils.replace_file')
+    @mock.patch('neutron.common.utils.ensure_dir')
+    @mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
+                'jinja_cfg.save_config')
+    @mock.patch('neutron.agent.linux.ip_lib.IPWrapper')
+    def test_spawn_master_worker(self, ip_wrap, jinja_save, ensure_dir,
+                                 replace_file):
+        self.driver.master_worker = True
+        self.driver._spawn(self.lb)
+        conf_dir = self.driver.state_path + '/' + self.lb.id + '/%s'
+        ip_wrap.return_value.netns.execute.assert_called_once_with(
+            ['haproxy', '-f', conf_dir % 'haproxy.conf', '-p',
+             conf_dir % 'haproxy.pid', '-W'])
+
+    def test_get_global_opts(self):
+        self.conf.haproxy.enable_runtime_api = True
+        self.assertEqual({'stats_level': 'admin'},
+                         self.driver._get_global_opts(self.lb))
+        self.conf.haproxy.enable_runtime_api = False
+        self.assertEqual({}, self.driver._get_global_opts(self.lb))
+        self.driver.seamless_reload = True
+        self.assertEqual({'expose_fd': True},
+                         self.driver._get_global_opts(self.lb))
+        self.driver.seamless_reload = False
+        self.conf.haproxy.hard_stop_after = 30
+        self.assertEqual({'hard_stop_after': '30s'},
+                         self.driver._get_global_opts(self.lb))
+
+    def test_get_process_opts(self):
+        self.assertEqual({}, self.driver._get_process_opts(self.lb))
+        self.conf.haproxy.nbthread = 4
+        self.conf.haproxy.maxconn = 2000
+        self.conf.haproxy.tune_options = {'bufsize': '32768'}
+        self.assertEqual({'nbthread': 4, 'maxconn': 2000,
+                          'tune': {'bufsize': '32768'}},
+                         self.driver._get_process_opts(self.lb))
+
+    def test_get_process_opts_flavor_metadata(self):
+        self.conf.haproxy.nbthread = 4
+        self.conf.haproxy.tune_options = {'bufsize': '32768'}
+        self.lb.flavor_metadata = {
+            'nbthread': '8', 'maxconn': 50000,
+            'tune': {'ssl.default-dh-param': 2048,
+                     'bufsize 1\n    nbproc': '2',
+                     'maxrewrite': '1024 2'}}
+        self.assertEqual({'nbthread': 8, 'maxconn': 50000,
+                          'tune': {'bufsize': '32768',
+                                   'ssl.default-dh-param': 2048}},
+                         self.driver._get_process_opts(self.lb))
+        self.lb.flavor_metadata = {'nbthread': 0, 'maxconn': 'many'}
+        self.assertEqual({'nbthread': 4, 'tune': {'bufsize': '32768'}},
+                         self.driver._get_process_opts(self.lb))
+
+    def test_get_process_opts_threads_not_supported(self):
+        self.driver.threads_supported = False
+        self.conf.haproxy.nbthread = 4
+        self.assertEqual({}, self.driver._get_process_opts(self.lb))
+
+    def test_get_process_opts_cpu_pool(self):
+        self.driver.cpu_pool = cpu_pool.CpuPool(range(2, 8))
+        self.conf.haproxy.nbthread = 4
+        self.assertEqual({'nbthread': 4, 'cpu_map': 'auto:1/1-4 2 3 4 5'},
+                         self.driver._get_process_opts(self.lb))
+        # reloads keep the CPUs of the loadbalancer
+        self.assertEqual({'nbthread': 4, 'cpu_map': 'auto:1/1-4 2 3 4 5'},
+                         self.driver._get_process_opts(self.lb))
+        other_lb = data_models.LoadBalancer(id='other_lb')
+        self.conf.haproxy.nbthread = 1
+        self.assertEqual({'cpu_map': '1 6'},
+                         self.driver._get_process_opts(other_lb))
+        self.assertEqual({'cpus_total': 6, 'cpus_free': 1},
+                         self.driver.get_capacity())
+
+    def test_get_process_opts_cpu_pool_exhausted(self):
+        self.driver.cpu_pool = cpu_pool.CpuPool([2, 3])
+        self.conf.haproxy.nbthread = 4
+        with mock.patch.object(namespace_driver, 'LOG') as log:
+            self.assertEqual({'nbthread': 4},
+                             self.driver._get_process_opts(self.lb))
+            self.assertTrue(log.warning.called)
+        self.assertEqual({'cpus_total': 2, 'cpus_free': 2},
+                         self.driver.get_capacity())
+
+    def test_get_capacity_no_cpu_pool(self):
+        self.assertEqual({}, self.driver.get_capacity())
+
+    def _deploy_member(self, **kwargs):
+        pool = data_models.Pool(id='pool1', loadbalancer=self.lb)
+        member_args = {'id': 'member1', 'pool_id': pool.id,
+                       'address': '10.0.0.5', 'protocol_port': 80,
+                       'weight': 1, 'admin_state_up': True,
+                       'provisioning_status': constants.ACTIVE}
+        pool.members = [data_models.Member(pool=pool, **member_args)]
+        self.lb.pools = [pool]
+        self.driver.deployed_loadbalancers[self.lb.id] = self.lb
+        member_args.update(kwargs)
+        return data_models.Member(pool=pool, **member_args)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_member_runtime(self, mock_socket):
+        self.driver._save_config = mock.Mock(return_value=('/conf', 'abc', {}))
+        self.driver._save_snapshot = mock.Mock()
+        self.driver._get_state_file_path = mock.Mock(return_value='/sock')
+        member = self._deploy_member(weight=5)
+
+        self.assertTrue(self.driver.update_member_runtime(member))
+        mock_socket.assert_called_once_with('/sock')
+        mock_socket.return_value.run_commands.assert_called_once_with(
+            ['set weight pool1/member1 5'])
+        self.assertEqual(5, self.lb.pools[0].members[0].weight)
+        self.driver._save_config.assert_called_once_with(self.lb)
+        self.assertEqual('abc', self.driver.config_digests[self.lb.id])
+        self.driver._save_snapshot.assert_called_once_with(self.lb, 'abc')
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_member_runtime_disabled(self, mock_socket):
+        self.conf.haproxy.enable_runtime_api = False
+        member = self._deploy_member(weight=5)
+        self.assertFalse(self.driver.update_member_runtime(member))
+        self.assertFalse(mock_socket.called)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_member_runtime_not_deployed(self, mock_socket):
+        member = self._deploy_member(weight=5)
+        self.driver.deployed_loadbalancers = {}
+        self.assertFalse(self.driver.update_member_runtime(member))
+        self.assertFalse(mock_socket.called)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_member_runtime_structural_change(self, mock_socket):
+        member = self._deploy_member(protocol_port=8080)
+        self.assertFalse(self.driver.update_member_runtime(member))
+        self.assertFalse(mock_socket.called)
+
+    @mock.patch('neutron_lbaas.drivers.haproxy.haproxy_socket.HaproxySocket')
+    def test_update_member_runtime_rejected(self, mock_socket):
+        self.driver._save_config = mock.Mock()
+        self.driver._get_state_file_path = mock.Mock(return_value='/sock')
+        mock_socket.return_value.run_commands.side_effect = (
+            haproxy_socket.HaproxyRuntimeError(command='c', error='e'))
+        member = self._deploy_member(admin_state_up=False)
+
+        self.assertFalse(self.driver.update_member_runtime(member))
+        self.assertTrue(self.lb.pools[0].members[0].admin_state_up)
+        self.assertFalse(self.driver._save_config.called)
 
 
 class BaseTestManager(base.BaseTestCase):
@@ -435,11 +1135,15 @@ class BaseTestManager(base.BaseTestCase):
     def setUp(self):
         super(BaseTestManager, self).setUp()
         self.driver = mock.Mock()
+        self.driver.conf.haproxy.refresh_coalesce_window = 0
+        self.driver.refresh_times = {}
         self.lb_manager = namespace_driver.LoadBalancerManager(self.driver)
         self.listener_manager = namespace_driver.ListenerManager(self.driver)
         self.pool_manager = namespace_driver.PoolManager(self.driver)
         self.member_manager = namespace_driver.MemberManager(self.driver)
         self.hm_manager = namespace_driver.HealthMonitorManager(self.driver)
+        self.l7policy_manager = namespace_driver.L7PolicyManager(self.driver)
+        self.l7rule_manager = namespace_driver.L7RuleManager(self.driver)
         self.refresh = self.driver.loadbalancer.refresh
 
 
@@ -515,6 +1219,65 @@ class TestLoadBalancerManager(BaseTestLoadBalancerManager):
         self.lb_manager.create(self.in_lb)
         self.lb_manager.refresh.assert_called_once_with(self.in_lb)
 
+    def test_refresh_coalesced(self):
+        self.driver.conf.haproxy.refresh_coalesce_window = 0.01
+        with mock.patch.object(self.lb_manager, '_do_refresh') as do_refresh:
+            pool = eventlet.GreenPool()
+            for i in range(5):
+                pool.spawn(self.lb_manager.refresh, self.in_lb)
+            pool.waitall()
+            do_refresh.assert_called_once_with(self.in_lb.id)
+
+            self.lb_manager.refresh(self.in_lb)
+            self.assertEqual(2, do_refresh.call_count)
+        self.assertEqual({}, self.lb_manager._pending_refreshes)
+
+    def test_refresh_coalesced_per_loadbalancer(self):
+        self.driver.conf.haproxy.refresh_coalesce_window = 0.01
+        other_lb = data_models.LoadBalancer(id='lb2', listeners=[])
+        with mock.patch.object(self.lb_manager, '_do_refresh') as do_refresh:
+            pool = eventlet.GreenPool()
+            for lb in (self.in_lb, other_lb, self.in_lb):
+                pool.spawn(self.lb_manager.refresh, lb)
+            pool.waitall()
+            self.assertEqual(
+                sorted([mock.call(self.in_lb.id), mock.call(other_lb.id)]),
+                sorted(do_refresh.call_args_list))
+
+    def test_refresh_coalesced_error(self):
+        self.driver.conf.haproxy.refresh_coalesce_window = 0.01
+        with mock.patch.object(self.lb_manager, '_do_refresh',
+                               side_effect=exceptions.NeutronException):
+            threads = [eventlet.spawn(self.lb_manager.refresh, self.in_lb)
+                       for i in range(2)]
+            for thread in threads:
+                self.assertRaises(exceptions.NeutronException, thread.wait)
+
+    @mock.patch('oslo_utils.timeutils.now')
+    @mock.patch.object(data_models.LoadBalancer, 'from_dict')
+    def test_refresh_after_queued(self, lb_from_dict, now):
+        now.return_value = 10
+        self.lb_manager.refresh(self.in_lb)
+        self.assertEqual({self.in_lb.id: 10}, self.driver.refresh_times)
+        self.driver.reset_mock()
+        with mock.patch.object(dispatcher, 'queued_at', return_value=10):
+            self.lb_manager.refresh(self.in_lb)
+        self.assertFalse(self.driver.plugin_rpc.get_loadbalancer.called)
+        self.assertFalse(self.driver.deploy_instance.called)
+        with mock.patch.object(dispatcher, 'queued_at', return_value=11):
+            self.lb_manager.refresh(self.in_lb)
+        self.driver.plugin_rpc.get_loadbalancer.assert_called_once_with(
+            self.in_lb.id)
+
+    @mock.patch.object(data_models.LoadBalancer, 'from_dict')
+    def test_refresh_after_queued_error(self, lb_from_dict):
+        self.driver.deploy_instance.side_effect = (
+            exceptions.NeutronException)
+        with mock.patch.object(dispatcher, 'queued_at', return_value=0):
+            self.assertRaises(exceptions.NeutronException,
+                              self.lb_manager.refresh, self.in_lb)
+        self.assertEqual({}, self.driver.refresh_times)
+
     def test_get_stats(self):
         self.lb_manager.get_stats(self.in_lb.id)
         self.driver.get_stats.assert_called_once_with(self.in_lb.id)
@@ -601,6 +1364,16 @@ class TestPoolManager(BaseTestPoolManager):
         self.assertIsNone(self.in_listener.default_pool)
         self.refresh.assert_called_once_with(self.in_lb)
 
+    def test_delete_rejects_l7_policies(self):
+        policy = data_models.L7Policy(
+            id='l7policy1', action=lb_const.L7_POLICY_ACTION_REDIRECT_TO_POOL,
+            redirect_pool_id=self.in_pool.id)
+        self.in_listener.l7_policies = [policy]
+        self.pool_manager.delete(self.in_pool)
+        self.assertEqual(lb_const.L7_POLICY_ACTION_REJECT, policy.action)
+        self.assertIsNone(policy.redirect_pool_id)
+        self.refresh.assert_called_once_with(self.in_lb)
+
 
 class BaseTestMemberManager(BaseTestPoolManager):
 
@@ -623,13 +1396,39 @@ class TestMemberManager(BaseTestMemberManager):
     def test_update(self):
         old_member = data_models.Member(id=self.in_member.id,
                                         address='0.0.0.0')
+        self.driver.update_member_runtime.return_value = False
         self.member_manager.update(old_member, self.in_member)
+        self.driver.update_member_runtime.assert_called_once_with(
+            self.in_member)
         self.refresh.assert_called_once_with(self.in_lb)
 
+    def test_update_runtime(self):
+        old_member = data_models.Member(id=self.in_member.id, weight=1)
+        self.driver.update_member_runtime.return_value = True
+        self.member_manager.update(old_member, self.in_member)
+        self.assertFalse(self.refresh.called)
+
     def test_create(self):
         self.member_manager.create(self.in_member)
         self.refresh.assert_called_once_with(self.in_lb)
 
+    @mock.patch.object(data_models.LoadBalancer, 'from_dict')
+    def test_create_burst(self, lb_from_dict):
+        self.driver.conf.haproxy.refresh_coalesce_window = 0.01
+        self.driver.loadbalancer = self.lb_manager
+        lb_dispatcher = dispatcher.LoadBalancerDispatcher(16)
+        for i in range(50):
+            member = data_models.Member(id='member%d' % i, pool=self.in_pool)
+            lb_dispatcher.dispatch(self.in_lb.id, self.member_manager.create,
+                                   member)
+        done = eventlet.event.Event()
+        lb_dispatcher.dispatch(self.in_lb.id, done.send)
+        done.wait()
+        self.driver.plugin_rpc.get_loadbalancer.assert_called_once_with(
+            self.in_lb.id)
+        self.driver.deploy_instance.assert_called_once_with(
+            lb_from_dict.return_value)
+
     def test_delete(self):
         self.member_manager.delete(self.in_member)
         self.refresh.assert_called_once_with(self.in_lb)
@@ -661,6 +1460,51 @@ class TestHealthMonitorManager(BaseTestHealthMonitorManager):
         self.refresh.assert_called_once_with(self.in_lb)
 
 
+class BaseTestL7PolicyManager(BaseTestListenerManager):
+
+    def setUp(self):
+        super(BaseTestL7PolicyManager, self).setUp()
+        self.in_l7policy = data_models.L7Policy(id='l7policy1',
+                                                listener=self.in_listener)
+        self.in_l7rule = data_models.L7Rule(id='l7rule1',
+                                            policy=self.in_l7policy)
+        self.in_l7policy.rules = [self.in_l7rule]
+        self.in_listener.l7_policies = [self.in_l7policy]
+
+
+class TestL7PolicyManager(BaseTestL7PolicyManager):
+
+    def test_update(self):
+        old_l7policy = data_models.L7Policy(id=self.in_l7policy.id,
+                                            position=2)
+        self.l7policy_manager.update(old_l7policy, self.in_l7policy)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+    def test_create(self):
+        self.l7policy_manager.create(self.in_l7policy)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+    def test_delete(self):
+        self.l7policy_manager.delete(self.in_l7policy)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+
+class TestL7RuleManager(BaseTestL7PolicyManager):
+
+    def test_update(self):
+        old_l7rule = data_models.L7Rule(id=self.in_l7rule.id, value='x')
+        self.l7rule_manager.update(old_l7rule, self.in_l7rule)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+    def test_create(self):
+        self.l7rule_manager.create(self.in_l7rule)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+    def test_delete(self):
+        self.l7rule_manager.delete(self.in_l7rule)
+        self.refresh.assert_called_once_with(self.in_lb)
+
+
 class TestNamespaceDriverModule(base.BaseTestCase):
 
     @mock.patch('os.path.exists')
@@ -685,6 +1529,95 @@ class TestNamespaceDriverModule(base.BaseTestCase):
             # sometimes fails
             # execute.assert_called_once_with(['kill', '-9', '123'])
 
+    @mock.patch('neutron.agent.linux.utils.execute')
+    def test_get_haproxy_version(self, execute):
+        execute.return_value = ('HA-Proxy version 1.6.3 2015/12/25\n'
+                                'Copyright 2000-2015 Willy Tarreau\n')
+        self.assertEqual((1, 6), namespace_driver.get_haproxy_version())
+        execute.assert_called_once_with(['haproxy', '-v'],
+                                        log_fail_as_error=False)
+        execute.return_value = 'HAProxy version 2.0.13-2 2020/04/01\n'
+        self.assertEqual((2, 0), namespace_driver.get_haproxy_version())
+        execute.return_value = 'unexpected'
+        self.assertIsNone(namespace_driver.get_haproxy_version())
+        execute.side_effect = OSError
+        self.assertIsNone(namespace_driver.get_haproxy_version())
+
+    def _get_members(self, **kwargs):
+        pool = data_models.Pool(id='pool1')
+        member_args = {'id': 'member1', 'pool_id': pool.id,
+                       'address': '10.0.0.5', 'protocol_port': 80,
+                       'weight': 1, 'admin_state_up': True,
+                       'provisioning_status': constants.ACTIVE}
+        deployed = data_models.Member(pool=pool, **member_args)
+        member_args.update(kwargs)
+        return deployed, data_models.Member(pool=pool, **member_args)
+
+    def test_get_member_runtime_commands_weight(self):
+        deployed, member = self._get_members(weight=10)
+        self.assertEqual(
+            ['set weight pool1/member1 10'],
+            namespace_driver._get_member_runtime_commands(deployed, member))
+
+    def test_get_member_runtime_commands_disable(self):
+        deployed, member = self._get_members(admin_state_up=False)
+        self.assertEqual(
+            ['disable server pool1/member1'],
+            namespace_driver._get_member_runtime_commands(deployed, member))
+
+    def test_get_member_runtime_commands_enable(self):
+        deployed, member = self._get_members(weight=3)
+        deployed.admin_state_up = False
+        self.assertEqual(
+            ['enable server pool1/member1', 'set weight pool1/member1 3'],
+            namespace_driver._get_member_runtime_commands(deployed, member))
+
+    def test_get_member_runtime_commands_no_change(self):
+        deployed, member = self._get_members(name='renamed')
+        self.assertEqual(
+            [], namespace_driver._get_member_runtime_commands(deployed,
+                                                              member))
+
+    def test_get_member_runtime_commands_structural(self):
+        deployed, member = self._get_members(address='10.0.0.6')
+        self.assertIsNone(
+            namespace_driver._get_member_runtime_commands(deployed, member))
+        deployed, member = self._get_members(
+            provisioning_status=constants.ERROR)
+        self.assertIsNone(
+            namespace_driver._get_member_runtime_commands(deployed, member))
+
     def test_get_ns_name(self):
         ns_name = namespace_driver.get_ns_name('woohoo')
         self.assertEqual(namespace_driver.NS_PREFIX + 'woohoo', ns_name)
+
+    def _l7_map(self, prefix, *entries):
+        return {'path': '/m.map', 'lookup': 'path', 'prefix': prefix,
+                'entries': collections.OrderedDict(entries)}
+
+    def test_get_map_runtime_commands(self):
+        commands = namespace_driver._get_map_runtime_commands(
+            self._l7_map(True, ('/a', 'p1'), ('/b', 'p1')),
+            self._l7_map(True, ('/b', 'p2'), ('/c', 'p1')))
+        self.assertEqual(['del map /m.map /a', 'set map /m.map /b p2',
+                          'add map /m.map /c p1'], commands)
+
+    def test_get_map_runtime_commands_needs_reload(self):
+        deployed = self._l7_map(True, ('/api', 'p1'))
+        for l7_map in (
+                # the lookup changed
+                dict(self._l7_map(True, ('/api', 'p1')), lookup='x'),
+                # added prefix overlaps an existing one
+                self._l7_map(True, ('/api', 'p1'), ('/api/v2', 'p2')),
+                # key the stats socket cannot take
+                self._l7_map(True, ('/api', 'p1'), ('/a;b', 'p2'))):
+            self.assertIsNone(namespace_driver._get_map_runtime_commands(
+                deployed, l7_map))
+        self.assertIsNone(namespace_driver._get_map_runtime_commands(
+            None, deployed))
+
+    def test_get_map_runtime_commands_exact_overlap(self):
+        commands = namespace_driver._get_map_runtime_commands(
+            self._l7_map(False, ('/api', 'p1')),
+            self._l7_map(False, ('/api', 'p1'), ('/api/v2', 'p2')))
+        self.assertEqual(['add map /m.map /api/v2 p2'], commands)
@@ -19,8 +19,7 @@ RET_PERSISTENCE = {
     'type': 'HTTP_COOKIE',
     'cookie_name': 'HTTP_COOKIE'}
 
-HASHSEED_ORDERED_CODES = list({'404', '405', '500'})
-PIPED_CODES = '|'.join(HASHSEED_ORDERED_CODES)
+EXPECTED_CODES_REGEX = '^(40[45]|500)$'
 
 RET_MONITOR = {
     'id': 'sample_monitor_id_1',
@@ -30,7 +29,7 @@ RET_MONITOR = {
     'max_retries': 3,
     'http_method': 'GET',
     'url_path': '/index.html',
-    'expected_codes': PIPED_CODES,
+    'expected_codes': EXPECTED_CODES_REGEX,
     'admin_state_up': True}
 
 RET_MEMBER_1 = {
@@ -71,7 +70,8 @@ RET_LISTENER = {
     'protocol': 'HTTP',
     'protocol_mode': 'http',
     'default_pool': RET_POOL,
-    'connection_limit': 98}
+    'connection_limit': 98,
+    'l7_policies': []}
 
 RET_LISTENER_TLS = {
     'id': 'sample_listener_id_1',
@@ -148,14 +148,15 @@ def sample_vip_port_tuple():
 
 
 def sample_listener_tuple(proto=None, monitor=True, persistence=True,
-                          persistence_type=None, tls=False, sni=False):
+                          persistence_type=None, tls=False, sni=False,
+                          l7_policies=None):
     proto = 'HTTP' if proto is None else proto
     port = '443' if proto is 'HTTPS' or proto is 'TERMINATED_HTTPS' else '80'
     in_listener = collections.namedtuple(
         'listener', 'id, tenant_id, protocol_port, protocol, default_pool, '
         'connection_limit, admin_state_up, default_tls_container_id, '
                     'sni_container_ids, default_tls_container, '
-                    'sni_containers, loadbalancer_id')
+                    'sni_containers, loadbalancer_id, l7_policies')
     return in_listener(
         id='sample_listener_id_1',
         tenant_id='sample_tenant_id',
@@ -190,10 +191,43 @@ def sample_listener_tuple(proto=None, monitor=True, persistence=True,
                         '--imainter3--\n', '--imainter3too--\n'],
                     primary_cn='fakeCN2'))]
         if sni else [],
-        loadbalancer_id='sample_loadbalancer_id_1'
+        loadbalancer_id='sample_loadbalancer_id_1',
+        l7_policies=l7_policies or []
     )
 
 
+def sample_l7policy_tuple(id, position, rules, action='REDIRECT_TO_POOL',
+                          redirect_pool_id='sample_pool_id_2',
+                          redirect_url=None, admin_state_up=True):
+    in_l7policy = collections.namedtuple(
+        'l7policy', 'id, position, action, redirect_pool_id, redirect_url, '
+                    'rules, admin_state_up')
+    return in_l7policy(
+        id=id,
+        position=position,
+        action=action,
+        redirect_pool_id=redirect_pool_id,
+        redirect_url=redirect_url,
+        rules=rules,
+        admin_state_up=admin_state_up)
+
+
+def sample_l7rule_tuple(id, type='HOST_NAME', compare_type='EQUAL_TO',
+                        value='www.example.com', key=None, invert=False,
+                        admin_state_up=True):
+    in_l7rule = collections.namedtuple(
+        'l7rule', 'id, type, compare_type, key, value, invert, '
+                  'admin_state_up')
+    return in_l7rule(
+        id=id,
+        type=type,
+        compare_type=compare_type,
+        key=key,
+        value=value,
+        invert=invert,
+        admin_state_up=admin_state_up)
+
+
 def sample_tls_sni_container_tuple(tls_container=None, tls_container_id=None):
     sc = collections.namedtuple('sni_container', 'tls_container,'
                                                  'tls_container_id')
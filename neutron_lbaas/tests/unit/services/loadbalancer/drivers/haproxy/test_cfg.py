@@ -163,7 +163,7 @@ class TestHaproxyCfg(base.BaseTestCase):
         expected = (' check inter 3s fall 4',
                     ['timeout check 2s',
                      'option httpchk GET /',
-                     'http-check expect rstatus 200',
+                     'http-check expect rstatus ^200$',
                      'option ssl-hello-chk'])
         self.assertEqual(expected, cfg._get_server_health_option(test_config))
 
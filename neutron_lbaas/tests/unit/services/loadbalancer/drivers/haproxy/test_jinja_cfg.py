@@ -13,9 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
+import os
+
+import fixtures
+import jinja2
 import mock
 
 from neutron.tests import base
+from oslo_config import cfg
 
 from neutron_lbaas.common.cert_manager import cert_manager
 from neutron_lbaas.common.tls_utils import cert_parser
@@ -26,26 +33,73 @@ from neutron_lbaas.tests.unit.services.loadbalancer.drivers.haproxy.\
 
 
 class TestHaproxyCfg(base.BaseTestCase):
+    def setUp(self):
+        super(TestHaproxyCfg, self).setUp()
+        self.addCleanup(jinja_cfg.CERT_CACHE.clear)
+
     def test_save_config(self):
+        conf_path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'haproxy.conf')
         with mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
-                        'jinja_cfg.render_loadbalancer_obj') as r_t, \
-                mock.patch('neutron.common.utils.replace_file') as replace:
-            r_t.return_value = 'fake_rendered_template'
+                        'jinja_cfg.generate_loadbalancer_obj') as g_t:
+            g_t.return_value = iter(['fake_rendered', '_template'])
             lb = mock.Mock()
-            jinja_cfg.save_config('test_conf_path', lb, 'test_sock_path',
-                                  'nogroup',
-                                  'fake_state_path')
-            r_t.assert_called_once_with(lb,
+            digest = jinja_cfg.save_config(conf_path, lb, 'test_sock_path',
+                                           'nogroup',
+                                           'fake_state_path')
+            g_t.assert_called_once_with(lb,
                                         'nogroup',
                                         'test_sock_path',
-                                        'fake_state_path')
-            replace.assert_called_once_with('test_conf_path',
-                                            'fake_rendered_template')
+                                        'fake_state_path',
+                                        global_opts=None)
+        with open(conf_path) as conf_file:
+            self.assertEqual('fake_rendered_template', conf_file.read())
+        self.assertEqual(
+            hashlib.sha256(b'fake_rendered_template').hexdigest(), digest)
+        self.assertEqual(['haproxy.conf'],
+                         os.listdir(os.path.dirname(conf_path)))
+
+    def test_save_config_render_failure(self):
+        conf_path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'haproxy.conf')
+        with open(conf_path, 'w') as conf_file:
+            conf_file.write('old_config')
+
+        def chunks():
+            yield 'partial'
+            raise jinja2.TemplateError('boom')
+
+        with mock.patch('neutron_lbaas.services.loadbalancer.drivers.haproxy.'
+                        'jinja_cfg.generate_loadbalancer_obj',
+                        return_value=chunks()):
+            self.assertRaises(jinja2.TemplateError, jinja_cfg.save_config,
+                              conf_path, mock.Mock(), 'test_sock_path',
+                              'nogroup', 'fake_state_path')
+        with open(conf_path) as conf_file:
+            self.assertEqual('old_config', conf_file.read())
+        self.assertEqual(['haproxy.conf'],
+                         os.listdir(os.path.dirname(conf_path)))
 
     def test_get_template(self):
         template = jinja_cfg._get_template()
         self.assertEqual('haproxy.loadbalancer.j2', template.name)
 
+    def test_prepare_templates(self):
+        cache_dir = self.useFixture(fixtures.TempDir()).path
+        with mock.patch.object(jinja_cfg, 'JINJA_ENV', None):
+            jinja_cfg.prepare_templates(cache_dir)
+            template = jinja_cfg.JINJA_ENV.get_template('haproxy_base.j2')
+            self.assertEqual(3, len(os.listdir(cache_dir)))
+
+            # the compiled templates survive a restart of the agent
+            with mock.patch.object(jinja2.Environment, 'compile') as compile:
+                jinja_cfg.prepare_templates(cache_dir)
+                self.assertFalse(compile.called)
+            self.assertIsNot(template, jinja_cfg.JINJA_ENV.get_template(
+                'haproxy_base.j2'))
+            self.assertEqual('haproxy.loadbalancer.j2',
+                             jinja_cfg._get_template().name)
+
     def test_render_template_tls_termination(self):
         lb = sample_configs.sample_loadbalancer_tuple(
             proto='TERMINATED_HTTPS', tls=True, sni=True)
@@ -72,7 +126,7 @@ class TestHaproxyCfg(base.BaseTestCase):
               "    server sample_member_id_2 10.0.0.98:82"
               " weight 13 check inter 30s fall 3 cookie "
               "sample_member_id_2\n\n"
-              % sample_configs.PIPED_CODES)
+              % sample_configs.EXPECTED_CODES_REGEX)
         with mock.patch('os.makedirs'):
             with mock.patch('os.listdir'):
                 with mock.patch.object(jinja_cfg, 'n_utils'):
@@ -116,7 +170,7 @@ class TestHaproxyCfg(base.BaseTestCase):
               "weight 13 check inter 30s fall 3 cookie sample_member_id_1\n"
               "    server sample_member_id_2 10.0.0.98:82 "
               "weight 13 check inter 30s fall 3 cookie sample_member_id_2\n\n"
-              % sample_configs.PIPED_CODES)
+              % sample_configs.EXPECTED_CODES_REGEX)
         with mock.patch('os.makedirs'):
             with mock.patch('neutron.common.utils.replace_file'):
                 with mock.patch('os.listdir'):
@@ -148,7 +202,7 @@ class TestHaproxyCfg(base.BaseTestCase):
               "weight 13 check inter 30s fall 3 cookie sample_member_id_1\n"
               "    server sample_member_id_2 10.0.0.98:82 "
               "weight 13 check inter 30s fall 3 cookie sample_member_id_2\n\n"
-              % sample_configs.PIPED_CODES)
+              % sample_configs.EXPECTED_CODES_REGEX)
         rendered_obj = jinja_cfg.render_loadbalancer_obj(
             sample_configs.sample_loadbalancer_tuple(),
             'nogroup', '/sock_path', '/v2')
@@ -156,6 +210,53 @@ class TestHaproxyCfg(base.BaseTestCase):
             sample_configs.sample_base_expected_config(backend=be),
             rendered_obj)
 
+    def test_render_template_stats_level(self):
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            sample_configs.sample_loadbalancer_tuple(),
+            'nogroup', '/sock_path', '/v2',
+            global_opts={'stats_level': 'admin'})
+        self.assertIn('    stats socket /sock_path mode 0600 level admin\n',
+                      rendered_obj)
+
+    def test_render_template_expose_fd(self):
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            sample_configs.sample_loadbalancer_tuple(),
+            'nogroup', '/sock_path', '/v2',
+            global_opts={'stats_level': 'admin', 'expose_fd': True})
+        self.assertIn('    stats socket /sock_path mode 0600 level admin '
+                      'expose-fd listeners\n', rendered_obj)
+
+    def test_render_template_expose_fd_user_level(self):
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            sample_configs.sample_loadbalancer_tuple(),
+            'nogroup', '/sock_path', '/v2',
+            global_opts={'expose_fd': True})
+        self.assertIn('    stats socket /sock_path mode 0600 level user '
+                      'expose-fd listeners\n', rendered_obj)
+
+    def test_render_template_process_opts(self):
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            sample_configs.sample_loadbalancer_tuple(),
+            'nogroup', '/sock_path', '/v2',
+            global_opts={'maxconn': 50000, 'nbthread': 4,
+                         'cpu_map': 'auto:1/1-4 2 3 4 5',
+                         'tune': {'ssl.default-dh-param': 2048,
+                                  'bufsize': '32768'}})
+        self.assertIn('    stats socket /sock_path mode 0666 level user\n'
+                      '    maxconn 50000\n'
+                      '    nbthread 4\n'
+                      '    cpu-map auto:1/1-4 2 3 4 5\n'
+                      '    tune.bufsize 32768\n'
+                      '    tune.ssl.default-dh-param 2048\n\n', rendered_obj)
+
+    def test_render_template_hard_stop_after(self):
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            sample_configs.sample_loadbalancer_tuple(),
+            'nogroup', '/sock_path', '/v2',
+            global_opts={'hard_stop_after': '30s'})
+        self.assertIn('    stats socket /sock_path mode 0666 level user\n'
+                      '    hard-stop-after 30s\n\n', rendered_obj)
+
     def test_render_template_https(self):
         fe = ("frontend sample_listener_id_1\n"
               "    option tcplog\n"
@@ -175,7 +276,7 @@ class TestHaproxyCfg(base.BaseTestCase):
               "weight 13 check inter 30s fall 3 cookie sample_member_id_1\n"
               "    server sample_member_id_2 10.0.0.98:82 "
               "weight 13 check inter 30s fall 3 cookie sample_member_id_2\n\n"
-              % sample_configs.PIPED_CODES)
+              % sample_configs.EXPECTED_CODES_REGEX)
         rendered_obj = jinja_cfg.render_loadbalancer_obj(
             sample_configs.sample_loadbalancer_tuple(proto='HTTPS'),
             'nogroup', '/sock_path', '/v2')
@@ -265,7 +366,7 @@ class TestHaproxyCfg(base.BaseTestCase):
               "weight 13 check inter 30s fall 3\n"
               "    server sample_member_id_2 10.0.0.98:82 "
               "weight 13 check inter 30s fall 3\n\n"
-              % sample_configs.PIPED_CODES)
+              % sample_configs.EXPECTED_CODES_REGEX)
         rendered_obj = jinja_cfg.render_loadbalancer_obj(
             sample_configs.sample_loadbalancer_tuple(
                 persistence_type='SOURCE_IP'),
@@ -289,7 +390,7 @@ class TestHaproxyCfg(base.BaseTestCase):
                       "weight 13 check inter 30s fall 3\n"
                       "    server sample_member_id_2 10.0.0.98:82 "
                       "weight 13 check inter 30s fall 3\n\n"
-                      % sample_configs.PIPED_CODES)
+                      % sample_configs.EXPECTED_CODES_REGEX)
                 rendered_obj = jinja_cfg.render_loadbalancer_obj(
                     sample_configs.sample_loadbalancer_tuple(
                         persistence_type='APP_COOKIE'),
@@ -332,6 +433,7 @@ class TestHaproxyCfg(base.BaseTestCase):
         cert.get_private_key.return_value = tls.private_key
         cert.get_certificate.return_value = tls.certificate
         cert.get_intermediates.return_value = tls.intermediates
+        cert.get_private_key_passphrase.return_value = None
 
         with mock.patch.object(jinja_cfg, '_map_cert_tls_container') as map, \
                 mock.patch.object(jinja_cfg,
@@ -366,6 +468,94 @@ class TestHaproxyCfg(base.BaseTestCase):
                                   tls)]
             store_cert.call_args_list == calls_ac
 
+    def _mock_cert_manager(self, certificate='imaCert'):
+        cert = mock.Mock(spec=cert_manager.Cert)
+        cert.get_certificate.return_value = certificate
+        cert.get_private_key.return_value = 'imaPrivateKey'
+        cert.get_private_key_passphrase.return_value = None
+        cert.get_intermediates.return_value = 'imainter1\nimainter2'
+        cert_mgr = mock.Mock(spec=cert_manager.CertManager)
+        cert_mgr.get_cert.return_value = cert
+        return cert_mgr
+
+    @mock.patch.object(jinja_cfg, '_map_cert_tls_container')
+    @mock.patch('oslo_utils.timeutils.now')
+    def test_get_tls_container_cached(self, now, map_cert):
+        listener = sample_configs.sample_listener_tuple(tls=True, sni=True)
+        cert_mgr = self._mock_cert_manager()
+        now.return_value = 1000
+        tls_cert = jinja_cfg._get_tls_container(cert_mgr, listener, 'ref1')
+        self.assertEqual(map_cert.return_value, tls_cert)
+        self.assertEqual(1, cert_mgr.get_cert.call_count)
+
+        # fresh cache entries need no certificate manager calls at all
+        now.return_value = 1299
+        self.assertEqual(tls_cert, jinja_cfg._get_tls_container(
+            cert_mgr, listener, 'ref1'))
+        self.assertEqual(1, cert_mgr.get_cert.call_count)
+        self.assertEqual(1, map_cert.call_count)
+
+        # expired entries are fetched again, but unchanged material is not
+        # mapped again
+        now.return_value = 1300
+        self.assertEqual(tls_cert, jinja_cfg._get_tls_container(
+            cert_mgr, listener, 'ref1'))
+        self.assertEqual(2, cert_mgr.get_cert.call_count)
+        self.assertEqual(1, map_cert.call_count)
+
+    @mock.patch.object(jinja_cfg, '_map_cert_tls_container')
+    @mock.patch('oslo_utils.timeutils.now')
+    def test_get_tls_container_changed(self, now, map_cert):
+        listener = sample_configs.sample_listener_tuple(tls=True, sni=True)
+        now.return_value = 1000
+        jinja_cfg._get_tls_container(self._mock_cert_manager(), listener,
+                                     'ref1')
+        now.return_value = 1300
+        jinja_cfg._get_tls_container(
+            self._mock_cert_manager(certificate='imaNewCert'), listener,
+            'ref1')
+        self.assertEqual(2, map_cert.call_count)
+
+    @mock.patch.object(jinja_cfg, '_map_cert_tls_container')
+    def test_get_tls_container_cache_disabled(self, map_cert):
+        cfg.CONF.set_override('tls_cache_ttl', 0, group='haproxy')
+        listener = sample_configs.sample_listener_tuple(tls=True, sni=True)
+        cert_mgr = self._mock_cert_manager()
+        jinja_cfg._get_tls_container(cert_mgr, listener, 'ref1')
+        jinja_cfg._get_tls_container(cert_mgr, listener, 'ref1')
+        self.assertEqual(2, cert_mgr.get_cert.call_count)
+        self.assertEqual({}, jinja_cfg.CERT_CACHE)
+
+    def test_get_cert_fingerprints(self):
+        lb = sample_configs.sample_loadbalancer_tuple(tls=True, sni=True)
+        for cert_ref, fingerprint in (('cont_id_1', 'fp3'),
+                                      ('cont_id_2', 'fp1'),
+                                      ('cont_id_3', 'fp2')):
+            jinja_cfg.CERT_CACHE[('sample_tenant_id', cert_ref)] = (
+                jinja_cfg.CachedCert(0, fingerprint, None))
+        self.assertEqual(['fp1', 'fp2', 'fp3'],
+                         jinja_cfg.get_cert_fingerprints(lb))
+
+        del jinja_cfg.CERT_CACHE[('sample_tenant_id', 'cont_id_2')]
+        self.assertIsNone(jinja_cfg.get_cert_fingerprints(lb))
+
+    def test_get_cert_fingerprints_no_tls(self):
+        lb = sample_configs.sample_loadbalancer_tuple()
+        self.assertEqual([], jinja_cfg.get_cert_fingerprints(lb))
+
+    @mock.patch('neutron.common.utils.replace_file')
+    def test_replace_file_if_changed(self, replace):
+        with mock.patch('six.moves.builtins.open',
+                        mock.mock_open(read_data='pem')):
+            jinja_cfg._replace_file_if_changed('/path.pem', 'pem')
+            self.assertFalse(replace.called)
+            jinja_cfg._replace_file_if_changed('/path.pem', 'new pem')
+            replace.assert_called_once_with('/path.pem', 'new pem')
+        with mock.patch('six.moves.builtins.open', side_effect=IOError):
+            replace.reset_mock()
+            jinja_cfg._replace_file_if_changed('/path.pem', 'pem')
+            replace.assert_called_once_with('/path.pem', 'pem')
+
     def test_get_primary_cn(self):
         cert = mock.MagicMock()
 
@@ -442,6 +632,256 @@ class TestHaproxyCfg(base.BaseTestCase):
         ret = jinja_cfg._transform_listener(in_listener, '/v2')
         self.assertEqual(sample_configs.RET_LISTENER, ret)
 
+    def _sample_l7policies(self):
+        rule = sample_configs.sample_l7rule_tuple
+        policy = sample_configs.sample_l7policy_tuple
+        return [
+            policy('l7policy_5', 5, [
+                rule('l7rule_5a', type='COOKIE', key='session', value='x'),
+                rule('l7rule_5b', type='FILE_TYPE', value='jpg',
+                     invert=True)]),
+            policy('l7policy_1', 1, [rule('l7rule_1',
+                                          value='WWW.Example.com')]),
+            policy('l7policy_2', 2, [rule('l7rule_2')],
+                   redirect_pool_id='sample_pool_id_3'),
+            policy('l7policy_3', 3, [rule('l7rule_3', type='HEADER',
+                                          compare_type='REGEX',
+                                          key='User-Agent',
+                                          value='bad agent')],
+                   action='REJECT', redirect_pool_id=None),
+            policy('l7policy_4', 4, [rule('l7rule_4',
+                                          value='api.example.com')],
+                   redirect_pool_id='sample_pool_id_3'),
+            policy('l7policy_6', 6, [rule('l7rule_6', type='PATH',
+                                          compare_type='STARTS_WITH',
+                                          value='/api')]),
+            policy('l7policy_7', 7, [rule('l7rule_7', type='PATH',
+                                          compare_type='STARTS_WITH',
+                                          value='/api/v2')],
+                   redirect_pool_id='sample_pool_id_3'),
+            policy('l7policy_0', 0, [rule('l7rule_0')],
+                   admin_state_up=False),
+            policy('l7policy_8', 8, [rule('l7rule_8', admin_state_up=False)])]
+
+    def test_transform_l7_policies(self):
+        in_listener = sample_configs.sample_listener_tuple(
+            l7_policies=self._sample_l7policies())
+        ret = jinja_cfg._transform_l7_policies(in_listener, '/v2')
+        self.assertEqual(
+            [{'id': 'l7policy_1',
+              'action': 'REDIRECT_TO_POOL',
+              'map': {
+                  'path': '/v2/sample_listener_id_1_l7policy_1.map',
+                  'lookup': 'req.hdr(host),lower,'
+                            'map(/v2/sample_listener_id_1_l7policy_1.map)',
+                  'prefix': False,
+                  'entries': collections.OrderedDict([
+                      ('www.example.com', 'sample_pool_id_2'),
+                      ('api.example.com', 'sample_pool_id_3')])}},
+             {'id': 'l7policy_3',
+              'action': 'REJECT',
+              'redirect_pool_id': None,
+              'redirect_url': '',
+              'rules': [{'id': 'l7rule_3', 'invert': False,
+                         'criterion': 'req.hdr(User-Agent) -m reg '
+                                      'bad\\ agent'}]},
+             {'id': 'l7policy_5',
+              'action': 'REDIRECT_TO_POOL',
+              'redirect_pool_id': 'sample_pool_id_2',
+              'redirect_url': '',
+              'rules': [{'id': 'l7rule_5a', 'invert': False,
+                         'criterion': 'req.cook(session) -m str x'},
+                        {'id': 'l7rule_5b', 'invert': True,
+                         'criterion': 'path -m end .jpg'}]},
+             {'id': 'l7policy_6',
+              'action': 'REDIRECT_TO_POOL',
+              'map': {
+                  'path': '/v2/sample_listener_id_1_l7policy_6.map',
+                  'lookup': 'path,map_beg('
+                            '/v2/sample_listener_id_1_l7policy_6.map)',
+                  'prefix': True,
+                  'entries': collections.OrderedDict([
+                      ('/api', 'sample_pool_id_2')])}}],
+            ret)
+
+    def test_get_l7_map_kind(self):
+        rule = sample_configs.sample_l7rule_tuple
+        self.assertEqual(('req.hdr(host),lower', 'map'),
+                         jinja_cfg._get_l7_map_kind([rule('r1')]))
+        self.assertEqual(
+            ('path', 'map_beg'),
+            jinja_cfg._get_l7_map_kind([rule('r1', type='PATH',
+                                             compare_type='STARTS_WITH',
+                                             value='/')]))
+        for rules in ([rule('r1'), rule('r2')],
+                      [rule('r1', invert=True)],
+                      [rule('r1', compare_type='ENDS_WITH')],
+                      [rule('r1', type='HEADER', key='Host')],
+                      [rule('r1', value='a b')],
+                      [rule('r1', value='#a')]):
+            self.assertIsNone(jinja_cfg._get_l7_map_kind(rules))
+
+    def test_escape_haproxy_config_string(self):
+        self.assertEqual('a\\ b\\#c\\\\d\\\'e\\"f',
+                         jinja_cfg._escape_haproxy_config_string(
+                             'a b#c\\d\'e"f'))
+
+    def test_render_template_l7_policies(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(
+                l7_policies=self._sample_l7policies())])
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            lb, 'nogroup', '/sock_path', base_dir)
+
+        host_map = os.path.join(base_dir,
+                                'sample_listener_id_1_l7policy_1.map')
+        path_map = os.path.join(base_dir,
+                                'sample_listener_id_1_l7policy_6.map')
+        with open(host_map) as map_file:
+            host_map_data = map_file.read()
+        with open(path_map) as map_file:
+            path_map_data = map_file.read()
+        self.assertEqual('www.example.com sample_pool_id_2\n'
+                         'api.example.com sample_pool_id_3\n', host_map_data)
+        self.assertEqual('/api sample_pool_id_2\n', path_map_data)
+        fe = ("frontend sample_listener_id_1\n"
+              "    option tcplog\n"
+              "    maxconn 98\n"
+              "    option forwardfor\n"
+              "    bind 10.0.0.2:80\n"
+              "    mode http\n"
+              "    acl l7rule_3 req.hdr(User-Agent) -m reg bad\\ agent\n"
+              "    http-request deny if l7rule_3\n"
+              "    use_backend %[req.hdr(host),lower,map({0})]"
+              " if {{ req.hdr(host),lower,map({0}) -m found }}\n"
+              "    acl l7rule_5a req.cook(session) -m str x\n"
+              "    acl l7rule_5b path -m end .jpg\n"
+              "    use_backend sample_pool_id_2 if l7rule_5a !l7rule_5b\n"
+              "    use_backend %[path,map_beg({1})]"
+              " if {{ path,map_beg({1}) -m found }}\n"
+              "    default_backend sample_pool_id_1\n\n").format(
+                  host_map, path_map)
+        self.assertIn(fe, rendered_obj)
+
+    def _render_l7_policies(self, base_dir, l7_policies):
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(
+                l7_policies=l7_policies)])
+        jinja_cfg.render_loadbalancer_obj(lb, 'nogroup', '/sock_path',
+                                          base_dir)
+        return sorted(name for name in os.listdir(base_dir)
+                      if name.endswith('.map'))
+
+    def test_render_template_l7_maps_stable_names(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        maps = self._render_l7_policies(base_dir, self._sample_l7policies())
+        self.assertEqual(['sample_listener_id_1_l7policy_1.map',
+                          'sample_listener_id_1_l7policy_6.map'], maps)
+        # a policy before the maps does not rename them
+        reject = sample_configs.sample_l7policy_tuple(
+            'l7policy_reject', 0,
+            [sample_configs.sample_l7rule_tuple('l7rule_reject')],
+            action='REJECT', redirect_pool_id=None)
+        self.assertEqual(maps, self._render_l7_policies(
+            base_dir, [reject] + self._sample_l7policies()))
+
+    def test_render_template_l7_maps_removes_unused(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        other_path = os.path.join(base_dir, 'haproxy.conf')
+        with open(other_path, 'w') as other_file:
+            other_file.write('config')
+        self._render_l7_policies(base_dir, self._sample_l7policies())
+        # l7policy_6 and l7policy_7 are gone, their map with them
+        self.assertEqual(
+            ['sample_listener_id_1_l7policy_1.map'],
+            self._render_l7_policies(base_dir,
+                                     self._sample_l7policies()[:5]))
+        self.assertEqual([], self._render_l7_policies(base_dir, []))
+        self.assertTrue(os.path.exists(other_path))
+
+    def test_render_template_l7_policies_position_order(self):
+        rule = sample_configs.sample_l7rule_tuple
+        policy = sample_configs.sample_l7policy_tuple
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(l7_policies=[
+                policy('l7policy_4', 4, [rule('l7rule_4')],
+                       action='REJECT', redirect_pool_id=None),
+                policy('l7policy_3', 3, [rule('l7rule_3')],
+                       action='REDIRECT_TO_URL', redirect_pool_id=None,
+                       redirect_url='http://www.example.org/'),
+                policy('l7policy_2', 2, [rule('l7rule_2')],
+                       action='REJECT', redirect_pool_id=None),
+                policy('l7policy_1', 1, [rule('l7rule_1')],
+                       action='REDIRECT_TO_URL', redirect_pool_id=None,
+                       redirect_url='http://www.example.com/')])])
+        rendered_obj = jinja_cfg.render_loadbalancer_obj(
+            lb, 'nogroup', '/sock_path', '/v2')
+        self.assertIn(
+            "    mode http\n"
+            "    acl l7rule_1 req.hdr(host) -i -m str www.example.com\n"
+            "    http-request redirect location http://www.example.com/"
+            " if l7rule_1\n"
+            "    acl l7rule_2 req.hdr(host) -i -m str www.example.com\n"
+            "    http-request deny if l7rule_2\n"
+            "    acl l7rule_3 req.hdr(host) -i -m str www.example.com\n"
+            "    http-request redirect location http://www.example.org/"
+            " if l7rule_3\n"
+            "    acl l7rule_4 req.hdr(host) -i -m str www.example.com\n"
+            "    http-request deny if l7rule_4\n"
+            "    default_backend sample_pool_id_1\n\n", rendered_obj)
+
+    def test_get_l7_maps(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(
+                l7_policies=self._sample_l7policies())])
+        l7_maps = jinja_cfg.get_l7_maps(lb, base_dir)
+
+        host_map = os.path.join(base_dir,
+                                'sample_listener_id_1_l7policy_1.map')
+        path_map = os.path.join(base_dir,
+                                'sample_listener_id_1_l7policy_6.map')
+        self.assertEqual(set([host_map, path_map]), set(l7_maps))
+        self.assertEqual(
+            collections.OrderedDict([('www.example.com', 'sample_pool_id_2'),
+                                     ('api.example.com', 'sample_pool_id_3')]),
+            l7_maps[host_map]['entries'])
+        self.assertTrue(l7_maps[path_map]['prefix'])
+
+    def test_get_l7_maps_listener_down(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(
+                l7_policies=self._sample_l7policies())._replace(
+                    admin_state_up=False)])
+        self.assertEqual({}, jinja_cfg.get_l7_maps(lb, base_dir))
+
+    def test_load_config(self):
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        conf_path = os.path.join(base_dir, 'haproxy.conf')
+        lb = sample_configs.sample_loadbalancer_tuple()._replace(
+            listeners=[sample_configs.sample_listener_tuple(
+                l7_policies=self._sample_l7policies())])
+        digest = jinja_cfg.save_config(conf_path, lb, '/sock_path',
+                                       'nogroup', base_dir)
+
+        loaded_digest, config, l7_maps = jinja_cfg.load_config(conf_path)
+        self.assertEqual(digest, loaded_digest)
+        with open(conf_path) as conf_file:
+            self.assertEqual(conf_file.read(), config)
+        self.assertEqual(jinja_cfg.get_l7_maps(lb, base_dir), l7_maps)
+
+    def test_load_config_no_maps(self):
+        conf_path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'haproxy.conf')
+        with open(conf_path, 'w') as conf_file:
+            conf_file.write('global\n    daemon\n')
+        self.assertEqual(
+            (hashlib.sha256(b'global\n    daemon\n').hexdigest(),
+             'global\n    daemon\n', {}),
+            jinja_cfg.load_config(conf_path))
+
     def test_transform_loadbalancer(self):
         in_lb = sample_configs.sample_loadbalancer_tuple()
         ret = jinja_cfg._transform_loadbalancer(in_lb, '/v2')
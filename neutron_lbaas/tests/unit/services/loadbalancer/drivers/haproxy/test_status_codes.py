@@ -0,0 +1,51 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import re
+
+from neutron_lbaas.services.loadbalancer.drivers.haproxy import jinja_cfg
+from neutron_lbaas.services.loadbalancer.drivers.haproxy import status_codes
+from neutron_lbaas.tests import base
+
+
+class TestStatusCodes(base.BaseTestCase):
+
+    def _compile_regex(self, exp_codes):
+        return status_codes.compile_regex(
+            jinja_cfg._expand_expected_codes(exp_codes))
+
+    def test_compile_regex(self):
+        self.assertEqual('', self._compile_regex(''))
+        self.assertEqual('^200$', self._compile_regex('200'))
+        self.assertEqual('^(2[0-9][0-9]|302)$',
+                         self._compile_regex('200-299, 302'))
+        self.assertEqual('^(40[45]|500)$',
+                         self._compile_regex('500, 405, 404'))
+        self.assertEqual('^[2-5][0-9][0-9]$',
+                         self._compile_regex('200-599'))
+        self.assertEqual('^(20[0-4]|30[12])$',
+                         self._compile_regex('200-204,301,302'))
+        self.assertEqual('^[23]0[0-9]$',
+                         self._compile_regex('200-209,300-309'))
+
+    def test_compile_regex_matches_expanded_codes(self):
+        for exp_codes in ('200', '200, 201,202', '200-599', '201-200, 205',
+                          '200-204, 301, 302, 404', '100-199, 250-349, 418',
+                          '200, 210, 220, 230', '109-191, 299-301, 599',
+                          '418, 101'):
+            regex = re.compile(self._compile_regex(exp_codes))
+            codes = jinja_cfg._expand_expected_codes(exp_codes)
+            for code in (str(i) for i in range(1000)):
+                self.assertEqual(code in codes, bool(regex.search(code)),
+                                 '%s with %s' % (code, exp_codes))
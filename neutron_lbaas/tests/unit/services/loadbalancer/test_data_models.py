@@ -59,6 +59,76 @@ class TestBaseDataModel(base.BaseTestCase):
         self.assertFalse(hasattr(model, 'foo'))
 
 
+class TestFromDict(base.BaseTestCase):
+
+    @staticmethod
+    def _get_pool_dict():
+        return {'id': 'pool1', 'loadbalancer': {'id': 'lb1'},
+                'members': [{'id': 'member1', 'pool': {'id': 'pool1'}}],
+                'healthmonitor': {'id': 'hm1', 'pool': {'id': 'pool1'}},
+                'session_persistence': {'type': 'SOURCE_IP',
+                                        'pool': {'id': 'pool1'}}}
+
+    def _get_loadbalancer_dict(self):
+        listeners = [{'id': 'listener%d' % index,
+                      'loadbalancer': {'id': 'lb1'},
+                      'default_pool': self._get_pool_dict()}
+                     for index in range(2)]
+        listeners[1]['l7_policies'] = [
+            {'id': 'policy1', 'listener': {'id': 'listener1'},
+             'redirect_pool': self._get_pool_dict(),
+             'rules': [{'id': 'rule1', 'policy': {'id': 'policy1'}}]}]
+        return {'id': 'lb1', 'listeners': listeners,
+                'pools': [self._get_pool_dict()],
+                'vip_port': {'id': 'port1', 'fixed_ips': []}}
+
+    def test_from_dict_builds_nested_models_on_access(self):
+        member = data_models.Member.from_dict(
+            {'id': 'member1', 'pool': self._get_pool_dict()})
+        self.assertNotIn('pool', vars(member))
+        pool = member.pool
+        self.assertEqual('pool1', pool.id)
+        self.assertIs(pool, member.pool)
+        self.assertNotIn('members', vars(pool))
+        self.assertEqual('lb1', pool.loadbalancer.id)
+        self.assertIs(pool.session_persistence, pool.sessionpersistence)
+
+    def test_loadbalancer_from_dict_shares_pools(self):
+        lb = data_models.LoadBalancer.from_dict(
+            self._get_loadbalancer_dict())
+        self.assertNotIn('listeners', vars(lb))
+        pool = lb.pools[0]
+        listener0, listener1 = lb.listeners
+        policy = listener1.l7_policies[0]
+        self.assertEqual(1, len(lb.pools))
+        self.assertIs(pool, listener0.default_pool)
+        self.assertIs(pool, listener1.default_pool)
+        self.assertIs(pool, policy.redirect_pool)
+        self.assertIs(lb, pool.loadbalancer)
+        self.assertIs(lb, listener0.loadbalancer)
+        self.assertIs(pool, pool.members[0].pool)
+        self.assertIs(pool, pool.healthmonitor.pool)
+        self.assertIs(pool, pool.session_persistence.pool)
+        self.assertIs(pool.session_persistence, pool.sessionpersistence)
+        self.assertEqual([listener0, listener1], pool.listeners)
+        self.assertIs(listener0, pool.listener)
+        self.assertEqual([policy], pool.l7_policies)
+        self.assertIs(listener1, policy.listener)
+        self.assertIs(policy, policy.rules[0].policy)
+        self.assertEqual('port1', lb.vip_port.id)
+
+    def test_to_dict_of_shared_graph(self):
+        lb_dict = data_models.LoadBalancer.from_dict(
+            self._get_loadbalancer_dict()).to_dict()
+        pool_dict = lb_dict['pools'][0]
+        self.assertEqual('member1', pool_dict['members'][0]['id'])
+        self.assertEqual('lb1', pool_dict['loadbalancer']['id'])
+        self.assertNotIn('pools', pool_dict['loadbalancer'])
+        self.assertEqual(
+            'pool1', lb_dict['listeners'][0]['default_pool']['id'])
+        self.assertEqual('port1', lb_dict['vip_port']['id'])
+
+
 def _get_models():
     models = []
     for name, obj in inspect.getmembers(data_models):
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures how long agent RPC handlers take to rebuild their data models.
+
+Builds dicts nested the way the plugin serializes its data models, where
+every reference carries its own copy of the referenced object, and times
+the from_dict calls and attribute accesses of the agent handlers on them:
+
+    python tools/benchmark_agent_graphs.py --listeners 5 --members 50
+"""
+
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from oslo_serialization import jsonutils
+
+from neutron_lbaas.services.loadbalancer import constants
+from neutron_lbaas.services.loadbalancer import data_models
+
+
+def build_loadbalancer(listener_count, member_count):
+    """Builds a loadbalancer whose objects link back to their parents."""
+    loadbalancer = data_models.LoadBalancer(
+        id='benchmark-lb', name='benchmark', vip_address='10.0.0.10',
+        admin_state_up=True)
+    for index in range(listener_count):
+        pool = data_models.Pool(
+            id='benchmark-pool-%d' % index, loadbalancer=loadbalancer,
+            protocol=constants.PROTOCOL_HTTP,
+            lb_algorithm=constants.LB_METHOD_ROUND_ROBIN,
+            admin_state_up=True)
+        pool.members = [
+            data_models.Member(
+                id='benchmark-member-%d-%d' % (index, member), pool=pool,
+                address='10.%d.%d.%d' % (1 + member // 62500,
+                                         member // 250 % 250,
+                                         1 + member % 250),
+                protocol_port=8080, weight=1, admin_state_up=True)
+            for member in range(member_count)]
+        listener = data_models.Listener(
+            id='benchmark-listener-%d' % index, loadbalancer=loadbalancer,
+            protocol=constants.PROTOCOL_HTTP, protocol_port=8000 + index,
+            connection_limit=-1, admin_state_up=True, default_pool=pool)
+        pool.listeners.append(listener)
+        loadbalancer.listeners.append(listener)
+        loadbalancer.pools.append(pool)
+    return loadbalancer
+
+
+def to_plugin_dict(model, calling_classes=()):
+    """Serializes a model as the plugin does after loading it from the DB.
+
+    Like BaseDataModel.from_sqlalchemy_model, this follows relationships
+    to a class only while it is not twice in the chain of callers.
+    """
+    callers = calling_classes + (type(model),)
+    ret = {}
+    for attr, value in vars(model).items():
+        if isinstance(value, list):
+            ret[attr] = [to_plugin_dict(item, callers) for item in value
+                         if calling_classes.count(type(item)) < 2]
+        elif isinstance(value, data_models.BaseDataModel):
+            if calling_classes.count(type(value)) < 2:
+                ret[attr] = to_plugin_dict(value, callers)
+        else:
+            ret[attr] = value
+    return ret
+
+
+def reload_loadbalancer(loadbalancer_dict):
+    loadbalancer = data_models.LoadBalancer.from_dict(loadbalancer_dict)
+    # what the haproxy templates read
+    for listener in loadbalancer.listeners:
+        for member in listener.default_pool.members:
+            member.address
+
+
+def update_member(old_member_dict, member_dict):
+    member = data_models.Member.from_dict(member_dict)
+    data_models.Member.from_dict(old_member_dict)
+    member.pool.loadbalancer.id
+
+
+def update_pool(old_pool_dict, pool_dict):
+    pool = data_models.Pool.from_dict(pool_dict)
+    data_models.Pool.from_dict(old_pool_dict)
+    pool.loadbalancer.id
+
+
+def measure(label, handler, message, repeat):
+    # from_dict consumes the dicts it is given
+    messages = [jsonutils.loads(message) for _ in range(repeat)]
+    seconds = timeit.timeit(lambda: handler(*messages.pop()), number=repeat)
+    print('%-20s %10d bytes %10.2f ms' % (label, len(message),
+                                          seconds * 1000 / repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--listeners', type=int, default=5,
+                        help='listeners of the loadbalancer, each with '
+                             'its own pool')
+    parser.add_argument('--members', type=int, default=50,
+                        help='members of each pool')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='number of calls to average over')
+    args = parser.parse_args()
+
+    loadbalancer = build_loadbalancer(args.listeners, args.members)
+    pool = loadbalancer.pools[0]
+    pool_dict = to_plugin_dict(pool)
+    member_dict = to_plugin_dict(pool.members[0])
+    measure('reload_loadbalancer', reload_loadbalancer,
+            jsonutils.dumps([to_plugin_dict(loadbalancer)]), args.repeat)
+    measure('update_member', update_member,
+            jsonutils.dumps([member_dict, member_dict]), args.repeat)
+    measure('update_pool', update_pool,
+            jsonutils.dumps([pool_dict, pool_dict]), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
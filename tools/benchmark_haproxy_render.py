@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures how fast the haproxy driver renders large configurations.
+
+Reports the time to prepare the Jinja templates, with and without compiled
+templates in the bytecode cache, and the render throughput for a
+loadbalancer with many listeners and members:
+
+    python tools/benchmark_haproxy_render.py --listeners 20 --members 500
+"""
+
+from __future__ import print_function
+
+import argparse
+import shutil
+import tempfile
+import timeit
+
+from neutron.plugins.common import constants as plugin_constants
+
+from neutron_lbaas.services.loadbalancer import constants
+from neutron_lbaas.services.loadbalancer import data_models
+from neutron_lbaas.services.loadbalancer.drivers.haproxy import jinja_cfg
+
+
+def build_loadbalancer(listener_count, member_count):
+    loadbalancer = data_models.LoadBalancer(
+        id='benchmark-lb', name='benchmark', vip_address='10.0.0.10')
+    for index in range(listener_count):
+        pool = data_models.Pool(
+            id='benchmark-pool-%d' % index,
+            protocol=constants.PROTOCOL_HTTP,
+            lb_algorithm=constants.LB_METHOD_ROUND_ROBIN,
+            admin_state_up=True,
+            provisioning_status=plugin_constants.ACTIVE,
+            loadbalancer=loadbalancer)
+        pool.healthmonitor = data_models.HealthMonitor(
+            id='benchmark-hm-%d' % index,
+            type=constants.HEALTH_MONITOR_HTTP, delay=5, timeout=5,
+            max_retries=3, http_method='GET', url_path='/healthcheck',
+            expected_codes='200-204,301,302', admin_state_up=True, pool=pool)
+        pool.members = [
+            data_models.Member(
+                id='benchmark-member-%d-%d' % (index, member),
+                address='10.%d.%d.%d' % (1 + member // 62500,
+                                         member // 250 % 250,
+                                         1 + member % 250),
+                protocol_port=8080, weight=1, admin_state_up=True,
+                subnet_id='benchmark-subnet',
+                provisioning_status=plugin_constants.ACTIVE, pool=pool)
+            for member in range(member_count)]
+        listener = data_models.Listener(
+            id='benchmark-listener-%d' % index,
+            protocol=constants.PROTOCOL_HTTP, protocol_port=8000 + index,
+            connection_limit=-1, admin_state_up=True, default_pool=pool,
+            loadbalancer=loadbalancer)
+        loadbalancer.listeners.append(listener)
+        loadbalancer.pools.append(pool)
+    return loadbalancer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--listeners', type=int, default=10,
+                        help='listeners of the loadbalancer, each with '
+                             'its own pool')
+    parser.add_argument('--members', type=int, default=100,
+                        help='members of each pool')
+    parser.add_argument('--renders', type=int, default=20,
+                        help='number of configurations to render')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for label in ('compile templates', 'load compiled templates'):
+            seconds = timeit.timeit(
+                lambda: jinja_cfg.prepare_templates(cache_dir), number=1)
+            print('%-24s %8.1f ms' % (label, seconds * 1000))
+    finally:
+        shutil.rmtree(cache_dir)
+
+    loadbalancer = build_loadbalancer(args.listeners, args.members)
+    config_dir = tempfile.mkdtemp()
+    try:
+        config = jinja_cfg.render_loadbalancer_obj(
+            loadbalancer, 'nogroup', '/sock_path', config_dir)
+        seconds = timeit.timeit(
+            lambda: jinja_cfg.render_loadbalancer_obj(
+                loadbalancer, 'nogroup', '/sock_path', config_dir),
+            number=args.renders)
+    finally:
+        shutil.rmtree(config_dir)
+    print('%-24s %8.1f ms' % ('render', seconds * 1000 / args.renders))
+    print('%-24s %8.1f renders/s, %d lines, %d bytes' % (
+        'throughput', args.renders / seconds, config.count('\n'),
+        len(config)))
+
+
+if __name__ == '__main__':
+    main()
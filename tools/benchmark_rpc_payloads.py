@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compares the encodings of loadbalancer graphs sent over RPC.
+
+Reports the size of the message and the time to encode and decode it for
+the plain dicts oslo.messaging encodes as JSON and for each format of
+neutron_lbaas.common.payload_codec available here:
+
+    python tools/benchmark_rpc_payloads.py --listeners 20 --members 500
+"""
+
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from neutron.plugins.common import constants as plugin_constants
+from oslo_serialization import jsonutils
+
+from neutron_lbaas.common import payload_codec
+from neutron_lbaas.services.loadbalancer import constants
+from neutron_lbaas.services.loadbalancer import data_models
+
+
+def build_loadbalancer_dict(listener_count, member_count):
+    """Builds a graph shaped like the ones the plugin sends to agents."""
+    loadbalancer = data_models.LoadBalancer(
+        id='benchmark-lb', name='benchmark', vip_address='10.0.0.10',
+        provisioning_status=plugin_constants.ACTIVE, admin_state_up=True)
+    for index in range(listener_count):
+        pool = data_models.Pool(
+            id='benchmark-pool-%d' % index,
+            protocol=constants.PROTOCOL_HTTP,
+            lb_algorithm=constants.LB_METHOD_ROUND_ROBIN,
+            admin_state_up=True,
+            provisioning_status=plugin_constants.ACTIVE)
+        pool.members = [
+            data_models.Member(
+                id='benchmark-member-%d-%d' % (index, member),
+                tenant_id='benchmark-tenant',
+                pool_id=pool.id,
+                address='10.%d.%d.%d' % (1 + member // 62500,
+                                         member // 250 % 250,
+                                         1 + member % 250),
+                protocol_port=8080, weight=1, admin_state_up=True,
+                subnet_id='benchmark-subnet', name='',
+                operating_status=constants.ONLINE,
+                provisioning_status=plugin_constants.ACTIVE)
+            for member in range(member_count)]
+        listener = data_models.Listener(
+            id='benchmark-listener-%d' % index,
+            protocol=constants.PROTOCOL_HTTP, protocol_port=8000 + index,
+            connection_limit=-1, admin_state_up=True, default_pool=pool)
+        loadbalancer.listeners.append(listener)
+        loadbalancer.pools.append(pool)
+    return loadbalancer.to_dict(stats=False)
+
+
+def measure(label, encode, decode, repeat):
+    message = encode()
+    encode_seconds = timeit.timeit(encode, number=repeat)
+    decode_seconds = timeit.timeit(lambda: decode(message), number=repeat)
+    print('%-16s %10d bytes %8.1f ms encode %8.1f ms decode' % (
+        label, len(message), encode_seconds * 1000 / repeat,
+        decode_seconds * 1000 / repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--listeners', type=int, default=10,
+                        help='listeners of the loadbalancer, each with '
+                             'its own pool')
+    parser.add_argument('--members', type=int, default=100,
+                        help='members of each pool')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='number of encodings to average over')
+    args = parser.parse_args()
+
+    payload = build_loadbalancer_dict(args.listeners, args.members)
+    measure('dict (JSON)', lambda: jsonutils.dumps(payload),
+            jsonutils.loads, args.repeat)
+    for payload_format in payload_codec.get_formats():
+        measure('%s+zlib' % payload_format,
+                lambda: jsonutils.dumps(
+                    payload_codec.encode(payload, [payload_format])),
+                lambda message: payload_codec.decode(
+                    jsonutils.loads(message)),
+                args.repeat)
+
+
+if __name__ == '__main__':
+    main()